@@ -0,0 +1,246 @@
+# account_stream.py
+"""
+Libro local de órdenes y posiciones de la cuenta, alimentado por el stream
+de datos de usuario (websocket). TradeExecutor lo consulta para la limpieza
+de órdenes huérfanas y el cierre de posiciones sin llamar a la API REST.
+
+El stream puede perder eventos (reconexiones, órdenes algo de SL/TP que
+llegan por otro canal): el ejecutor reconcilia el libro con REST cada
+ACCOUNT_RECONCILE_SECONDS y, mientras el stream está caído o el libro aún
+no se ha reconciliado, vuelve a las llamadas REST de siempre.
+"""
+import asyncio
+import logging
+import queue
+import threading
+import time
+from collections import OrderedDict
+from config import TRADING_MODE, BINANCE_API_KEY, BINANCE_API_SECRET
+
+OPEN_STATUSES = ('open', 'partially_filled')
+STREAMS = ('orders', 'positions')
+
+class AccountBook:
+    """
+    Órdenes abiertas (por id) y posiciones (por lado) de un símbolo.
+    Los estados finales (closed, canceled, expired, rejected) no tienen
+    vuelta atrás: un evento tardío que todavía diga 'open' se ignora.
+
+    El libro solo está al día si todos los streams están conectados y se
+    reconcilió con REST después de la última (re)conexión: cada cambio de
+    conexión abre una nueva época y una reconciliación solo vale para la
+    época en la que empezó a descargar el estado REST.
+    """
+    def __init__(self, history=1000, streams=STREAMS):
+        self.history = history
+        self.connected = {stream: False for stream in streams}
+        self.epoch = 0
+        self.reconciled_at = None  # time.monotonic() de la última reconciliación con REST
+        self._reconciled_epoch = None
+        self._orders = {}
+        self._closed = OrderedDict()  # id -> estado final de las últimas órdenes cerradas
+        self._positions = {}
+        self._lock = threading.Lock()
+
+    def apply_order(self, order):
+        order_id = str(order.get('id'))
+        status = (order.get('status') or 'open').lower()
+        with self._lock:
+            if order_id in self._closed:
+                return
+            if status in OPEN_STATUSES:
+                self._orders[order_id] = order
+            else:
+                self._orders.pop(order_id, None)
+                self._closed[order_id] = status
+                while len(self._closed) > self.history:
+                    self._closed.popitem(last=False)
+
+    def apply_position(self, position):
+        contracts = float(position.get('contracts') or 0.0)
+        side = (position.get('side') or '').upper()
+        with self._lock:
+            if contracts > 0 and side:
+                self._positions[side] = position
+            elif side:
+                self._positions.pop(side, None)
+            else:
+                self._positions.clear()  # modo one-way: posición a cero sin lado
+
+    def reconcile(self, open_orders, positions, epoch=None):
+        """
+        Sustituye el libro por el estado que devuelve REST. `epoch` es
+        self.epoch leído antes de descargar ese estado (None = la actual).
+        """
+        with self._lock:
+            self._orders = {str(o.get('id')): o for o in open_orders if str(o.get('id')) not in self._closed}
+            self._positions = {p['side'].upper(): p for p in positions
+                               if float(p.get('contracts') or 0.0) > 0 and p.get('side')}
+            self.reconciled_at = time.monotonic()
+            self._reconciled_epoch = self.epoch if epoch is None else epoch
+
+    def set_connected(self, stream, connected):
+        """Marca un stream (o todos si `stream` es None) como conectado o caído"""
+        streams = list(self.connected) if stream is None else [stream]
+        with self._lock:
+            changed = [name for name in streams if self.connected[name] != connected]
+            if not changed:
+                return
+            for name in changed:
+                self.connected[name] = connected
+            # Eventos perdidos o anteriores a la suscripción: hay que reconciliar de nuevo
+            self.epoch += 1
+        for name in changed:
+            logging.info(f"🔌 Stream de {name} conectado" if connected
+                         else f"⚠️ Stream de {name} desconectado: usando REST")
+
+    def is_live(self):
+        """True si el libro refleja la cuenta: todos los streams conectados y reconciliado desde entonces"""
+        with self._lock:
+            return all(self.connected.values()) and self._reconciled_epoch == self.epoch
+
+    def needs_reconcile(self, interval):
+        with self._lock:
+            if self.reconciled_at is None or self._reconciled_epoch != self.epoch:
+                return True
+            return time.monotonic() - self.reconciled_at >= interval
+
+    def open_orders(self):
+        with self._lock:
+            return list(self._orders.values())
+
+    def positions(self):
+        with self._lock:
+            return list(self._positions.values())
+
+    def order_status(self, order_id):
+        """'open', el estado final de la orden, o None si el libro no la conoce"""
+        order_id = str(order_id)
+        with self._lock:
+            if order_id in self._orders:
+                return 'open'
+            return self._closed.get(order_id)
+
+class BinanceUserDataSource:
+    """
+    Stream de usuario en vivo vía websocket (ccxt.pro watch_orders /
+    watch_positions), reconecta solo. Cada stream cuenta como conectado
+    cuando su primer watch() devuelve datos: el de órdenes, tras el primer
+    evento de orden; hasta entonces el ejecutor sigue usando REST.
+    """
+    def __init__(self, symbol, trading_mode=TRADING_MODE):
+        self.symbol = symbol
+        self.trading_mode = trading_mode
+
+    def run(self, book, stop_event):
+        asyncio.run(self._run(book, stop_event))
+
+    async def _run(self, book, stop_event):
+        import ccxt.pro as ccxtpro
+        exchange_class = ccxtpro.binanceusdm if self.trading_mode == "futures" else ccxtpro.binance
+        exchange = exchange_class({
+            'apiKey': BINANCE_API_KEY,
+            'secret': BINANCE_API_SECRET,
+            'enableRateLimit': True
+        })
+        try:
+            await asyncio.gather(
+                self._watch(lambda: exchange.watch_orders(self.symbol), book.apply_order, 'orders', book, stop_event),
+                self._watch(lambda: exchange.watch_positions([self.symbol]), book.apply_position, 'positions', book, stop_event)
+            )
+        finally:
+            book.set_connected(None, False)
+            await exchange.close()
+
+    async def _watch(self, watch, apply, name, book, stop_event):
+        backoff = 1
+        while not stop_event.is_set():
+            try:
+                items = await watch()
+                # Conectado solo cuando la suscripción ya devolvió datos
+                book.set_connected(name, True)
+                for item in items:
+                    apply(item)
+                backoff = 1
+            except Exception as e:
+                book.set_connected(name, False)
+                logging.warning(f"🌐 Stream de {name} caído: {str(e)[:100]}. Reintentando en {backoff}s")
+                await asyncio.sleep(backoff)
+                backoff = min(backoff * 2, 60)
+
+class StubUserDataSource:
+    """
+    Fuente local para pruebas sin conexión: emite las órdenes, fills,
+    cancelaciones y posiciones que se le encolan, en orden.
+    wait_idle() bloquea hasta que el libro los ha aplicado todos.
+    """
+    def __init__(self):
+        self.events = queue.Queue()
+        self._orders = {}
+
+    def order(self, order_id, order_type, side, amount, stop_price=None, status='open'):
+        order = {'id': str(order_id), 'type': order_type, 'side': side, 'amount': amount,
+                 'stopPrice': stop_price, 'status': status, 'filled': 0.0}
+        self._orders[str(order_id)] = order
+        self.events.put(('order', dict(order)))
+        return order
+
+    def fill(self, order_id):
+        order = dict(self._orders[str(order_id)], status='closed')
+        order['filled'] = order['amount']
+        self.events.put(('order', order))
+
+    def cancel(self, order_id):
+        self.events.put(('order', dict(self._orders[str(order_id)], status='canceled')))
+
+    def position(self, side, contracts, entry_price=None):
+        self.events.put(('position', {'side': side, 'contracts': contracts, 'entryPrice': entry_price}))
+
+    def disconnect(self, stream=None):
+        self.events.put(('connected', (stream, False)))
+
+    def connect(self, stream=None):
+        self.events.put(('connected', (stream, True)))
+
+    def wait_idle(self):
+        self.events.join()
+
+    def run(self, book, stop_event):
+        book.set_connected(None, True)
+        while not stop_event.is_set():
+            try:
+                kind, payload = self.events.get(timeout=0.1)
+            except queue.Empty:
+                continue
+            try:
+                if kind == 'order':
+                    book.apply_order(payload)
+                elif kind == 'position':
+                    book.apply_position(payload)
+                else:
+                    book.set_connected(*payload)
+            finally:
+                self.events.task_done()
+
+class UserDataFeed:
+    """Une una fuente de eventos de usuario con el libro, en un hilo aparte"""
+    def __init__(self, source, book=None):
+        self.source = source
+        self.book = book or AccountBook()
+        self._stop_event = threading.Event()
+        self._thread = None
+
+    def start(self):
+        self._thread = threading.Thread(target=self._run, name="account-feed", daemon=True)
+        self._thread.start()
+
+    def _run(self):
+        try:
+            self.source.run(self.book, self._stop_event)
+        except Exception as e:
+            logging.error(f"💥 Stream de cuenta detenido: {e}", exc_info=True)
+        finally:
+            self.book.set_connected(None, False)
+
+    def stop(self):
+        self._stop_event.set()
@@ -3,26 +3,34 @@ import numpy as np
 import logging
 import time
 from datetime import datetime
-from config import SYMBOL, TRADING_MODE, INITIAL_CAPITAL, MODE, SIGNAL_TIMEFRAME, EXECUTION_TIMEFRAME, LEVERAGE, RISK_REWARD_RATIO, SL_BUFFER_MULTIPLIER, MAX_LEVERAGE_DYNAMIC, VOLATILITY_THRESHOLD
+from config import SYMBOL, TRADING_MODE, INITIAL_CAPITAL, MODE, SIGNAL_TIMEFRAME, EXECUTION_TIMEFRAME, LEVERAGE, RISK_REWARD_RATIO, SL_BUFFER_MULTIPLIER, MAX_LEVERAGE_DYNAMIC, VOLATILITY_THRESHOLD, USE_INFERENCE_SERVER
 from data import fetch_ohlcv
-from indicators import add_indicators
+from indicator_engine import IndicatorEngine
+from feature_pipeline import feature_lookback
 from risk_manager import calculate_position_size
 from learner import load_best_params
 from executor import TradeExecutor
 from notifier import send_telegram_message
 from utils import save_trade
 from ml_agent import MLAgent
+from inference_server import InferenceClient
 
 class CryptoAgent:
-    def __init__(self):
+    def __init__(self, market_data=None):
         self.symbol = SYMBOL
+        self.market_data = market_data  # KlineFeed en modo stream; None = sondeo REST
         self.trading_mode = TRADING_MODE
         self.capital = INITIAL_CAPITAL
         self.position = None
         self.trades = []
         self.trade_count = 0
         self.params = load_best_params()
-        self.ml_agent = MLAgent()
+        # Señales del servidor de inferencia compartido o del modelo en este proceso
+        self.ml_agent = InferenceClient() if USE_INFERENCE_SERVER else MLAgent()
+        self.indicator_engine = IndicatorEngine()  # estado incremental por (símbolo, timeframe)
+        # Velas mínimas a descargar: ejecución solo necesita ATR; señales, las features del modelo
+        self.exec_lookback = feature_lookback(['atr'])
+        self.signal_lookback = self.ml_agent.lookback
         self.executor = TradeExecutor(SYMBOL)
         self.last_signal = None
         self.signal_timeframe = SIGNAL_TIMEFRAME
@@ -51,6 +59,12 @@ class CryptoAgent:
         
         logging.info(f"🧠 Agente iniciado | Señales: {SIGNAL_TIMEFRAME} | Ejecución: {EXECUTION_TIMEFRAME}")
 
+    def _get_candles(self, timeframe, limit):
+        """Velas desde el buffer en streaming si está disponible; si no, REST"""
+        if self.market_data is not None and self.market_data.has(self.symbol, timeframe):
+            return self.market_data.get_dataframe(self.symbol, timeframe, limit)
+        return fetch_ohlcv(self.symbol, timeframe, limit=limit)
+
     def _should_exit_position(self, df, entry_price, position_type, atr_multiple=1.5):
         """Simula cierre por SL/TP considerando HIGH/LOW de la vela (más realista)"""
         last = df.iloc[-1]
@@ -116,8 +130,7 @@ class CryptoAgent:
         """Verifica posición en Binance (solo live)"""
         try:
             if MODE == "live" and TRADING_MODE == "futures":
-                positions = self.executor.exchange.fetch_positions([self.symbol])
-                open_positions = [p for p in positions if float(p['contracts']) > 0]
+                open_positions = self.executor.account_snapshot().positions
                 
                 # Si no hay posición abierta pero tenemos registro local
                 if not open_positions and self.position:
@@ -148,15 +161,8 @@ class CryptoAgent:
             
             self.last_capital_update = current_time
             
-            # Obtener saldo actual según el modo de trading
-            if TRADING_MODE == "futures":
-                balance = self.executor.get_account_balance()
-            else:
-                balance = self.executor.exchange.fetch_balance()
-                usdt_balance = balance.get('USDT', {}).get('free', 0.0)
-                balance = float(usdt_balance)
-            
-            real_balance = float(balance)
+            # Saldo actual según el modo de trading (total en futures, libre en spot)
+            real_balance = self.executor.account_snapshot().balance
             
             # Actualizar capital si hay cambios significativos (>0.01 USDT)
             if abs(real_balance - self.capital) > 0.01:
@@ -190,14 +196,10 @@ class CryptoAgent:
             time_diff = abs(server_time - local_time) / 1000
             logging.info(f"  ⏱️ Diferencia de tiempo: {time_diff:.1f} segundos")
             
-            # 2. Saldo actual
-            balance = self.executor.get_account_balance()
-            logging.info(f"  💰 Saldo actual: ${balance:.2f}")
-            
-            # 3. Posiciones abiertas
-            positions = self.executor.exchange.fetch_positions([self.symbol])
-            open_positions = [p for p in positions if float(p['contracts']) > 0]
-            logging.info(f"  📈 Posiciones abiertas: {len(open_positions)}")
+            # 2. Saldo actual y 3. posiciones abiertas: la misma foto que el resto del ciclo
+            snapshot = self.executor.account_snapshot()
+            logging.info(f"  💰 Saldo actual: ${snapshot.balance:.2f}")
+            logging.info(f"  📈 Posiciones abiertas: {len(snapshot.positions)}")
             
         except Exception as e:
             logging.warning(f"⚠️ Error en diagnóstico: {str(e)}")
@@ -208,8 +210,8 @@ class CryptoAgent:
             return True
         
         try:
-            # ✅ MÉTODO CORRECTO: Usar get_account_balance de executor
-            balance = self.executor.get_account_balance()
+            # ✅ Saldo de la foto de cuenta del ciclo (compartida con diagnóstico y capital)
+            balance = self.executor.account_snapshot().balance
             
             if balance < 10.0:  # Mínimo $10 para operar
                 logging.warning(f"⚠️ CAPITAL INSUFICIENTE: ${balance:.2f}. Necesitas al menos $10 para operar.")
@@ -222,6 +224,12 @@ class CryptoAgent:
 
     def run_once(self):
         try:
+            # Adoptar un modelo reentrenado entre ciclos, nunca a mitad de uno
+            self.ml_agent.refresh()
+            self.signal_lookback = self.ml_agent.lookback
+            # Libro local de órdenes/posiciones: reconciliación periódica con REST si toca
+            self.executor.reconcile_book()
+
             # ✅ VERIFICACIÓN DE MARGEN ANTES DE CUALQUIER OPERACIÓN
             if MODE == "live" and not self._check_margin_safety():
                 logging.warning("🛑 OPERACIÓN CANCELADA: margen insuficiente")
@@ -233,11 +241,11 @@ class CryptoAgent:
             logging.info("💓 Evaluando mercado...")
             
             # Descargar datos de ejecución (5m)
-            df_exec = fetch_ohlcv(self.symbol, self.execution_timeframe)
+            df_exec = self._get_candles(self.execution_timeframe, self.exec_lookback)
             if df_exec.empty:
                 logging.warning("⚠️ Datos de ejecución vacíos, saltando ciclo")
                 return
-            df_exec = add_indicators(df_exec)
+            df_exec = self.indicator_engine.update(self.symbol, self.execution_timeframe, df_exec)
             current_time = df_exec.index[-1]
             
             # 💡 DEFINIR current_price AQUÍ (siempre existe si df_exec no está vacío)
@@ -251,9 +259,9 @@ class CryptoAgent:
             
             # Generar nueva señal si es momento
             if self._is_signal_time(current_time) and self.position is None:
-                df_signal = fetch_ohlcv(self.symbol, self.signal_timeframe)
+                df_signal = self._get_candles(self.signal_timeframe, self.signal_lookback)
                 if not df_signal.empty:
-                    df_signal = add_indicators(df_signal)
+                    df_signal = self.indicator_engine.update(self.symbol, self.signal_timeframe, df_signal)
                     signal_dir = self.ml_agent.get_signal_from_dataframe(df_signal)
                     if signal_dir in ['long', 'short']:
                         # Asegurar zona horaria UTC
@@ -265,7 +273,8 @@ class CryptoAgent:
                             'direction': signal_dir,
                             'price': df_signal['close'].iloc[-1],
                             'time': signal_time,
-                            'atr': df_signal['atr'].iloc[-1]
+                            'atr': df_signal['atr'].iloc[-1],
+                            'model_version': self.ml_agent.version
                         }
                         logging.info(f"✅ Nueva señal {signal_dir.upper()} detectada")
             
@@ -397,7 +406,8 @@ class CryptoAgent:
             'price': entry_price,
             'size': size,
             'timestamp': df.index[-1],
-            'strategy': 'ml_hybrid'
+            'strategy': 'ml_hybrid',
+            'model_version': self.last_signal.get('model_version') if self.last_signal else None
         }
         self.trades.append(trade_record)
         
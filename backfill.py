@@ -0,0 +1,164 @@
+# backfill.py
+import logging
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+import numpy as np
+import pandas as pd
+from config import BACKFILL_PAGE_LIMIT, BACKFILL_MAX_WORKERS, BACKFILL_REQUESTS_PER_SECOND
+from candle_store import get_candle_store, timeframe_to_ms
+from data import _download_ohlcv
+
+class RateBudget:
+    """Limita el ritmo de peticiones compartido entre hilos (N peticiones/segundo)"""
+    def __init__(self, requests_per_second):
+        self.interval = 1.0 / requests_per_second if requests_per_second > 0 else 0.0
+        self._next_slot = time.monotonic()
+        self._lock = threading.Lock()
+
+    def acquire(self):
+        with self._lock:
+            now = time.monotonic()
+            wait = self._next_slot - now
+            self._next_slot = max(now, self._next_slot) + self.interval
+        if wait > 0:
+            time.sleep(wait)
+
+def _to_ms(value):
+    if value is None:
+        return int(time.time() * 1000)
+    if isinstance(value, (int, np.integer)):
+        return int(value)
+    return int(pd.Timestamp(value).value // 1_000_000)
+
+def find_missing_ranges(index, start_ms, end_ms, timeframe, empty_ranges=()):
+    """
+    Devuelve los rangos [inicio, fin) en ms que faltan en `index` dentro de
+    [start_ms, end_ms). La última vela guardada se considera siempre pendiente
+    porque pudo guardarse incompleta. Los rangos de `empty_ranges` (ya pedidos
+    y sin velas en el exchange) no cuentan como pendientes.
+    """
+    tf_ms = timeframe_to_ms(timeframe)
+    start_ms = start_ms - start_ms % tf_ms
+    expected = np.arange(start_ms, end_ms, tf_ms, dtype=np.int64)
+    if len(expected) == 0:
+        return []
+
+    have = index.values.astype('datetime64[ms]').astype(np.int64) if len(index) else np.array([], dtype=np.int64)
+    if len(have):
+        have = have[:-1] if have[-1] >= expected[0] else have
+    pending = ~np.isin(expected, have)
+    for empty_start, empty_end in empty_ranges:
+        pending &= (expected < empty_start) | (expected >= empty_end)
+    return _to_ranges(expected[pending], tf_ms)
+
+def _to_ranges(timestamps, tf_ms):
+    """Agrupa timestamps ordenados en rangos [inicio, fin) de velas consecutivas"""
+    if len(timestamps) == 0:
+        return []
+    breaks = np.flatnonzero(np.diff(timestamps) != tf_ms) + 1
+    return [(int(chunk[0]), int(chunk[-1]) + tf_ms) for chunk in np.split(timestamps, breaks)]
+
+def _empty_in_page(df, page_start, page_end, tf_ms):
+    """
+    Rangos de una página sin velas. El exchange devuelve las velas en orden
+    desde `since`, así que solo es seguro dar por vacío lo que falta antes de
+    la última vela recibida: lo posterior pudo quedar fuera por el límite de
+    la respuesta o no estar publicado todavía.
+    """
+    if df.empty:
+        return []
+    received = df.index.values.astype('datetime64[ms]').astype(np.int64)
+    expected = np.arange(page_start, min(page_end, int(received[-1])), tf_ms, dtype=np.int64)
+    return _to_ranges(expected[~np.isin(expected, received)], tf_ms)
+
+def _split_pages(ranges, timeframe, page_limit):
+    tf_ms = timeframe_to_ms(timeframe)
+    page_ms = tf_ms * page_limit
+    pages = []
+    for range_start, range_end in ranges:
+        for page_start in range(range_start, range_end, page_ms):
+            pages.append((page_start, min(page_start + page_ms, range_end)))
+    return pages
+
+def backfill_ohlcv(symbol, timeframe, start, end=None,
+                   page_limit=BACKFILL_PAGE_LIMIT,
+                   max_workers=BACKFILL_MAX_WORKERS,
+                   requests_per_second=BACKFILL_REQUESTS_PER_SECOND,
+                   flush_every=20):
+    """
+    Descarga el histórico [start, end) en páginas de `page_limit` velas,
+    en paralelo y dentro del presupuesto de peticiones, guardándolo en el
+    almacén local a medida que llega. Solo se piden los tramos que faltan,
+    así que una descarga interrumpida se reanuda donde quedó. Los tramos
+    que el exchange devuelve sin velas se registran en el almacén y no se
+    vuelven a pedir.
+    """
+    store = get_candle_store()
+    start_ms, end_ms = _to_ms(start), _to_ms(end)
+    tf_ms = timeframe_to_ms(timeframe)
+    existing = store.load(symbol, timeframe)
+    ranges = find_missing_ranges(existing.index, start_ms, end_ms, timeframe,
+                                 store.empty_ranges(symbol, timeframe))
+    pages = _split_pages(ranges, timeframe, page_limit)
+
+    if not pages:
+        logging.info(f"🗂️ Histórico de {symbol} {timeframe} ya completo en caché")
+        return store.load(symbol, timeframe, pd.Timestamp(start_ms, unit='ms'), pd.Timestamp(end_ms - 1, unit='ms'))
+
+    logging.info(f"📥 Backfill {symbol} {timeframe}: {len(pages)} páginas en {len(ranges)} tramos ({max_workers} hilos)")
+    budget = RateBudget(requests_per_second)
+
+    def download_page(page):
+        page_start, page_end = page
+        budget.acquire()
+        df = _download_ohlcv(symbol, timeframe, limit=page_limit, since=page_start, allow_empty=True)
+        if df.empty:
+            return df, []
+        page_index = df.index.values.astype('datetime64[ms]').astype(np.int64)
+        empty = _empty_in_page(df, page_start, page_end, tf_ms)
+        return df[(page_index >= page_start) & (page_index < page_end)], empty
+
+    pending = []
+    empty = []
+    done = 0
+    pool = ThreadPoolExecutor(max_workers=max_workers)
+    try:
+        futures = [pool.submit(download_page, page) for page in pages]
+        for future in as_completed(futures):
+            df_page, page_empty = future.result()
+            done += 1
+            if not df_page.empty:
+                pending.append(df_page)
+            empty.extend(page_empty)
+            # Volcar a disco periódicamente para poder reanudar
+            if len(pending) >= flush_every or done == len(pages):
+                if pending:
+                    store.merge(symbol, timeframe, pd.concat(pending))
+                    pending = []
+                logging.info(f"  📦 {done}/{len(pages)} páginas guardadas")
+    finally:
+        # Ante un error o interrupción: no lanzar más páginas y guardar lo ya descargado
+        pool.shutdown(wait=True, cancel_futures=True)
+        if pending:
+            store.merge(symbol, timeframe, pd.concat(pending))
+        if empty:
+            store.add_empty_ranges(symbol, timeframe, empty)
+            logging.info(f"  🕳️ {len(empty)} tramos sin velas en el exchange registrados: no se volverán a pedir")
+
+    result = store.load(symbol, timeframe, pd.Timestamp(start_ms, unit='ms'), pd.Timestamp(end_ms - 1, unit='ms'))
+    gaps = find_missing_ranges(result.index, start_ms, end_ms, timeframe) if not result.empty else []
+    # Solo avisar de huecos internos (antes del listado o en la vela actual no es un error)
+    first_ms = int(result.index[0].value // 1_000_000) if not result.empty else end_ms
+    gaps = [g for g in gaps if g[0] > first_ms and g[1] < end_ms - tf_ms]
+    if gaps:
+        missing_candles = sum((g_end - g_start) // tf_ms for g_start, g_end in gaps)
+        logging.warning(f"⚠️ {len(gaps)} huecos en {symbol} {timeframe} ({missing_candles} velas) tras el backfill. "
+                        f"Puede ser mantenimiento del exchange.")
+    return result
+
+def load_history(symbol, timeframe, days):
+    """Histórico de los últimos `days` días, completando la caché si hace falta"""
+    end_ms = int(time.time() * 1000)
+    start_ms = end_ms - days * 24 * 60 * 60 * 1000
+    return backfill_ohlcv(symbol, timeframe, start_ms, end_ms)
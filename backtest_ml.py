@@ -8,23 +8,22 @@ from pathlib import Path
 from config import SYMBOL, TRADING_MODE, INITIAL_CAPITAL
 from data import fetch_ohlcv
 from indicators import add_indicators
+from indicator_kernels import KERNEL_COLS
+from feature_store import add_features
 from risk_manager import calculate_position_size
 from utils import save_trade
+from model_loader import get_model_loader, model_files_exist
 
 # Silenciar logs
 logging.basicConfig(level=logging.WARNING)
 
-try:
-    import joblib
-    MODEL = joblib.load('ml_model.pkl')
-    FEATURE_COLS = joblib.load('feature_cols.pkl')
-    ML_READY = True
-except FileNotFoundError:
+# El modelo se carga en el primer backtest, no al importar (ver model_loader.py)
+ML_READY = model_files_exist()
+if not ML_READY:
     print("❌ Modelo ML no encontrado. Ejecuta primero: python ml_trainer.py")
-    ML_READY = False
 
 class MLBacktester:
-    def __init__(self, symbol, timeframe, capital):
+    def __init__(self, symbol, timeframe, capital, record_trades=True):
         self.symbol = symbol
         self.timeframe = timeframe
         self.capital = capital
@@ -32,17 +31,82 @@ class MLBacktester:
         self.position = None
         self.trades = []
         self.equity_curve = []
+        self.record_trades = record_trades  # False: no escribir en trades.json
 
-    def run_backtest(self, df):
+    def run_backtest(self, df, reference=False):
         if not ML_READY:
             return
         
         print(f"📊 Backtest con ML en {self.timeframe} para {self.symbol}")
         print(f"📈 Velas: {len(df)} ({df.index[0]} → {df.index[-1]})\n")
 
+        if reference:
+            self._simulate_reference(df)
+        else:
+            self._simulate(df)
+
+        self._print_summary()
+        self._plot_equity_curve()
+
+    def _batch_signals(self, features):
+        """Señales de todas las velas con un solo predict_proba: 1 long, -1 short, 0 esperar"""
+        signals = np.zeros(len(features), dtype=np.int8)
+        if len(features) == 0:
+            return signals
+        try:
+            bundle = get_model_loader().get()
+            model = bundle.model
+            proba = model.predict_proba(features[bundle.feature_cols])
+        except Exception as e:
+            # Sin señales el backtest diría "sin operaciones": mejor fallar a la vista
+            logging.error(f"❌ Error al predecir señales del backtest: {e}", exc_info=True)
+            raise
+        pred = model.classes_.take(np.argmax(proba, axis=1))
+        confident = proba.max(axis=1) >= 0.6  # 0.6 para 1hr umbral mínimo
+        signals[confident & (pred == 1)] = 1
+        signals[confident & (pred == -1)] = -1
+        return signals
+
+    def _simulate(self, df, start=200):
+        """
+        Motor vectorizado: indicadores una sola vez (son causales, así que
+        coinciden con recalcularlos sobre cada prefijo), un predict_proba por
+        lotes y una máquina de estados sobre arrays.
+        """
+        if not set(KERNEL_COLS).issubset(df.columns):
+            df = add_indicators(df)
+        index = df.index
+        close = df['close'].to_numpy()
+        atr = df['atr'].to_numpy()
+        signals = np.zeros(len(df), dtype=np.int8)
+        signals[start:] = self._batch_signals(df.iloc[start:])
+
+        self.equity_curve.append((index[0], self.capital))
+
+        for i in range(start, len(df)):
+            current_price = close[i]
+            current_time = index[i]
+
+            # Cerrar posición (SL/TP simple)
+            if self.position:
+                sl_hit, tp_hit = self._check_exit(atr[i], current_price)
+                if sl_hit or tp_hit:
+                    self._close_position(current_price, 'SL' if sl_hit else 'TP', current_time)
+
+            self.equity_curve.append((current_time, self.capital))
+
+            # Abrir posición con ML
+            if self.position is None:
+                if signals[i] == 1:
+                    self._open_position(current_time, current_price, atr[i], 'long')
+                elif signals[i] == -1 and TRADING_MODE == "futures":
+                    self._open_position(current_time, current_price, atr[i], 'short')
+
+    def _simulate_reference(self, df, start=200):
+        """Motor original vela a vela (O(n²)); se mantiene para validar _simulate"""
         self.equity_curve.append((df.index[0], self.capital))
 
-        for i in range(200, len(df)):
+        for i in range(start, len(df)):
             current_df = df.iloc[:i+1].copy()
             current_df = add_indicators(current_df)
             
@@ -53,10 +117,11 @@ class MLBacktester:
             
             current_price = current_df['close'].iloc[-1]
             current_time = df.index[i]
+            current_atr = current_df['atr'].iloc[-1]
 
             # Cerrar posición (SL/TP simple)
             if self.position:
-                sl_hit, tp_hit = self._check_exit(current_df, current_price)
+                sl_hit, tp_hit = self._check_exit(current_atr, current_price)
                 if sl_hit or tp_hit:
                     self._close_position(current_price, 'SL' if sl_hit else 'TP', current_time)
 
@@ -66,18 +131,16 @@ class MLBacktester:
             if self.position is None:
                 signal = self._get_ml_signal(current_df)
                 if signal == 'long':
-                    self._open_position(current_df, 'long')
+                    self._open_position(current_time, current_price, current_atr, 'long')
                 elif signal == 'short' and TRADING_MODE == "futures":
-                    self._open_position(current_df, 'short')
-
-        self._print_summary()
-        self._plot_equity_curve()
+                    self._open_position(current_time, current_price, current_atr, 'short')
 
     def _get_ml_signal(self, df):
         try:
-            last_row = df[FEATURE_COLS].iloc[-1:].copy()
-            pred = MODEL.predict(last_row)[0]
-            proba = MODEL.predict_proba(last_row)[0]
+            bundle = get_model_loader().get()
+            last_row = df[bundle.feature_cols].iloc[-1:].copy()
+            pred = bundle.model.predict(last_row)[0]
+            proba = bundle.model.predict_proba(last_row)[0]
             confidence = max(proba)
             
             if confidence < 0.6:  # 0.6 para 1hr umbral mínimo
@@ -86,11 +149,10 @@ class MLBacktester:
         except Exception as e:
             return 'wait'
 
-    def _check_exit(self, df, current_price):
+    def _check_exit(self, atr, current_price):
         if not self.position:
             return False, False
         
-        atr = df['atr'].iloc[-1]
         # 👇 Ajusta para timeframe bajo
         sl_mult = 1.5  # en vez de 1.5
         tp_mult = 1.6  # ratio 1:2
@@ -104,10 +166,7 @@ class MLBacktester:
             tp = self.position['entry'] - atr * tp_mult
             return current_price >= sl, current_price <= tp
 
-    def _open_position(self, df, pos_type):
-        last = df.iloc[-1]
-        entry_price = last['close']
-        atr = last['atr']
+    def _open_position(self, timestamp, entry_price, atr, pos_type):
         sl = entry_price - atr * 0.8 if pos_type == 'long' else entry_price + atr * 0.8
         size = calculate_position_size(self.capital, entry_price, sl, 0.01)
         if size <= 0:
@@ -118,17 +177,17 @@ class MLBacktester:
             'size': size,
             'entry': entry_price,
             'sl': sl,
-            'entry_time': df.index[-1]  # ← Fecha/hora de entrada
+            'entry_time': timestamp  # ← Fecha/hora de entrada
         }
         self.trades.append({
             'type': pos_type,
             'price': entry_price,
             'size': size,
-            'timestamp': df.index[-1],  # ← Fecha/hora de entrada
+            'timestamp': timestamp,  # ← Fecha/hora de entrada
             'strategy': 'ml_model'
         })
         print(f"🤖 {'LONG' if pos_type == 'long' else 'SHORT'} | "
-            f"Entrada: {df.index[-1].strftime('%Y-%m-%d %H:%M')} a ${entry_price:.2f}")
+            f"Entrada: {timestamp.strftime('%Y-%m-%d %H:%M')} a ${entry_price:.2f}")
 
     def _close_position(self, price, reason, timestamp):
         pnl = (price - self.position['entry']) * self.position['size']
@@ -141,7 +200,8 @@ class MLBacktester:
             'pnl': pnl,
             'reason': reason
         })
-        save_trade(self.trades[-1])
+        if self.record_trades:
+            save_trade(self.trades[-1])
         print(f"  🔴 Cierre ({reason}) | "
             f"Salida: {timestamp.strftime('%Y-%m-%d %H:%M')} a ${price:.2f} | "
             f"PnL: ${pnl:+.2f} | Capital: ${self.capital:.2f}")
@@ -191,5 +251,6 @@ if __name__ == "__main__":
     if df.empty:
         print("❌ Error al cargar datos.")
     else:
+        df = add_features(symbol_to_use, "1h", df, KERNEL_COLS)
         agent = MLBacktester(symbol_to_use, "1h", INITIAL_CAPITAL)
         agent.run_backtest(df)
\ No newline at end of file
@@ -0,0 +1,40 @@
+# bench_backtest.py
+"""
+Compara el motor vectorizado de MLBacktester con el motor original vela a
+vela: mismos trades y misma curva de capital, y tiempo de cada uno.
+Ejecuta: python bench_backtest.py
+"""
+import contextlib
+import io
+import time
+from backtest_ml import MLBacktester, ML_READY
+from bench_indicators import make_candles
+
+def run_engine(df, reference):
+    backtester = MLBacktester("BTC/USDT:USDT", "1h", 1000.0, record_trades=False)
+    start = time.perf_counter()
+    with contextlib.redirect_stdout(io.StringIO()):
+        if reference:
+            backtester._simulate_reference(df)
+        else:
+            backtester._simulate(df)
+    return backtester, time.perf_counter() - start
+
+def compare(n):
+    df = make_candles(n, seed=n)
+    fast, t_fast = run_engine(df, reference=False)
+    slow, t_slow = run_engine(df, reference=True)
+    assert fast.trades == slow.trades, "Los trades no coinciden"
+    assert fast.equity_curve == slow.equity_curve, "La curva de capital no coincide"
+    print(f"{n:>6} velas | original: {t_slow:8.2f} s | vectorizado: {t_fast*1000:8.1f} ms "
+          f"({t_slow/t_fast:6.0f}x) | trades: {len(fast.trades)} ✅ idénticos")
+
+if __name__ == "__main__":
+    if not ML_READY:
+        raise SystemExit("❌ Modelo ML no encontrado. Ejecuta primero: python ml_trainer.py")
+    print("⏱️ Backtest ML: motor original vs vectorizado")
+    for n in (500, 1000):
+        compare(n)
+    df = make_candles(105_000)  # ~1 año de velas de 5m
+    _, t_year = run_engine(df, reference=False)
+    print(f"{len(df):>6} velas | vectorizado: {t_year:.2f} s")
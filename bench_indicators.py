@@ -0,0 +1,77 @@
+# bench_indicators.py
+"""
+Benchmark de add_indicators (kernels NumPy) frente a la versión anterior
+basada en las clases de `ta`, en ventanas de 500 velas (live) y en 1M de
+velas (entrenamiento). También verifica que las salidas coinciden.
+Ejecuta: python bench_indicators.py
+"""
+import time
+import numpy as np
+import pandas as pd
+from ta.trend import EMAIndicator
+from ta.momentum import RSIIndicator
+from ta.volatility import AverageTrueRange
+from indicators import add_indicators
+from indicator_kernels import KERNEL_COLS
+
+def add_indicators_ta(df):
+    """Implementación anterior de add_indicators (referencia)"""
+    df = df.copy()
+    df['ema50'] = EMAIndicator(close=df['close'], window=50).ema_indicator()
+    df['ema200'] = EMAIndicator(close=df['close'], window=200).ema_indicator()
+    df['rsi'] = RSIIndicator(close=df['close'], window=14).rsi()
+    df['atr'] = AverageTrueRange(high=df['high'], low=df['low'], close=df['close']).average_true_range()
+    df['body'] = abs(df['close'] - df['open'])
+    df['upper_wick'] = df['high'] - df[['open', 'close']].max(axis=1)
+    df['lower_wick'] = df[['open', 'close']].min(axis=1) - df['low']
+    df['spread'] = (df['high'] - df['low']) / df['close']
+    df['liquidez'] = df['volume'] / (df['spread'] + 1e-8)
+    return df
+
+def make_candles(n, seed=42):
+    rng = np.random.default_rng(seed)
+    close = 30000 + np.cumsum(rng.normal(0, 40, n))
+    open_ = np.r_[close[0], close[:-1]]
+    high = np.maximum(open_, close) + rng.gamma(2.0, 10.0, n)
+    low = np.minimum(open_, close) - rng.gamma(2.0, 10.0, n)
+    volume = rng.gamma(3.0, 50.0, n)
+    index = pd.date_range('2020-01-01', periods=n, freq='1min', name='timestamp')
+    return pd.DataFrame({'open': open_, 'high': high, 'low': low, 'close': close, 'volume': volume}, index=index)
+
+def timeit(func, repeat):
+    best = float('inf')
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        best = min(best, time.perf_counter() - start)
+    return best
+
+def max_rel_error(reference, candidate):
+    worst = 0.0
+    for col in KERNEL_COLS:
+        ref = reference[col].to_numpy(dtype=np.float64)
+        got = candidate[col].to_numpy(dtype=np.float64)
+        mask = np.isfinite(ref)
+        if not np.array_equal(mask, np.isfinite(got)):
+            raise AssertionError(f"NaN distintos en {col}")
+        denom = np.maximum(np.abs(ref[mask]), 1e-12)
+        worst = max(worst, float(np.max(np.abs(got[mask] - ref[mask]) / denom, initial=0.0)))
+    return worst
+
+def run(n, repeat):
+    df = make_candles(n)
+    reference = add_indicators_ta(df)
+    err64 = max_rel_error(reference, add_indicators(df))
+    err32 = max_rel_error(reference, add_indicators(df, dtype='float32'))
+    t_ta = timeit(lambda: add_indicators_ta(df), repeat)
+    t_np = timeit(lambda: add_indicators(df), repeat)
+    t_32 = timeit(lambda: add_indicators(df, dtype='float32'), repeat)
+    print(f"{n:>9,} velas | ta: {t_ta*1000:9.2f} ms | numpy: {t_np*1000:8.2f} ms ({t_ta/t_np:5.1f}x) "
+          f"| float32: {t_32*1000:8.2f} ms ({t_ta/t_32:5.1f}x) | err64: {err64:.1e} | err32: {err32:.1e}")
+    assert err64 < 1e-9, "Los kernels float64 no coinciden con ta"
+    assert err32 < 1e-5, "Los kernels float32 no coinciden con ta"
+
+if __name__ == "__main__":
+    print("⏱️ Benchmark de indicadores (mejor de N repeticiones)")
+    run(500, repeat=200)
+    run(1_000_000, repeat=3)
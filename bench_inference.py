@@ -0,0 +1,56 @@
+# bench_inference.py
+"""
+Latencia de inferencia del modelo ML: ruta sklearn actual (predict +
+predict_proba sobre un DataFrame de una fila) frente a FlatForest (un solo
+recorrido sobre arrays). Verifica que las probabilidades son idénticas bit a bit.
+Ejecuta: python bench_inference.py
+"""
+import time
+import joblib
+import numpy as np
+from forest_inference import FlatForest
+from feature_pipeline import compute_features
+from bench_indicators import make_candles, timeit
+
+def latency(func, repeat):
+    """Mediana y p99 en microsegundos"""
+    samples = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        samples.append((time.perf_counter() - start) * 1e6)
+    return np.median(samples), np.percentile(samples, 99)
+
+def run():
+    model = joblib.load('ml_model.pkl')
+    feature_cols = joblib.load('feature_cols.pkl')
+    start = time.perf_counter()
+    forest = FlatForest.from_model(model)
+    print(f"🌲 {len(forest.roots)} árboles | {len(forest.feature)} nodos | profundidad {forest.depth} "
+          f"| exportado en {(time.perf_counter() - start)*1000:.1f} ms")
+
+    df = compute_features(make_candles(20_000), feature_cols)
+    X = df[feature_cols]
+    last_row = X.iloc[-1:]
+
+    # Igualdad exacta (sklearn secuencial: con n_jobs>1 el orden de suma entre hilos no es fijo)
+    model.set_params(n_jobs=1)
+    assert np.array_equal(model.predict_proba(X), forest.predict_proba(X.to_numpy())), "Probabilidades distintas"
+    print("✅ predict_proba idéntico bit a bit en 20.000 filas")
+
+    for n_jobs in (-1, 1):
+        model.set_params(n_jobs=n_jobs)
+        med, p99 = latency(lambda: (model.predict(last_row), model.predict_proba(last_row)), 200)
+        print(f"sklearn (n_jobs={n_jobs:>2}) predict + predict_proba, 1 fila: mediana {med:8.1f} µs | p99 {p99:8.1f} µs")
+    row = last_row.to_numpy()
+    med, p99 = latency(lambda: forest.predict_with_proba(row), 2000)
+    print(f"FlatForest predict_with_proba, 1 fila:           mediana {med:8.1f} µs | p99 {p99:8.1f} µs")
+
+    model.set_params(n_jobs=-1)
+    X_np = X.to_numpy()
+    t_sk = timeit(lambda: model.predict_proba(X), 3)
+    t_flat = timeit(lambda: forest.predict_proba(X_np), 3)
+    print(f"Lote de {len(X):,} filas | sklearn: {t_sk*1000:.1f} ms | FlatForest: {t_flat*1000:.1f} ms")
+
+if __name__ == "__main__":
+    run()
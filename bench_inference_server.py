@@ -0,0 +1,69 @@
+# bench_inference_server.py
+"""
+Servidor de inferencia compartido frente a un modelo por proceso: N agentes
+(procesos) piden señales a la vez por el socket Unix. Mide latencia por
+petición, peticiones por segundo y tamaño medio de lote, y verifica que las
+señales coinciden con las de MLAgent local.
+Ejecuta: python bench_inference_server.py [agentes] [peticiones_por_agente]
+"""
+import multiprocessing as mp
+import os
+import sys
+import tempfile
+import threading
+import time
+import numpy as np
+from ml_agent import MLAgent
+from inference_server import InferenceServer, InferenceClient
+from feature_pipeline import compute_features
+from bench_indicators import make_candles
+from bench_inference import latency
+
+def _agent(path, n_requests, seed, results):
+    client = InferenceClient(path)
+    df = compute_features(make_candles(2_000, seed=seed), client.feature_cols)
+    samples, signals = [], []
+    for i in range(n_requests):
+        window = df.iloc[:len(df) - n_requests + i + 1]
+        start = time.perf_counter()
+        signals.append(client.get_signal_from_dataframe(window))
+        samples.append(time.perf_counter() - start)
+    results.put((seed, samples, signals))
+
+def run(n_agents=8, n_requests=200):
+    path = os.path.join(tempfile.mkdtemp(), "inference.sock")
+    server = InferenceServer(path)
+    threading.Thread(target=server.run, daemon=True).start()
+    while not os.path.exists(path):
+        time.sleep(0.01)
+
+    local = MLAgent()
+    df = compute_features(make_candles(2_000, seed=0), local.group.feature_cols)
+    med, p99 = latency(lambda: local.get_signal_from_dataframe(df), 500)
+    print(f"MLAgent local, 1 agente:            mediana {med:8.1f} µs | p99 {p99:8.1f} µs")
+
+    results = mp.Queue()
+    agents = [mp.Process(target=_agent, args=(path, n_requests, seed, results)) for seed in range(n_agents)]
+    start = time.perf_counter()
+    for agent in agents:
+        agent.start()
+    outputs = [results.get() for _ in agents]
+    elapsed = time.perf_counter() - start
+    for agent in agents:
+        agent.join()
+
+    samples = np.concatenate([out[1] for out in outputs]) * 1e6
+    print(f"Servidor, {n_agents} agentes concurrentes:  mediana {np.median(samples):8.1f} µs | "
+          f"p99 {np.percentile(samples, 99):8.1f} µs | {len(samples) / elapsed:,.0f} peticiones/s "
+          f"| {server.stats['requests'] / max(server.stats['batches'], 1):.1f} filas por lote")
+
+    # Mismas señales que el modelo local
+    for seed, _, signals in outputs:
+        df = compute_features(make_candles(2_000, seed=seed), local.group.feature_cols)
+        expected = [local.get_signal_from_dataframe(df.iloc[:len(df) - n_requests + i + 1]) for i in range(n_requests)]
+        assert signals == expected, f"Señales distintas en el agente {seed}"
+    print("✅ Señales idénticas a MLAgent local")
+
+if __name__ == "__main__":
+    args = [int(arg) for arg in sys.argv[1:3]]
+    run(*args)
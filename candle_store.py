@@ -0,0 +1,237 @@
+# candle_store.py
+import json
+import logging
+import os
+import threading
+from pathlib import Path
+import numpy as np
+import pandas as pd
+from config import CANDLE_STORE_DIR
+
+OHLCV_COLUMNS = ['open', 'high', 'low', 'close', 'volume']
+# Una vela por registro: añadir velas nuevas es escribir al final del fichero
+RECORD_DTYPE = np.dtype([('timestamp', '<i8')] + [(col, '<f8') for col in OHLCV_COLUMNS])
+
+_TIMEFRAME_UNITS_MS = {
+    's': 1000,
+    'm': 60 * 1000,
+    'h': 60 * 60 * 1000,
+    'd': 24 * 60 * 60 * 1000,
+    'w': 7 * 24 * 60 * 60 * 1000,
+    'M': 30 * 24 * 60 * 60 * 1000,
+}
+
+def timeframe_to_ms(timeframe):
+    """Convierte un timeframe estilo ccxt ('5m', '1h', '1d') a milisegundos"""
+    amount, unit = timeframe[:-1], timeframe[-1]
+    if unit not in _TIMEFRAME_UNITS_MS or not amount.isdigit():
+        raise ValueError(f"Timeframe no soportado: {timeframe}")
+    return int(amount) * _TIMEFRAME_UNITS_MS[unit]
+
+def ohlcv_to_dataframe(ohlcv):
+    """Convierte la respuesta cruda de ccxt en el DataFrame estándar del bot"""
+    df = pd.DataFrame(ohlcv, columns=['timestamp'] + OHLCV_COLUMNS)
+    df['timestamp'] = pd.to_datetime(df['timestamp'], unit='ms')
+    df.set_index('timestamp', inplace=True)
+    return df.astype(float)
+
+def is_contiguous(df, timeframe):
+    """True si el índice no tiene huecos ni duplicados para el timeframe dado"""
+    if len(df) < 2:
+        return True
+    step = np.diff(df.index.values.astype('datetime64[ms]').astype(np.int64))
+    return bool((step == timeframe_to_ms(timeframe)).all())
+
+class CandleStore:
+    """
+    Almacén local de velas OHLCV por (símbolo, timeframe).
+    Cada serie se guarda en un fichero binario de registros (timestamp +
+    OHLCV) y se mantiene en memoria para que las lecturas repetidas no toquen
+    el disco. Al fusionar velas nuevas solo se reescribe la cola a partir de
+    la primera vela que cambia; si no cambia nada, no se escribe.
+    """
+    def __init__(self, root=CANDLE_STORE_DIR):
+        self.root = Path(root)
+        self.root.mkdir(parents=True, exist_ok=True)
+        self._frames = {}
+        self._lock = threading.Lock()
+
+    def _path(self, symbol, timeframe):
+        safe_symbol = symbol.replace("/", "").replace(":", "_").upper()
+        return self.root / f"{safe_symbol}_{timeframe}.bin"
+
+    def _read(self, symbol, timeframe):
+        key = (symbol, timeframe)
+        if key in self._frames:
+            return self._frames[key]
+
+        path = self._path(symbol, timeframe)
+        if not path.exists():
+            return self._migrate_npz(symbol, timeframe)
+
+        try:
+            size = path.stat().st_size
+            if size % RECORD_DTYPE.itemsize:
+                # Corte a mitad de una escritura: se descarta el registro incompleto
+                logging.warning(f"⚠️ Caché de velas {path.name} con un registro incompleto. Se recorta.")
+                with open(path, "r+b") as f:
+                    f.truncate(size - size % RECORD_DTYPE.itemsize)
+            df = _records_to_frame(np.fromfile(path, dtype=RECORD_DTYPE))
+        except Exception as e:
+            logging.warning(f"⚠️ Caché de velas corrupta en {path.name}: {e}. Se ignorará.")
+            return None
+
+        self._frames[key] = df
+        return df
+
+    def _migrate_npz(self, symbol, timeframe):
+        """Convierte una caché .npz del formato anterior al fichero de registros"""
+        legacy = self._path(symbol, timeframe).with_suffix('.npz')
+        if not legacy.exists():
+            return None
+        try:
+            with np.load(legacy) as data:
+                df = pd.DataFrame(
+                    {col: data[col] for col in OHLCV_COLUMNS},
+                    index=pd.to_datetime(data['timestamp'], unit='ms')
+                )
+            df.index.name = 'timestamp'
+        except Exception as e:
+            logging.warning(f"⚠️ Caché de velas corrupta en {legacy.name}: {e}. Se ignorará.")
+            return None
+        df = df.astype(float)
+        self._write(symbol, timeframe, df, keep_rows=0)
+        os.remove(legacy)
+        self._frames[(symbol, timeframe)] = df
+        return df
+
+    def _write(self, symbol, timeframe, df, keep_rows):
+        """
+        Deja en disco las primeras `keep_rows` velas y añade las de `df` detrás
+        (keep_rows=0: escritura completa y atómica).
+        """
+        path = self._path(symbol, timeframe)
+        records = _frame_to_records(df)
+        if keep_rows == 0:
+            tmp_path = path.with_suffix('.tmp')
+            records.tofile(tmp_path)
+            os.replace(tmp_path, path)  # escritura atómica
+        else:
+            with open(path, "r+b") as f:
+                f.truncate(keep_rows * RECORD_DTYPE.itemsize)
+                f.seek(keep_rows * RECORD_DTYPE.itemsize)
+                f.write(records.tobytes())
+
+    def _empty_path(self, symbol, timeframe):
+        return self._path(symbol, timeframe).with_suffix('.empty.json')
+
+    def _read_empty(self, symbol, timeframe):
+        try:
+            return [tuple(r) for r in json.loads(self._empty_path(symbol, timeframe).read_text())]
+        except FileNotFoundError:
+            return []
+        except ValueError as e:
+            logging.warning(f"⚠️ Registro de tramos vacíos corrupto para {symbol} {timeframe}: {e}. Se ignorará.")
+            return []
+
+    def empty_ranges(self, symbol, timeframe):
+        """Rangos [inicio, fin) en ms que el exchange ya devolvió sin velas"""
+        with self._lock:
+            return self._read_empty(symbol, timeframe)
+
+    def add_empty_ranges(self, symbol, timeframe, ranges):
+        """
+        Registra rangos sin velas (antes del listado, mantenimiento del
+        exchange) para que el backfill no vuelva a pedirlos.
+        """
+        if not ranges:
+            return
+        with self._lock:
+            merged = []
+            for start, end in sorted(self._read_empty(symbol, timeframe) + [tuple(r) for r in ranges]):
+                if merged and start <= merged[-1][1]:
+                    merged[-1][1] = max(merged[-1][1], int(end))
+                else:
+                    merged.append([int(start), int(end)])
+            path = self._empty_path(symbol, timeframe)
+            tmp_path = path.with_suffix('.tmp')
+            tmp_path.write_text(json.dumps(merged))
+            os.replace(tmp_path, path)
+
+    def load(self, symbol, timeframe, start=None, end=None):
+        """Devuelve el histórico guardado (opcionalmente recortado) o un DataFrame vacío"""
+        with self._lock:
+            df = self._read(symbol, timeframe)
+        if df is None:
+            return pd.DataFrame(columns=OHLCV_COLUMNS, index=pd.DatetimeIndex([], name='timestamp'), dtype=float)
+        if start is not None or end is not None:
+            df = df.loc[start:end]
+        return df
+
+    def last_timestamp(self, symbol, timeframe):
+        """Timestamp (pd.Timestamp) de la última vela guardada, o None"""
+        with self._lock:
+            df = self._read(symbol, timeframe)
+        if df is None or df.empty:
+            return None
+        return df.index[-1]
+
+    def merge(self, symbol, timeframe, df_new):
+        """
+        Fusiona velas nuevas con el histórico. Ante timestamps repetidos gana
+        la vela nueva (la última vela suele estar incompleta en la descarga anterior).
+        Solo se compara y reescribe la cola del histórico desde la primera vela
+        de `df_new`: en el sondeo normal, la última vela guardada y las nuevas.
+        """
+        if df_new is None or df_new.empty:
+            return self.load(symbol, timeframe)
+
+        if not df_new.index.is_monotonic_increasing or not df_new.index.is_unique:
+            df_new = df_new[~df_new.index.duplicated(keep='last')].sort_index()
+        df_new = df_new[OHLCV_COLUMNS].astype(float)
+
+        with self._lock:
+            df_old = self._read(symbol, timeframe)
+            if df_old is None or df_old.empty:
+                self._write(symbol, timeframe, df_new, keep_rows=0)
+                self._frames[(symbol, timeframe)] = df_new
+                return df_new
+
+            split = int(df_old.index.searchsorted(df_new.index[0], side='left'))
+            tail_old = df_old.iloc[split:]
+            if tail_old.empty:
+                tail = df_new
+            else:
+                tail = pd.concat([tail_old, df_new])
+                tail = tail[~tail.index.duplicated(keep='last')].sort_index()
+                if tail.index.equals(tail_old.index) and np.array_equal(tail.to_numpy(), tail_old.to_numpy()):
+                    return df_old  # Nada nuevo: ni copia ni escritura
+
+            self._write(symbol, timeframe, tail, keep_rows=split)
+            merged = pd.concat([df_old.iloc[:split], tail]) if split else tail
+            self._frames[(symbol, timeframe)] = merged
+            return merged
+
+def _frame_to_records(df):
+    records = np.empty(len(df), dtype=RECORD_DTYPE)
+    records['timestamp'] = df.index.values.astype('datetime64[ms]').astype(np.int64)
+    for col in OHLCV_COLUMNS:
+        records[col] = df[col].to_numpy(dtype=np.float64)
+    return records
+
+def _records_to_frame(records):
+    df = pd.DataFrame({col: records[col] for col in OHLCV_COLUMNS},
+                      index=pd.to_datetime(records['timestamp'], unit='ms'))
+    df.index.name = 'timestamp'
+    return df
+
+_store = None
+_store_lock = threading.Lock()
+
+def get_candle_store():
+    """Instancia compartida del almacén de velas (una por proceso)"""
+    global _store
+    with _store_lock:
+        if _store is None:
+            _store = CandleStore()
+        return _store
@@ -22,4 +22,78 @@ UPDATE_CAPITAL_EVERY_SECONDS = 30  # Frecuencia adicional de actualización6
 RISK_REWARD_RATIO = 2.0  # Ratio riesgo/recompensa (1:2)
 SL_BUFFER_MULTIPLIER = 1.5  # Holgura adicional para SL en mercados volátiles
 MAX_LEVERAGE_DYNAMIC = 3  # Apalancamiento máximo dinámico
-VOLATILITY_THRESHOLD = 0.02  # 2% de volatilidad para considerar mercado volátil
\ No newline at end of file
+VOLATILITY_THRESHOLD = 0.02  # 2% de volatilidad para considerar mercado volátil
+
+# Caché local de velas (ver candle_store.py)
+USE_CANDLE_STORE = True
+CANDLE_STORE_DIR = "data_cache"
+
+# Descarga histórica paginada (ver backfill.py)
+BACKFILL_PAGE_LIMIT = 1000          # velas por petición (Binance limita a ~1000-1500)
+BACKFILL_MAX_WORKERS = 4            # descargas simultáneas
+BACKFILL_REQUESTS_PER_SECOND = 8    # presupuesto de peticiones para no agotar el rate limit
+
+# Datos de mercado: "poll" (REST cada EXECUTION_TIMEFRAME) o "stream" (websocket, reacciona al cierre de vela)
+MARKET_DATA_MODE = "poll"
+STREAM_BUFFER_SIZE = 1000  # velas en memoria por (símbolo, timeframe)
+
+
+# Optimización de parámetros (ver learner.py)
+OPTIMIZER_WORKERS = None     # procesos para evaluar candidatos (None = todos los núcleos, 1 = secuencial)
+OPTIMIZER_BATCH_SIZE = None  # candidatos por ronda ask/tell (None = uno por worker)
+
+# Validación walk-forward (ver walk_forward.py)
+WALK_FORWARD_TRAIN_DAYS = 60  # ventana de optimización/entrenamiento
+WALK_FORWARD_TEST_DAYS = 15   # ventana fuera de muestra que sigue a cada train
+WALK_FORWARD_WORKERS = None   # folds en paralelo (None = todos los núcleos)
+
+# Modelo ML (ver model_loader.py)
+MODEL_PATH = "ml_model.pkl"
+FEATURE_COLS_PATH = "feature_cols.pkl"
+MODEL_CACHE_DIR = "model_cache"      # bosque aplanado en .npy (memory-mapped)
+MODEL_RELOAD_CHECK_SECONDS = 30      # cada cuánto se mira si el modelo cambió en disco
+
+# Registro de modelos versionados (ver model_registry.py)
+MODEL_REGISTRY_DIR = "model_registry"
+SHADOW_LOG_FILE = "shadow_signals.jsonl"  # señales del modelo activo vs modelos sombra
+
+# Almacén de features para entrenamiento y backtests (ver feature_store.py)
+USE_FEATURE_STORE = True
+FEATURE_STORE_DIR = "feature_store"
+
+# Actualización incremental del modelo (ver ml_trainer.py --incremental)
+INCREMENTAL_WINDOW_DAYS = 60      # velas recientes con las que se entrenan los árboles nuevos
+INCREMENTAL_NEW_TREES = 20        # árboles añadidos en cada actualización
+INCREMENTAL_MAX_TREES = 100       # tamaño máximo del bosque: se retiran los árboles más antiguos
+INCREMENTAL_MAX_AGE_DAYS = None   # retira también árboles cuyos datos acaban N días antes que los más recientes (None = sin límite)
+
+# Búsqueda de hiperparámetros del modelo ML (ver model_search.py)
+ML_CONFIDENCE_THRESHOLD = 0.4       # confianza mínima de MLAgent si el modelo no trae la suya
+ML_PARAMS_FILE = "best_model_params.pkl"
+MODEL_SEARCH_FILE = "model_search.jsonl"  # resultados por candidato: una búsqueda interrumpida se reanuda
+MODEL_SEARCH_DAYS = 365
+MODEL_SEARCH_FOLDS = 4              # folds temporales (train acumulado, test a continuación)
+MODEL_SEARCH_TEST_DAYS = 30
+MODEL_SEARCH_CALLS = 40
+MODEL_SEARCH_WORKERS = None         # procesos (None = todos los núcleos)
+
+# Compactación del modelo (ver model_compaction.py)
+COMPACT_VALIDATION_DAYS = 60
+COMPACT_TREES = 40                # árboles conservados (selección voraz por log-loss en validación)
+COMPACT_MIN_NODE_FRACTION = 0.002  # nodos con menos peso de muestras (fracción del árbol) pasan a hoja
+COMPACT_MIN_IMPORTANCE = 0.0      # features con menos importancia salen de feature_cols
+COMPACT_MAX_DEPTH = None          # profundidad máxima (None = la del modelo)
+
+# Servidor de inferencia compartido por varios agentes (ver inference_server.py)
+USE_INFERENCE_SERVER = False      # True: los agentes piden las señales al servidor (si no responde, modelo local)
+INFERENCE_SOCKET = "/tmp/tradingbot_inference.sock"
+INFERENCE_BATCH_WINDOW_MS = 2     # espera máxima para juntar peticiones en un lote
+INFERENCE_MAX_BATCH = 256
+INFERENCE_TIMEOUT_SECONDS = 2.0
+
+# Estado de la cuenta compartido dentro de un ciclo del agente (ver TradeExecutor.account_snapshot)
+ACCOUNT_SNAPSHOT_TTL_SECONDS = 10  # saldo, posiciones y órdenes abiertas se reutilizan durante este tiempo
+
+# Libro local de órdenes y posiciones por stream de usuario (ver account_stream.py)
+USE_USER_DATA_STREAM = False      # True (live futures): limpieza y cierres consultan el libro en memoria en lugar de REST
+ACCOUNT_RECONCILE_SECONDS = 300   # cada cuánto se reconcilia el libro con REST (cubre eventos perdidos)
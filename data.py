@@ -4,67 +4,36 @@ import pandas as pd
 import logging
 import time
 import requests
-from requests.adapters import HTTPAdapter
-from urllib3.util.retry import Retry
-from config import BINANCE_API_KEY, BINANCE_API_SECRET, TRADING_MODE
+from config import TRADING_MODE, USE_CANDLE_STORE
+from exchange_pool import get_client
+from candle_store import get_candle_store, ohlcv_to_dataframe, timeframe_to_ms, is_contiguous
 
 def get_exchange():
     """
-    Crea una instancia de Binance con reintentos HTTP integrados.
+    Devuelve el cliente de Binance compartido (sesión HTTP con reintentos
+    y pool de conexiones), reutilizado entre llamadas.
     """
-    # Configurar reintentos HTTP inteligentes
-    session = requests.Session()
-    retries = Retry(
-        total=5,  # máximo 5 intentos
-        backoff_factor=1,  # espera: 1s, 2s, 4s, 8s...
-        status_forcelist=[429, 500, 502, 503, 504],  # códigos a reintentar
-        allowed_methods=["GET", "POST"]  # métodos seguros para reintentar
-    )
-    session.mount('https://', HTTPAdapter(max_retries=retries))
-    
-    # Crear exchange con sesión personalizada
-    if TRADING_MODE == "futures":
-        exchange = ccxt.binanceusdm({
-            'apiKey': BINANCE_API_KEY,
-            'secret': BINANCE_API_SECRET,
-            'enableRateLimit': True,
-            'options': {
-                'adjustForTimeDifference': True,
-                'defaultType': 'future'
-            },
-            'session': session
-        })
-    else:
-        exchange = ccxt.binance({
-            'apiKey': BINANCE_API_KEY,
-            'secret': BINANCE_API_SECRET,
-            'enableRateLimit': True,
-            'options': {
-                'adjustForTimeDifference': True
-            },
-            'session': session
-        })
-    
-    return exchange
+    return get_client(TRADING_MODE)
 
-def fetch_ohlcv(symbol, timeframe, limit=500):
+def _download_ohlcv(symbol, timeframe, limit, since=None, allow_empty=False):
     """
-    Descarga datos OHLCV con reintentos automáticos para errores de red.
+    Descarga velas de Binance con reintentos automáticos para errores de red.
+    allow_empty=True devuelve un DataFrame vacío en vez de fallar (útil al
+    paginar rangos históricos anteriores al listado del símbolo).
     """
     max_retries = 5
     for attempt in range(max_retries):
         try:
             exchange = get_exchange()
-            ohlcv = exchange.fetch_ohlcv(symbol, timeframe, limit=limit)
+            ohlcv = exchange.fetch_ohlcv(symbol, timeframe, since=since, limit=limit)
             
             # Validar datos
             if not ohlcv or len(ohlcv) == 0:
+                if allow_empty:
+                    return ohlcv_to_dataframe([])
                 raise ValueError("Datos vacíos recibidos de Binance")
             
-            df = pd.DataFrame(ohlcv, columns=['timestamp', 'open', 'high', 'low', 'close', 'volume'])
-            df['timestamp'] = pd.to_datetime(df['timestamp'], unit='ms')
-            df.set_index('timestamp', inplace=True)
-            return df.astype(float)
+            return ohlcv_to_dataframe(ohlcv)
             
         except (requests.exceptions.ConnectionError, 
                 requests.exceptions.Timeout,
@@ -96,4 +65,32 @@ def fetch_ohlcv(symbol, timeframe, limit=500):
                 raise e
             time.sleep(5)
     
-    raise Exception(f"No se pudieron obtener datos de {symbol} después de {max_retries} intentos")
\ No newline at end of file
+    raise Exception(f"No se pudieron obtener datos de {symbol} después de {max_retries} intentos")
+
+def fetch_ohlcv(symbol, timeframe, limit=500, use_cache=USE_CANDLE_STORE):
+    """
+    Devuelve las últimas `limit` velas OHLCV.
+    Con caché activa solo se descargan las velas posteriores a la última
+    guardada (re-descargando esa última, que pudo quedar incompleta).
+    """
+    if not use_cache:
+        return _download_ohlcv(symbol, timeframe, limit)
+
+    store = get_candle_store()
+    last_ts = store.last_timestamp(symbol, timeframe)
+    tf_ms = timeframe_to_ms(timeframe)
+
+    if last_ts is not None:
+        last_ms = int(last_ts.value // 1_000_000)
+        now_ms = int(time.time() * 1000)
+        missing = (now_ms - last_ms) // tf_ms + 1
+        if missing < limit:
+            df_new = _download_ohlcv(symbol, timeframe, limit=int(missing) + 1, since=last_ms)
+            window = store.merge(symbol, timeframe, df_new).iloc[-limit:]
+            if len(window) == limit and is_contiguous(window, timeframe):
+                return window
+            logging.info(f"🗂️ Caché de {symbol} {timeframe} incompleta. Descargando ventana completa...")
+
+    df = _download_ohlcv(symbol, timeframe, limit)
+    store.merge(symbol, timeframe, df)
+    return df
@@ -0,0 +1,73 @@
+# exchange_pool.py
+import ccxt
+import logging
+import threading
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+from config import BINANCE_API_KEY, BINANCE_API_SECRET, TRADING_MODE
+
+_lock = threading.RLock()
+_session = None
+_clients = {}
+_markets_loaded = set()
+
+def _client_key(trading_mode):
+    return ('binanceusdm', 'future') if trading_mode == "futures" else ('binance', 'spot')
+
+def get_http_session():
+    """
+    Sesión HTTP compartida por todo el proceso (keep-alive + pool de conexiones),
+    con reintentos HTTP integrados.
+    """
+    global _session
+    with _lock:
+        if _session is None:
+            session = requests.Session()
+            retries = Retry(
+                total=5,  # máximo 5 intentos
+                backoff_factor=1,  # espera: 1s, 2s, 4s, 8s...
+                status_forcelist=[429, 500, 502, 503, 504],  # códigos a reintentar
+                allowed_methods=["GET", "POST"]  # métodos seguros para reintentar
+            )
+            adapter = HTTPAdapter(pool_connections=4, pool_maxsize=16, max_retries=retries)
+            session.mount('https://', adapter)
+            _session = session
+        return _session
+
+def get_client(trading_mode=TRADING_MODE):
+    """
+    Devuelve el cliente ccxt compartido para el tipo de mercado indicado.
+    Se crea una sola vez por proceso; la sincronización de hora se hace
+    en la primera carga de mercados y no se repite.
+    """
+    key = _client_key(trading_mode)
+    with _lock:
+        client = _clients.get(key)
+        if client is None:
+            exchange_id, market_type = key
+            exchange_class = getattr(ccxt, exchange_id)
+            client = exchange_class({
+                'apiKey': BINANCE_API_KEY,
+                'secret': BINANCE_API_SECRET,
+                'enableRateLimit': True,
+                'options': {
+                    'adjustForTimeDifference': True,
+                    'defaultType': market_type,
+                    'warnOnFetchOpenOrdersWithoutSymbol': False
+                },
+                'session': get_http_session()
+            })
+            _clients[key] = client
+            logging.info(f"🔌 Cliente {exchange_id} ({market_type}) creado")
+        return client
+
+def load_markets(trading_mode=TRADING_MODE, reload=False):
+    """Carga los mercados una sola vez por (exchange, tipo de mercado)"""
+    key = _client_key(trading_mode)
+    client = get_client(trading_mode)
+    with _lock:
+        if reload or key not in _markets_loaded:
+            client.load_markets(reload)
+            _markets_loaded.add(key)
+    return client.markets
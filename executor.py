@@ -1,43 +1,89 @@
 # executor.py
-import ccxt
 import logging
 import pandas as pd
 import time
-from config import BINANCE_API_KEY, BINANCE_API_SECRET, MODE, TRADING_MODE, LEVERAGE
+from concurrent.futures import ThreadPoolExecutor
+from config import MODE, TRADING_MODE, LEVERAGE, ACCOUNT_SNAPSHOT_TTL_SECONDS, USE_USER_DATA_STREAM, ACCOUNT_RECONCILE_SECONDS
+from exchange_pool import get_client, load_markets
+from account_stream import AccountBook, BinanceUserDataSource, UserDataFeed, OPEN_STATUSES
+
+class AccountSnapshot:
+    """
+    Foto del estado de la cuenta (saldo, posiciones abiertas y órdenes
+    abiertas del símbolo) compartida por todos los consumidores de un ciclo.
+    Cada parte se descarga la primera vez que se pide y no se vuelve a pedir
+    mientras la foto siga vigente. Con el libro local al día (stream de
+    usuario), posiciones y órdenes se leen de él sin llamar a REST.
+    """
+    def __init__(self, executor):
+        self.executor = executor
+        self.created = time.monotonic()
+        self._balance = None
+        self._positions = None
+        self._open_orders = None
+
+    def age(self):
+        return time.monotonic() - self.created
+
+    @property
+    def balance(self):
+        if self._balance is None:
+            self._balance = self.executor._fetch_balance()
+        return self._balance
+
+    @property
+    def positions(self):
+        if self.executor._book_ready():
+            return self.executor.book.positions()
+        if self._positions is None:
+            self._positions = self.executor._fetch_open_positions(self.executor.symbol)
+        return self._positions
+
+    @property
+    def open_orders(self):
+        if self.executor._book_ready():
+            return self.executor.book.open_orders()
+        if self._open_orders is None:
+            self._open_orders = self.executor._fetch_open_orders(self.executor.symbol)
+        return self._open_orders
 
 class TradeExecutor:
-    def __init__(self, symbol):
+    def __init__(self, symbol, exchange=None):
+        """exchange: cliente ccxt ya creado (p. ej. uno falso en pruebas); None = el compartido de exchange_pool"""
         self.symbol = symbol
         self.exchange = None
-        self._init_exchange()
+        self._snapshot = None
+        self._leverage_ready = False
+        # SL y TP se envían en paralelo justo después de abrir la posición
+        self._protection_pool = ThreadPoolExecutor(max_workers=2, thread_name_prefix="proteccion")
+        self.last_order_timings = {}
+        # Órdenes y posiciones en memoria, al día por el stream de usuario
+        self.book = AccountBook()
+        self.account_feed = None
+        self._init_exchange(exchange)
         logging.info(f"💱 Ejecutor inicializado para {symbol} en modo {TRADING_MODE}")
 
-    def _init_exchange(self):
+    def _init_exchange(self, exchange=None):
         """Inicializa la conexión con Binance y carga los mercados"""
         if MODE == "live":
-            exchange_config = {
-                'apiKey': BINANCE_API_KEY,
-                'secret': BINANCE_API_SECRET,
-                'enableRateLimit': True,
-                'options': {
-                    'adjustForTimeDifference': True,
-                    'defaultType': 'future' if TRADING_MODE == "futures" else 'spot',
-                    'warnOnFetchOpenOrdersWithoutSymbol': False
-                }
-            }
-            
+            # Cliente compartido con data.py (misma sesión HTTP y mercados)
+            self.exchange = exchange or get_client(TRADING_MODE)
             if TRADING_MODE == "futures":
-                self.exchange = ccxt.binanceusdm(exchange_config)
                 logging.info("🚀 Conectado a Binance USD-M Futures")
             else:
-                self.exchange = ccxt.binance(exchange_config)
                 logging.info("🚀 Conectado a Binance Spot")
             
             try:
-                self.exchange.load_markets()
+                load_markets(TRADING_MODE)
                 logging.info("✅ Mercados cargados correctamente")
             except Exception as e:
                 logging.warning(f"⚠️ Error al cargar mercados: {str(e)}")
+            
+            # Apalancamiento fijado al arrancar: place_order no paga esa llamada al abrir
+            self._set_leverage()
+            
+            if TRADING_MODE == "futures" and USE_USER_DATA_STREAM:
+                self.start_account_stream()
         else:
             logging.info("🎭 Modo PAPER: Sin conexión real a Binance")
 
@@ -54,83 +100,140 @@ class TradeExecutor:
         
         try:
             # Asegurar que los mercados están cargados
-            if not hasattr(self.exchange, 'markets') or not self.exchange.markets:
-                self.exchange.load_markets()
+            load_markets(TRADING_MODE)
             
             normalized_symbol = self._normalize_symbol(self.symbol)
             market = self.exchange.market(normalized_symbol)
             symbol_id = market['id']
             
             self.exchange.set_leverage(LEVERAGE, symbol_id)
+            self._leverage_ready = True
             logging.info(f"⚙️ Apalancamiento configurado a {LEVERAGE}x para {self.symbol}")
         except Exception as e:
             logging.warning(f"⚠️ No se pudo establecer apalancamiento: {str(e)}")
             logging.warning("ℹ️ Continuando sin cambiar apalancamiento. Verifica en Binance Web.")
 
+    def account_snapshot(self, max_age=ACCOUNT_SNAPSHOT_TTL_SECONDS):
+        """
+        Estado de la cuenta reutilizable: la misma foto sirve a todas las
+        comprobaciones del ciclo mientras tenga menos de `max_age` segundos.
+        Los errores de la API se propagan (cada consumidor ya los gestiona).
+        """
+        if self._snapshot is None or self._snapshot.age() >= max_age:
+            self._snapshot = AccountSnapshot(self)
+        return self._snapshot
+
+    def start_account_stream(self, source=None):
+        """Arranca el stream de usuario que mantiene el libro local (fuente: Binance o un stub de pruebas)"""
+        self.account_feed = UserDataFeed(source or BinanceUserDataSource(self.symbol), self.book)
+        self.account_feed.start()
+        self.reconcile_book(force=True)
+        logging.info(f"📒 Libro local de órdenes y posiciones activo para {self.symbol}")
+
+    def _book_ready(self):
+        return self.account_feed is not None and self.book.is_live()
+
+    def reconcile_book(self, force=False):
+        """
+        Fallback del stream: sustituye el libro por el estado REST (órdenes
+        abiertas y posiciones) cada ACCOUNT_RECONCILE_SECONDS, o tras una
+        reconexión. No hace nada si no toca.
+        """
+        if self.account_feed is None:
+            return
+        if not force and not self.book.needs_reconcile(ACCOUNT_RECONCILE_SECONDS):
+            return
+        epoch = self.book.epoch  # una (re)conexión durante la descarga obliga a reconciliar otra vez
+        try:
+            open_orders = self._fetch_open_orders(self.symbol)
+            positions = self._fetch_open_positions(self.symbol)
+        except Exception as e:
+            logging.warning(f"⚠️ No se pudo reconciliar el libro local: {str(e)}")
+            return
+        before = (len(self.book.open_orders()), len(self.book.positions()))
+        self.book.reconcile(open_orders, positions, epoch)
+        after = (len(open_orders), len(positions))
+        if before != after:
+            logging.info(f"📒 Libro reconciliado | Órdenes: {before[0]} → {after[0]} | Posiciones: {before[1]} → {after[1]}")
+
+    def invalidate_snapshot(self):
+        """Descarta la foto de la cuenta tras crear o cancelar órdenes"""
+        self._snapshot = None
+
+    def _fetch_balance(self):
+        """Saldo en USDT: total en futures, libre en spot"""
+        if MODE != "live" or not self.exchange:
+            return 1000.0  # Saldo simulado en modo paper
+        
+        # ✅ MÉTODO CORRECTO PARA FUTURES EN CCXT
+        balance = self.exchange.fetch_balance()
+        key = 'total' if TRADING_MODE == "futures" else 'free'
+        if 'USDT' in balance and isinstance(balance['USDT'], dict):
+            usdt_balance = balance['USDT'].get(key, 0.0)
+        elif hasattr(balance, 'USDT') and hasattr(balance.USDT, key):
+            usdt_balance = getattr(balance.USDT, key)
+        else:
+            usdt_balance = 0.0
+        return float(usdt_balance or 0.0)
+
+    def _fetch_open_positions(self, symbol=None):
+        """Posiciones con contratos abiertos (futures en modo live)"""
+        if MODE != "live" or TRADING_MODE != "futures" or not self.exchange:
+            return []
+        
+        # ✅ MÉTODO CORRECTO EN CCXT
+        if symbol:
+            normalized_symbol = self._normalize_symbol(symbol)
+            positions = self.exchange.fetch_positions([normalized_symbol])
+        else:
+            positions = self.exchange.fetch_positions()
+        return [p for p in positions if float(p['contracts']) > 0]
+
+    def _fetch_open_orders(self, symbol):
+        if MODE != "live" or not self.exchange:
+            return []
+        normalized_symbol = self._normalize_symbol(symbol)
+        return self.exchange.fetch_open_orders(normalized_symbol)
+
     def get_account_balance(self):
         """Obtiene el saldo disponible en USDT para trading"""
         try:
-            if MODE != "live" or not self.exchange:
-                return 1000.0  # Saldo simulado en modo paper
-            
-            if TRADING_MODE == "futures":
-                # ✅ MÉTODO CORRECTO PARA FUTURES EN CCXT
-                balance = self.exchange.fetch_balance()
-                if 'USDT' in balance and isinstance(balance['USDT'], dict):
-                    usdt_balance = balance['USDT'].get('total', 0.0)
-                elif hasattr(balance, 'USDT') and hasattr(balance.USDT, 'total'):
-                    usdt_balance = balance.USDT.total
-                else:
-                    usdt_balance = 0.0
-                return float(usdt_balance)
-            else:
-                # Para spot
-                balance = self.exchange.fetch_balance()
-                if 'USDT' in balance and isinstance(balance['USDT'], dict):
-                    usdt_balance = balance['USDT'].get('free', 0.0)
-                else:
-                    usdt_balance = 0.0
-                return float(usdt_balance)
+            return self._fetch_balance()
         except Exception as e:
             logging.error(f"❌ Error al obtener saldo real: {str(e)}")
             return 1000.0  # Valor por defecto seguro
 
     def fetch_positions(self, symbol=None):
         """Obtiene posiciones abiertas (solo para futures en modo live)"""
-        if MODE != "live" or TRADING_MODE != "futures" or not self.exchange:
-            return []
-        
         try:
-            # ✅ MÉTODO CORRECTO EN CCXT
-            if symbol:
-                normalized_symbol = self._normalize_symbol(symbol)
-                positions = self.exchange.fetch_positions([normalized_symbol])
-            else:
-                positions = self.exchange.fetch_positions()
-            
-            return [p for p in positions if float(p['contracts']) > 0]
+            return self._fetch_open_positions(symbol)
         except Exception as e:
             logging.warning(f"⚠️ Error al obtener posiciones: {str(e)}")
             return []
 
     def cancel_order_if_exists(self, order_id, symbol):
-        """Cancela una orden SOLO si existe y está abierta"""
+        """Cancela una orden SOLO si existe y está abierta (estado del libro local si lo conoce)"""
         if not order_id:
             return False
         
         try:
             normalized_symbol = self._normalize_symbol(symbol)
-            order = self.exchange.fetch_order(order_id, normalized_symbol)
+            status = self.book.order_status(order_id) if self._book_ready() else None
+            if status is None:
+                status = self.exchange.fetch_order(order_id, normalized_symbol)['status']
             
-            if order['status'] in ['open', 'partially_filled']:
+            if status in OPEN_STATUSES:
                 self.exchange.cancel_order(order_id, normalized_symbol)
-                logging.info(f"✅ Orden cancelada correctamente | ID: {order_id} | Estado: {order['status']}")
+                self.book.apply_order({'id': order_id, 'status': 'canceled'})
+                self.invalidate_snapshot()
+                logging.info(f"✅ Orden cancelada correctamente | ID: {order_id} | Estado: {status}")
                 return True
             else:
-                logging.info(f"ℹ️ Orden ya cerrada | ID: {order_id} | Estado: {order['status']}")
+                logging.info(f"ℹ️ Orden ya cerrada | ID: {order_id} | Estado: {status}")
                 return False
         except Exception as e:
             if 'Order does not exist' in str(e) or 'Unknown order sent' in str(e):
+                self.book.apply_order({'id': order_id, 'status': 'closed'})
                 logging.info(f"ℹ️ Orden ya ejecutada o cancelada | ID: {order_id}")
                 return False
             logging.warning(f"⚠️ Error cancelando orden {order_id}: {str(e)}")
@@ -138,6 +241,8 @@ class TradeExecutor:
 
     def get_open_orders_for_symbol(self, symbol):
         """Obtiene todas las órdenes abiertas para un símbolo"""
+        if symbol == self.symbol and self._book_ready():
+            return self.book.open_orders()
         try:
             normalized_symbol = self._normalize_symbol(symbol)
             return self.exchange.fetch_open_orders(normalized_symbol)
@@ -151,16 +256,19 @@ class TradeExecutor:
             normalized_symbol = self._normalize_symbol(symbol)
             logging.info(f"🔍 ANALIZANDO ÓRDENES para {normalized_symbol}...")
             
-            # Obtener TODAS las órdenes abiertas y posiciones
-            open_orders = self.exchange.fetch_open_orders(normalized_symbol)
-            positions = self.exchange.fetch_positions([normalized_symbol])
+            # Obtener TODAS las órdenes abiertas y posiciones (libro local o foto del ciclo si es reciente)
+            if symbol == self.symbol:
+                snapshot = self.account_snapshot()
+                open_orders, positions = snapshot.open_orders, snapshot.positions
+            else:
+                open_orders = self._fetch_open_orders(symbol)
+                positions = self._fetch_open_positions(symbol)
             
             # Identificar posiciones abiertas reales
             open_position_sizes = {}
             for pos in positions:
-                if float(pos['contracts']) > 0:
-                    side = pos['side'].upper()  # LONG o SHORT
-                    open_position_sizes[side] = float(pos['contracts'])
+                side = pos['side'].upper()  # LONG o SHORT
+                open_position_sizes[side] = float(pos['contracts'])
             
             canceled_count = 0
             preserved_count = 0
@@ -182,11 +290,14 @@ class TradeExecutor:
                 # ✅ CANCELAR SOLO ÓRDENES HUÉRFANAS (sin posición asociada)
                 try:
                     self.exchange.cancel_order(order_id, normalized_symbol)
+                    self.book.apply_order({'id': order_id, 'status': 'canceled'})
                     canceled_count += 1
                     logging.info(f"✅ CANCELADA | {order_type} | ID: {order_id} | Razón: Huérfana")
                 except Exception as e:
                     logging.warning(f"⚠️ Error cancelando {order_id}: {str(e)}")
             
+            if canceled_count:
+                self.invalidate_snapshot()
             logging.info(f"✅ LIMPIEZA COMPLETADA | Preservadas: {preserved_count} | Canceladas: {canceled_count}")
             return canceled_count
             
@@ -194,6 +305,35 @@ class TradeExecutor:
             logging.error(f"❌ ERROR EN LIMPIEZA: {str(e)}")
             return 0
 
+    def _create_protection_order(self, order_type, side, amount, stop_price, normalized_symbol):
+        """
+        Crea una orden SL (STOP_MARKET) o TP (TAKE_PROFIT_MARKET) que cierra toda
+        la posición. Devuelve (id o None si falla, segundos hasta la respuesta).
+        """
+        name, emoji = ('Stop Loss', '🛑') if order_type == 'STOP_MARKET' else ('Take Profit', '🎯')
+        logging.info(f"{emoji} Creando {name}: {side} {amount} @ {stop_price}")
+        start = time.perf_counter()
+        try:
+            order = self.exchange.create_order(
+                symbol=normalized_symbol,
+                type=order_type,
+                side=side,
+                amount=amount,
+                params={
+                    'stopPrice': stop_price,
+                    'closePosition': True,  # Cierra TODA la posición
+                    'workingType': 'CONTRACT_PRICE',
+                    'priceProtect': True
+                }
+            )
+            order_id = order.get('id', 'N/A')
+            self.book.apply_order(order)
+            logging.info(f"{emoji} {name} creado | ID: {order_id} | Precio: {stop_price:.2f}")
+        except Exception as e:
+            order_id = None
+            logging.error(f"❌ Error creando {name}: {str(e)}")
+        return order_id, time.perf_counter() - start
+
     def place_order(self, side, amount, price=None, sl_price=None, tp_price=None):
         """
         Ejecuta órdenes en Binance USD-M Futures con gestión robusta de SL/TP
@@ -216,71 +356,61 @@ class TradeExecutor:
         else:
             try:
                 if TRADING_MODE == "futures":
+                    timings = {}
                     normalized_symbol = self._normalize_symbol(self.symbol)
-                    self._set_leverage()
+                    if not self._leverage_ready:
+                        # Normalmente ya se fijó al arrancar (fuera del camino crítico)
+                        start = time.perf_counter()
+                        self._set_leverage()
+                        timings['leverage'] = time.perf_counter() - start
                     
-                    # 1. Verificar si ya hay una posición abierta
-                    positions = self.fetch_positions(normalized_symbol)
+                    # 1. Verificar si ya hay una posición abierta: lectura REST fresca, nunca la
+                    # foto del ciclo ni el libro local (está fuera de la ventana fill → protección)
+                    start = time.perf_counter()
+                    positions = self._fetch_open_positions(self.symbol)
+                    timings['position_check'] = time.perf_counter() - start
                     if positions:
                         logging.warning(f"⚠️ YA EXISTE UNA POSICIÓN ABIERTA. No se abrirá nueva posición.")
                         return None
                     
                     # 2. Abrir posición con orden de mercado
                     logging.info(f"🔵 Abriendo posición MARKET: {side.upper()} {amount} {normalized_symbol}")
+                    start = time.perf_counter()
                     market_order = self.exchange.create_order(
                         symbol=normalized_symbol,
                         type='MARKET',
                         side=side.upper(),
                         amount=amount
                     )
+                    filled = time.perf_counter()
+                    timings['market'] = filled - start
                     market_order_id = market_order.get('id', 'N/A')
-                    logging.info(f"✅ Posición abierta: {side.upper()} {amount:.6f} de {normalized_symbol} | ID: {market_order_id}")
-                    
-                    # 3. Crear órdenes SL/TP por separado
-                    sl_order_id = None
-                    tp_order_id = None
+                    self.invalidate_snapshot()
                     
+                    # 3. Crear SL y TP a la vez, justo después del fill: la posición queda
+                    # sin protección un solo viaje de ida y vuelta en lugar de dos. Ambas
+                    # patas comparten el cliente ccxt síncrono: cada llamada es una petición
+                    # independiente sobre el pool de conexiones de la sesión HTTP compartida
+                    close_side = 'SELL' if side.upper() == 'BUY' else 'BUY'
+                    legs = {}
                     if sl_price is not None:
-                        sl_side = 'SELL' if side.upper() == 'BUY' else 'BUY'
-                        logging.info(f"🛑 Creando Stop Loss: {sl_side} {amount} @ {sl_price}")
-                        try:
-                            sl_order = self.exchange.create_order(
-                                symbol=normalized_symbol,
-                                type='STOP_MARKET',
-                                side=sl_side,
-                                amount=amount,
-                                params={
-                                    'stopPrice': sl_price,
-                                    'closePosition': True,  # Cierra TODA la posición
-                                    'workingType': 'CONTRACT_PRICE',
-                                    'priceProtect': True
-                                }
-                            )
-                            sl_order_id = sl_order.get('id', 'N/A')
-                            logging.info(f"🛑 Stop Loss creado | ID: {sl_order_id} | Precio: {sl_price:.2f}")
-                        except Exception as e:
-                            logging.error(f"❌ Error creando Stop Loss: {str(e)}")
-                    
+                        legs['sl'] = self._protection_pool.submit(
+                            self._create_protection_order, 'STOP_MARKET', close_side, amount, sl_price, normalized_symbol)
                     if tp_price is not None:
-                        tp_side = 'SELL' if side.upper() == 'BUY' else 'BUY'
-                        logging.info(f"🎯 Creando Take Profit: {tp_side} {amount} @ {tp_price}")
-                        try:
-                            tp_order = self.exchange.create_order(
-                                symbol=normalized_symbol,
-                                type='TAKE_PROFIT_MARKET',
-                                side=tp_side,
-                                amount=amount,
-                                params={
-                                    'stopPrice': tp_price,
-                                    'closePosition': True,  # Cierra TODA la posición
-                                    'workingType': 'CONTRACT_PRICE',
-                                    'priceProtect': True
-                                }
-                            )
-                            tp_order_id = tp_order.get('id', 'N/A')
-                            logging.info(f"🎯 Take Profit creado | ID: {tp_order_id} | Precio: {tp_price:.2f}")
-                        except Exception as e:
-                            logging.error(f"❌ Error creando Take Profit: {str(e)}")
+                        legs['tp'] = self._protection_pool.submit(
+                            self._create_protection_order, 'TAKE_PROFIT_MARKET', close_side, amount, tp_price, normalized_symbol)
+                    logging.info(f"✅ Posición abierta: {side.upper()} {amount:.6f} de {normalized_symbol} | ID: {market_order_id}")
+                    
+                    order_ids = {}
+                    for leg, future in legs.items():
+                        order_ids[leg], timings[leg] = future.result()
+                    sl_order_id = order_ids.get('sl')
+                    tp_order_id = order_ids.get('tp')
+                    if legs:
+                        timings['unprotected'] = time.perf_counter() - filled
+                    self.last_order_timings = timings
+                    logging.info("⏱️ Tiempos de la orden | " + " | ".join(
+                        f"{leg}: {elapsed * 1000:.0f} ms" for leg, elapsed in timings.items()))
                     
                     # 4. Devolver IDs para seguimiento
                     return {
@@ -288,7 +418,8 @@ class TradeExecutor:
                         'sl_order_id': sl_order_id,
                         'tp_order_id': tp_order_id,
                         'id': market_order_id,
-                        'symbol': normalized_symbol
+                        'symbol': normalized_symbol,
+                        'timings': timings
                     }
                 
                 else:
@@ -336,6 +467,7 @@ class TradeExecutor:
                     params={'reduceOnly': True}
                 )
                 order_id = order.get('id', 'N/A')
+                self.invalidate_snapshot()
                 logging.info(f"✅ Posición cerrada | ID: {order_id}")
                 return order
                 
@@ -0,0 +1,193 @@
+# feature_pipeline.py
+import math
+import numpy as np
+import pandas as pd
+import indicator_kernels as kernels
+
+RAW_COLUMNS = ['open', 'high', 'low', 'close', 'volume']
+
+class Feature:
+    """
+    Columna calculable: declara de qué columnas depende y cuántas velas
+    previas necesita para que su valor sea fiable (warmup).
+    Las features recursivas (medias exponenciales) pueden declarar además
+    `resume(cols, last)`: calcula solo velas nuevas a partir de los valores
+    de la última vela ya calculada, con el mismo resultado que de una vez.
+    """
+    def __init__(self, name, inputs, warmup, compute):
+        self.name = name
+        self.inputs = inputs
+        self.warmup = warmup
+        self.compute = compute
+        self.resume = None
+
+FEATURES = {}
+
+def register_feature(name, inputs, warmup=0):
+    def decorator(compute):
+        FEATURES[name] = Feature(name, inputs, warmup, compute)
+        return compute
+    return decorator
+
+def ewm_warmup(alpha, residual=0.01):
+    """Velas hasta que el peso de la semilla de una media exponencial cae por debajo de `residual`"""
+    return int(math.ceil(math.log(residual) / math.log(1.0 - alpha)))
+
+def resume_feature(name):
+    """Registra cómo continuar la feature `name` sobre velas nuevas"""
+    def decorator(resume):
+        FEATURES[name].resume = resume
+        return resume
+    return decorator
+
+# --- Registro de features -------------------------------------------------
+
+@register_feature('ema50', ['close'], warmup=max(50, ewm_warmup(2 / 51)))
+def _ema50(cols):
+    return kernels.ema(cols['close'], 50)
+
+@resume_feature('ema50')
+def _ema50_resume(cols, last):
+    return kernels.ema(cols['close'], 50, init=last['ema50'])
+
+@register_feature('ema200', ['close'], warmup=max(200, ewm_warmup(2 / 201)))
+def _ema200(cols):
+    return kernels.ema(cols['close'], 200)
+
+@resume_feature('ema200')
+def _ema200_resume(cols, last):
+    return kernels.ema(cols['close'], 200, init=last['ema200'])
+
+# RSI: las medias de subidas/bajadas son columnas propias para poder continuar la recursión
+@register_feature('rsi_up', ['close'], warmup=max(14, ewm_warmup(1 / 14)))
+def _rsi_up(cols):
+    return kernels.wilder_mean(kernels.price_moves(cols['close'])[0], 14)
+
+@resume_feature('rsi_up')
+def _rsi_up_resume(cols, last):
+    return kernels.wilder_mean(kernels.price_moves(cols['close'], last['close'])[0], 14, init=last['rsi_up'])
+
+@register_feature('rsi_down', ['close'], warmup=max(14, ewm_warmup(1 / 14)))
+def _rsi_down(cols):
+    return kernels.wilder_mean(kernels.price_moves(cols['close'])[1], 14)
+
+@resume_feature('rsi_down')
+def _rsi_down_resume(cols, last):
+    return kernels.wilder_mean(kernels.price_moves(cols['close'], last['close'])[1], 14, init=last['rsi_down'])
+
+@register_feature('rsi', ['rsi_up', 'rsi_down'])
+def _rsi(cols):
+    return kernels.rsi_from_averages(cols['rsi_up'], cols['rsi_down'])
+
+@register_feature('atr', ['high', 'low', 'close'], warmup=max(14, ewm_warmup(1 / 14)))
+def _atr(cols):
+    return kernels.atr(cols['high'], cols['low'], cols['close'], 14)
+
+@resume_feature('atr')
+def _atr_resume(cols, last):
+    return kernels.atr(cols['high'], cols['low'], cols['close'], 14, prev_close=last['close'], init=last['atr'])
+
+@register_feature('body', ['open', 'close'])
+def _body(cols):
+    return np.abs(cols['close'] - cols['open'])
+
+@register_feature('upper_wick', ['open', 'high', 'close'])
+def _upper_wick(cols):
+    return cols['high'] - np.maximum(cols['open'], cols['close'])
+
+@register_feature('lower_wick', ['open', 'low', 'close'])
+def _lower_wick(cols):
+    return np.minimum(cols['open'], cols['close']) - cols['low']
+
+@register_feature('spread', ['high', 'low', 'close'])
+def _spread(cols):
+    return (cols['high'] - cols['low']) / cols['close']  # proxy de spread
+
+@register_feature('liquidez', ['volume', 'spread'])
+def _liquidez(cols):
+    return cols['volume'] / (cols['spread'] + 1e-8)  # más alto = más líquido
+
+# --- Planificador ---------------------------------------------------------
+
+def plan_features(columns):
+    """
+    Devuelve, en orden de cálculo, las features necesarias (dependencias
+    incluidas) para obtener `columns`. Las columnas OHLCV no se calculan.
+    """
+    ordered = []
+    visiting = set()
+
+    def visit(name):
+        if name in RAW_COLUMNS or name in ordered:
+            return
+        if name not in FEATURES:
+            raise KeyError(f"Feature desconocida: {name}")
+        if name in visiting:
+            raise ValueError(f"Dependencia circular en la feature {name}")
+        visiting.add(name)
+        for dep in FEATURES[name].inputs:
+            visit(dep)
+        visiting.discard(name)
+        ordered.append(name)
+
+    for col in columns:
+        visit(col)
+    return ordered
+
+def feature_lookback(columns):
+    """
+    Velas mínimas para calcular `columns` de forma fiable en la última vela:
+    el warmup más largo a lo largo de cada cadena de dependencias, más la vela actual.
+    """
+    memo = {}
+
+    def chain(name):
+        if name in RAW_COLUMNS:
+            return 0
+        if name not in memo:
+            feature = FEATURES[name]
+            memo[name] = feature.warmup + max((chain(dep) for dep in feature.inputs), default=0)
+        return memo[name]
+
+    return max((chain(col) for col in columns), default=0) + 1
+
+def compute_features(df, columns, dtype=None):
+    """
+    Calcula solo las columnas pedidas (y sus dependencias) en una pasada.
+    Devuelve el DataFrame original con esas columnas añadidas; las que ya
+    existen en `df` no se recalculan.
+    """
+    arrays = {col: df[col].to_numpy(dtype=np.float64) for col in RAW_COLUMNS if col in df.columns}
+    computed = {}
+    for name in plan_features(columns):
+        if name in df.columns:
+            arrays[name] = df[name].to_numpy(dtype=np.float64)
+            continue
+        arrays[name] = FEATURES[name].compute(arrays)
+        computed[name] = arrays[name]
+
+    if not computed:
+        return df
+    if dtype is not None and np.dtype(dtype) != np.float64:
+        computed = {name: values.astype(dtype) for name, values in computed.items()}
+    data = {col: df[col].to_numpy() for col in df.columns}
+    data.update(computed)
+    return pd.DataFrame(data, index=df.index)
+
+def resume_features(new_df, last, columns):
+    """
+    Calcula `columns` (y sus dependencias) solo para las velas de `new_df`,
+    continuando desde `last` ({columna: valor en la vela anterior}).
+    Devuelve {columna: array}. ValueError si alguna feature recursiva no
+    sabe continuar (hay que recalcular todo el histórico).
+    """
+    arrays = {col: new_df[col].to_numpy(dtype=np.float64) for col in RAW_COLUMNS if col in new_df.columns}
+    for name in plan_features(columns):
+        feature = FEATURES[name]
+        if feature.resume is not None:
+            arrays[name] = feature.resume(arrays, last)
+        elif feature.warmup == 0:
+            arrays[name] = feature.compute(arrays)  # solo depende de la propia vela
+        else:
+            raise ValueError(f"La feature {name} no se puede continuar de forma incremental")
+    return arrays
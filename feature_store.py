@@ -0,0 +1,227 @@
+# feature_store.py
+"""
+Almacén persistente de features para entrenamiento y backtests.
+
+Cada dataset se identifica por (símbolo, timeframe, hash del conjunto de
+features) y cubre un rango de fechas [start, end] guardado en meta.json.
+Formato columnar: un fichero binario por columna (timestamp, OHLCV, features
+y sus dependencias) que se abre con np.memmap, así que cargar cualquier
+subrango cuesta milisegundos. Cuando llegan velas nuevas solo se calculan
+esas: las features recursivas continúan desde la última vela guardada
+(feature_pipeline.resume_features) con el mismo resultado que recalcular todo.
+
+feature_store/
+    BTCUSDT_USDT_1h_3f9a1c0b/
+        meta.json        -> filas, rango de fechas, columnas, dtypes
+        timestamp.bin    -> int64 (ms)
+        close.bin, ema50.bin, ...  -> float64
+"""
+import hashlib
+import inspect
+import json
+import logging
+import os
+import threading
+import numpy as np
+import pandas as pd
+from pathlib import Path
+from config import FEATURE_STORE_DIR, USE_FEATURE_STORE
+from candle_store import OHLCV_COLUMNS, timeframe_to_ms
+from feature_pipeline import FEATURES, plan_features, compute_features, resume_features, feature_lookback
+
+_hash_cache = {}
+
+def feature_set_hash(columns):
+    """
+    Huella del conjunto de features: nombres, dependencias, warmup y código
+    de cálculo. Si cambia la definición de una feature, cambia el dataset.
+    """
+    key = tuple(sorted(columns))
+    if key not in _hash_cache:
+        spec = []
+        for name in plan_features(key):
+            feature = FEATURES[name]
+            code = [inspect.getsource(func) for func in (feature.compute, feature.resume) if func is not None]
+            spec.append([name, feature.inputs, feature.warmup, code])
+        _hash_cache[key] = hashlib.sha1(json.dumps([list(key), spec]).encode()).hexdigest()[:10]
+    return _hash_cache[key]
+
+def _to_ms(index):
+    return index.values.astype('datetime64[ms]').astype(np.int64)
+
+class FeatureStore:
+    def __init__(self, root=FEATURE_STORE_DIR):
+        self.root = Path(root)
+        self._lock = threading.Lock()
+
+    def _dir(self, symbol, timeframe, columns):
+        safe_symbol = symbol.replace("/", "").replace(":", "_").upper()
+        return self.root / f"{safe_symbol}_{timeframe}_{feature_set_hash(columns)}"
+
+    # --- Lectura ------------------------------------------------------------
+
+    def _read_meta(self, folder):
+        try:
+            meta = json.loads((folder / "meta.json").read_text())
+        except (FileNotFoundError, ValueError):
+            return None
+        # Datos incompletos (p. ej. corte durante una escritura): se reconstruye
+        for col, dtype in meta['dtypes'].items():
+            path = folder / f"{col}.bin"
+            if not path.exists() or path.stat().st_size < meta['rows'] * np.dtype(dtype).itemsize:
+                logging.warning(f"⚠️ Feature store incompleto en {folder.name}. Se recalculará.")
+                return None
+        return meta
+
+    def _open(self, folder, meta):
+        """{columna: np.memmap de solo lectura}"""
+        if meta['rows'] == 0:
+            return {col: np.empty(0, dtype=dtype) for col, dtype in meta['dtypes'].items()}
+        return {col: np.memmap(folder / f"{col}.bin", dtype=dtype, mode='r', shape=(meta['rows'],))
+                for col, dtype in meta['dtypes'].items()}
+
+    def _to_frame(self, arrays, lo, hi, columns):
+        index = pd.DatetimeIndex(pd.to_datetime(arrays['timestamp'][lo:hi], unit='ms'), name='timestamp')
+        data = {col: arrays[col][lo:hi] for col in OHLCV_COLUMNS}
+        data.update({col: arrays[col][lo:hi] for col in columns if col not in data})
+        return pd.DataFrame(data, index=index)
+
+    def load(self, symbol, timeframe, columns, start=None, end=None):
+        """
+        Features guardadas entre `start` y `end` (incluidos) o None si no hay
+        dataset. Los ficheros se abren memory-mapped: solo se lee del disco el
+        subrango pedido.
+        """
+        folder = self._dir(symbol, timeframe, columns)
+        meta = self._read_meta(folder)
+        if meta is None:
+            return None
+        arrays = self._open(folder, meta)
+        ts = arrays['timestamp']
+        lo = 0 if start is None else int(np.searchsorted(ts, _to_ms(pd.DatetimeIndex([start]))[0], side='left'))
+        hi = len(ts) if end is None else int(np.searchsorted(ts, _to_ms(pd.DatetimeIndex([end]))[0], side='right'))
+        return self._to_frame(arrays, lo, hi, plan_features(columns))
+
+    # --- Escritura ----------------------------------------------------------
+
+    def _write_meta(self, folder, meta):
+        tmp = folder / "meta.json.tmp"
+        tmp.write_text(json.dumps(meta, indent=2))
+        os.replace(tmp, folder / "meta.json")
+
+    def _write(self, folder, arrays, keep_rows, meta):
+        """
+        Deja en disco las primeras `keep_rows` filas y añade `arrays` detrás.
+        meta.json se actualiza al final: es quien dice cuántas filas son válidas.
+        """
+        folder.mkdir(parents=True, exist_ok=True)
+        rows = keep_rows + len(arrays['timestamp'])
+        for col, values in arrays.items():
+            values = np.ascontiguousarray(values, dtype=meta['dtypes'][col])
+            path = folder / f"{col}.bin"
+            with open(path, "r+b" if path.exists() and keep_rows else "wb") as f:
+                f.truncate(keep_rows * values.itemsize)
+                f.seek(keep_rows * values.itemsize)
+                f.write(values.tobytes())
+        ts = arrays['timestamp']
+        meta = dict(meta, rows=rows)
+        if keep_rows == 0:
+            meta['start'] = str(pd.to_datetime(ts[0], unit='ms'))
+        meta['end'] = str(pd.to_datetime(ts[-1], unit='ms'))
+        self._write_meta(folder, meta)
+        return meta
+
+    def update(self, symbol, timeframe, df, columns):
+        """
+        Añade al dataset las velas de `df` que aún no tiene, calculando solo
+        esas. Si no se puede continuar (`df` empieza antes del dataset, deja
+        un hueco o el dataset es demasiado corto para retomar las medias), se
+        recalcula entero solo si `df` cubre todo el rango guardado; si no, el
+        dataset se deja intacto (no se pierde el histórico largo por unas pocas
+        velas) y quien llama calcula en memoria. Devuelve el nº de velas calculadas.
+        """
+        if df.empty:
+            return 0
+        features = plan_features(columns)
+        folder = self._dir(symbol, timeframe, columns)
+        ts_new = _to_ms(df.index)
+        with self._lock:
+            meta = self._read_meta(folder)
+            if meta is not None and meta['rows'] > 1:
+                # La última vela guardada pudo estar en curso: se recalcula siempre
+                keep = meta['rows'] - 1
+                arrays = self._open(folder, meta)
+                ts_first = int(arrays['timestamp'][0])
+                ts_keep = int(arrays['timestamp'][keep])
+                ts_prev = int(arrays['timestamp'][keep - 1])
+                last = {col: float(arrays[col][keep - 1]) for col in meta['dtypes'] if col != 'timestamp'}
+                # Sin referencias a los memmaps antes de escribir: truncar un fichero
+                # aún mapeado falla en Windows (PermissionError) e invalida las páginas en Linux
+                del arrays
+                if ts_first <= ts_new[0] and ts_new[-1] < ts_keep:
+                    return 0  # Ya está todo calculado (p. ej. backtest de un tramo antiguo)
+                first_new = int(np.searchsorted(ts_new, ts_keep))
+                resumable = (
+                    ts_new[0] >= ts_first
+                    and first_new < len(ts_new) and ts_new[first_new] == ts_keep
+                    and ts_keep - ts_prev == timeframe_to_ms(timeframe)
+                    # Con menos velas que el warmup, `last` aún tendría valores de relleno
+                    and keep >= feature_lookback(features)
+                    and all(np.isfinite(last[name]) for name in features if FEATURES[name].resume is not None)
+                )
+                if resumable:
+                    new = df.iloc[first_new:]
+                    try:
+                        computed = resume_features(new, last, columns)
+                    except ValueError as e:
+                        logging.info(f"ℹ️ {e}. Recalculando el dataset completo.")
+                    else:
+                        delta = {'timestamp': ts_new[first_new:]}
+                        delta.update({col: computed[col] for col in OHLCV_COLUMNS + features})
+                        self._write(folder, delta, keep, meta)
+                        return len(new)
+                
+                if ts_new[0] > ts_first or ts_new[-1] < ts_keep:
+                    logging.warning(f"⚠️ Feature store: las velas ({len(df)}) no continúan ni cubren el dataset "
+                                    f"{meta['start']} → {meta['end']}. Se conserva; hará falta un backfill para extenderlo.")
+                    return 0
+
+            full = compute_features(df, columns)
+            arrays = {'timestamp': ts_new}
+            arrays.update({col: full[col].to_numpy(dtype=np.float64) for col in OHLCV_COLUMNS + features})
+            meta = {'symbol': symbol, 'timeframe': timeframe, 'columns': sorted(columns),
+                    'feature_hash': feature_set_hash(columns),
+                    'dtypes': {col: ('int64' if col == 'timestamp' else 'float64') for col in arrays}}
+            self._write(folder, arrays, 0, meta)
+            return len(df)
+
+    def features(self, symbol, timeframe, df, columns):
+        """
+        Devuelve `df` (velas) con `columns` añadidas, tomadas del almacén y
+        calculando solo las velas que faltan. Las features recursivas vienen
+        calentadas con todo el histórico guardado, no solo con el de `df`.
+        """
+        if df.empty:
+            return compute_features(df, columns)
+        computed = self.update(symbol, timeframe, df, columns)
+        stored = self.load(symbol, timeframe, columns, df.index[0], df.index[-1])
+        if stored is None or len(stored) != len(df) or not stored.index.equals(df.index):
+            logging.warning("⚠️ El feature store no cubre las velas pedidas. Calculando en memoria.")
+            return compute_features(df, columns)
+        if computed:
+            logging.info(f"🧮 Feature store: {computed} velas nuevas calculadas ({symbol} {timeframe})")
+        return stored
+
+_store = None
+
+def get_feature_store():
+    global _store
+    if _store is None:
+        _store = FeatureStore()
+    return _store
+
+def add_features(symbol, timeframe, df, columns, use_store=USE_FEATURE_STORE):
+    """compute_features con caché persistente (si USE_FEATURE_STORE está activo)"""
+    if not use_store:
+        return compute_features(df, columns)
+    return get_feature_store().features(symbol, timeframe, df, columns)
@@ -0,0 +1,177 @@
+# forest_inference.py
+"""
+Inferencia "aplanada" de un RandomForestClassifier: todos los nodos de todos
+los árboles en arrays NumPy contiguos, recorridos a la vez (un paso por nivel
+de profundidad) en lugar de árbol a árbol. Da exactamente las mismas
+probabilidades que sklearn y evita su validación por llamada, el paso por
+DataFrame y el doble recorrido predict + predict_proba.
+
+Pensado para la señal en vivo (una fila o lotes pequeños): en lotes de miles
+de filas el recorrido en C de sklearn sigue siendo más rápido.
+"""
+import numpy as np
+
+def float32_thresholds(threshold):
+    """
+    Umbrales en float32 redondeados hacia abajo. X se compara en float32, así
+    que X <= t64 equivale exactamente a X <= (mayor float32 <= t64): la mitad
+    de memoria sin cambiar ninguna decisión.
+    """
+    threshold = np.asarray(threshold, dtype=np.float64)
+    rounded = threshold.astype(np.float32)
+    too_high = rounded.astype(np.float64) > threshold
+    rounded[too_high] = np.nextafter(rounded[too_high], np.float32(-np.inf))
+    return rounded
+
+class FlatForest:
+    def __init__(self, feature, threshold, children, missing_left, leaf_proba, roots, depth, classes):
+        self.feature = feature            # (n_nodes,) feature de cada split (0 en hojas)
+        self.threshold = threshold        # (n_nodes,) float32: umbral (+inf en hojas)
+        self.children = children          # (n_nodes, 2) [izquierdo, derecho]; las hojas apuntan a sí mismas
+        self.missing_left = missing_left  # (n_nodes,) a dónde van los NaN
+        self.leaf_proba = leaf_proba      # (n_nodes, n_classes) probabilidades de cada hoja
+        self.roots = roots                # (n_trees,) nodo raíz de cada árbol
+        self.depth = int(depth)           # profundidad máxima del bosque
+        self.classes_ = classes
+
+    @classmethod
+    def from_model(cls, model):
+        """Exporta un RandomForestClassifier entrenado (una sola salida)"""
+        n_classes = len(model.classes_)
+        features, thresholds, children, missing, probas, roots = [], [], [], [], [], []
+        offset = 0
+        depth = 0
+        for estimator in model.estimators_:
+            tree = estimator.tree_
+            n = tree.node_count
+            left = tree.children_left[:n].astype(np.intp)
+            right = tree.children_right[:n].astype(np.intp)
+            is_leaf = left == -1
+            own = np.arange(n, dtype=np.intp)
+            children.append(np.column_stack([np.where(is_leaf, own, left), np.where(is_leaf, own, right)]) + offset)
+            features.append(np.where(is_leaf, 0, tree.feature[:n]).astype(np.intp))
+            thresholds.append(np.where(is_leaf, np.inf, tree.threshold[:n]))
+            missing.append(tree.missing_go_to_left[:n].astype(bool))
+            # Mismo valor que DecisionTreeClassifier.predict_proba (tree_.value ya guarda fracciones)
+            probas.append(tree.value[:n, 0, :n_classes])
+            roots.append(offset)
+            depth = max(depth, tree.max_depth)
+            offset += n
+        return cls(
+            np.concatenate(features),  # índices en intp: con int32 NumPy los convierte en cada paso
+            float32_thresholds(np.concatenate(thresholds)),
+            np.ascontiguousarray(np.concatenate(children)),
+            np.concatenate(missing),
+            np.ascontiguousarray(np.concatenate(probas), dtype=np.float64),
+            np.asarray(roots, dtype=np.intp),
+            depth,
+            np.asarray(model.classes_),
+        )
+
+    def to_arrays(self):
+        return {'feature': self.feature, 'threshold': self.threshold, 'children': self.children,
+                'missing_left': self.missing_left, 'leaf_proba': self.leaf_proba, 'roots': self.roots,
+                'depth': np.asarray(self.depth), 'classes': self.classes_}
+
+    @classmethod
+    def from_arrays(cls, arrays):
+        return cls(arrays['feature'], arrays['threshold'], arrays['children'], arrays['missing_left'],
+                   arrays['leaf_proba'], arrays['roots'], arrays['depth'], arrays['classes'])
+
+    def save(self, path):
+        np.savez(path, **self.to_arrays())
+
+    @classmethod
+    def load(cls, path):
+        with np.load(path) as data:
+            return cls.from_arrays({name: data[name] for name in data.files})
+
+    def apply(self, X):
+        """Hoja alcanzada por cada fila en cada árbol: (n_rows, n_trees)"""
+        # sklearn compara en float32 (convierte X antes de recorrer los árboles)
+        X = np.ascontiguousarray(X, dtype=np.float32)
+        if X.ndim == 1:
+            X = X[None, :]
+        flat = X.ravel()
+        row_offset = (np.arange(len(X)) * X.shape[1])[:, None]
+        node = np.broadcast_to(self.roots, (len(X), len(self.roots)))
+        for _ in range(self.depth):
+            value = flat[row_offset + self.feature[node]]
+            go_left = value <= self.threshold[node]
+            nan = np.isnan(value)
+            if nan.any():
+                go_left = np.where(nan, self.missing_left[node], go_left)
+            node = self.children[node, (~go_left).view(np.int8)]
+        return node
+
+    def predict_proba(self, X, chunk_size=256):
+        """
+        Probabilidades por clase, idénticas a RandomForestClassifier.predict_proba.
+        Los lotes grandes se recorren por bloques de `chunk_size` filas para que
+        los arrays intermedios quepan en caché.
+        """
+        X = np.asarray(X)
+        if X.ndim == 1:
+            X = X[None, :]
+        proba = np.empty((len(X), self.leaf_proba.shape[1]))
+        for start in range(0, len(X), chunk_size):
+            probas = self.leaf_proba[self.apply(X[start:start + chunk_size])]  # (filas, árboles, clases)
+            # Suma árbol a árbol en el mismo orden que sklearn (cumsum es estrictamente secuencial)
+            proba[start:start + chunk_size] = np.cumsum(probas, axis=1)[:, -1]
+        proba /= len(self.roots)
+        return proba
+
+    def predict(self, X):
+        return self.classes_.take(np.argmax(self.predict_proba(X), axis=1))
+
+    def predict_with_proba(self, X):
+        """Clase y probabilidades en un solo recorrido"""
+        proba = self.predict_proba(X)
+        return self.classes_.take(np.argmax(proba, axis=1)), proba
+
+class ForestGroup:
+    """
+    Varios bosques (p. ej. modelo activo + modelos sombra) evaluados en un solo
+    recorrido: sus nodos se concatenan y los índices de feature se remapean a
+    la unión de columnas. Las probabilidades de cada modelo son las mismas que
+    daría su FlatForest por separado.
+    """
+    def __init__(self, forests, feature_lists):
+        self.feature_cols = []
+        for cols in feature_lists:
+            self.feature_cols += [col for col in cols if col not in self.feature_cols]
+        position = {col: i for i, col in enumerate(self.feature_cols)}
+
+        features, children, roots, self.members = [], [], [], []
+        offset = 0
+        tree = 0
+        for forest, cols in zip(forests, feature_lists):
+            remap = np.asarray([position[col] for col in cols], dtype=np.intp)
+            features.append(remap[forest.feature])
+            children.append(forest.children + offset)
+            roots.append(forest.roots + offset)
+            # (árboles del modelo, desplazamiento de nodos, probabilidades de hoja, clases)
+            self.members.append((slice(tree, tree + len(forest.roots)), offset, forest.leaf_proba, forest.classes_))
+            offset += len(forest.feature)
+            tree += len(forest.roots)
+        self.traversal = FlatForest(
+            np.concatenate(features),
+            np.concatenate([forest.threshold for forest in forests]),
+            np.concatenate(children),
+            np.concatenate([forest.missing_left for forest in forests]),
+            None,
+            np.concatenate(roots),
+            max(forest.depth for forest in forests),
+            None,
+        )
+
+    def predict_with_proba(self, X):
+        """[(clases, probabilidades)] por modelo, en el orden de construcción; X en el orden de feature_cols"""
+        leaves = self.traversal.apply(X)
+        results = []
+        for trees, offset, leaf_proba, classes in self.members:
+            probas = leaf_proba[leaves[:, trees] - offset]
+            proba = np.cumsum(probas, axis=1)[:, -1]
+            proba /= trees.stop - trees.start
+            results.append((classes.take(np.argmax(proba, axis=1)), proba))
+        return results
@@ -0,0 +1,225 @@
+# indicator_engine.py
+import math
+import numpy as np
+
+INDICATOR_COLS = ['ema50', 'ema200', 'rsi', 'atr']
+
+class _Ewm:
+    """Media exponencial con la misma recurrencia que pandas ewm(adjust=False)"""
+    def __init__(self, com, min_periods):
+        self.alpha = 1.0 / (1.0 + com)
+        self.old_wt = 1.0 - self.alpha
+        self.min_periods = min_periods
+        self.weighted = math.nan
+        self.nobs = 0
+
+    def _next(self, x):
+        if self.nobs == 0:
+            return x
+        weighted = self.weighted
+        if weighted != x:
+            weighted = (self.old_wt * weighted + self.alpha * x) / (self.old_wt + self.alpha)
+        return weighted
+
+    def push(self, x):
+        self.weighted = self._next(x)
+        self.nobs += 1
+        return self.weighted if self.nobs >= self.min_periods else math.nan
+
+    def peek(self, x):
+        weighted = self._next(x)
+        return weighted if self.nobs + 1 >= self.min_periods else math.nan
+
+class _Ema:
+    """Equivalente a ta.trend.EMAIndicator(window).ema_indicator()"""
+    def __init__(self, window):
+        self._ewm = _Ewm(com=(window - 1) / 2, min_periods=window)
+
+    def push(self, close):
+        return self._ewm.push(close)
+
+    def peek(self, close):
+        return self._ewm.peek(close)
+
+class _Rsi:
+    """Equivalente a ta.momentum.RSIIndicator(window).rsi() (suavizado de Wilder)"""
+    def __init__(self, window=14):
+        alpha = 1 / window
+        com = (1 - alpha) / alpha
+        self._up = _Ewm(com, window)
+        self._down = _Ewm(com, window)
+        self.prev_close = None
+
+    def _directions(self, close):
+        if self.prev_close is None:
+            return 0.0, -0.0
+        diff = close - self.prev_close
+        return (diff if diff > 0 else 0.0), -(diff if diff < 0 else 0.0)
+
+    @staticmethod
+    def _rsi(emaup, emadn):
+        if emadn == 0:
+            return 100.0
+        return 100 - (100 / (1 + emaup / emadn))
+
+    def push(self, close):
+        up, down = self._directions(close)
+        self.prev_close = close
+        return self._rsi(self._up.push(up), self._down.push(down))
+
+    def peek(self, close):
+        up, down = self._directions(close)
+        return self._rsi(self._up.peek(up), self._down.peek(down))
+
+class _Atr:
+    """Equivalente a ta.volatility.AverageTrueRange(window).average_true_range()"""
+    def __init__(self, window=14):
+        self.window = window
+        self.prev_close = None
+        self.first_ranges = []
+        self.atr = 0.0
+        self.count = 0
+
+    def _true_range(self, high, low):
+        if self.prev_close is None:
+            return high - low
+        return max(high - low, abs(high - self.prev_close), abs(low - self.prev_close))
+
+    def _next(self, true_range):
+        if self.count < self.window - 1:
+            return 0.0
+        if self.count == self.window - 1:
+            return np.array(self.first_ranges + [true_range]).sum() / self.window
+        return (self.atr * (self.window - 1) + true_range) / float(self.window)
+
+    def push(self, high, low, close):
+        true_range = self._true_range(high, low)
+        if self.count < self.window - 1:
+            self.first_ranges.append(true_range)
+        self.atr = self._next(true_range)
+        self.count += 1
+        self.prev_close = close
+        return self.atr
+
+    def peek(self, high, low, close):
+        return self._next(self._true_range(high, low))
+
+class IndicatorState:
+    """
+    Estado de EMA50/EMA200/RSI14/ATR14 para una serie (símbolo, timeframe).
+    Cada vela cerrada se incorpora en O(1); la vela en curso se evalúa sin
+    modificar el estado.
+    """
+    def __init__(self, capacity=2000):
+        self.ema50 = _Ema(50)
+        self.ema200 = _Ema(200)
+        self.rsi = _Rsi(14)
+        self.atr = _Atr(14)
+        self.last_ts = None
+        # Histórico consolidado en arrays con margen: al llenarse se desplaza la mitad (O(1) amortizado)
+        self.capacity = capacity
+        self._ts = np.empty(2 * capacity, dtype=np.int64)
+        self._values = np.empty((2 * capacity, len(INDICATOR_COLS)), dtype=np.float64)
+        self._size = 0
+
+    def push(self, ts, high, low, close):
+        values = (
+            self.ema50.push(close),
+            self.ema200.push(close),
+            self.rsi.push(close),
+            self.atr.push(high, low, close),
+        )
+        self.last_ts = ts
+        if self._size == len(self._ts):
+            self._ts[:self.capacity] = self._ts[-self.capacity:]
+            self._values[:self.capacity] = self._values[-self.capacity:]
+            self._size = self.capacity
+        self._ts[self._size] = ts
+        self._values[self._size] = values
+        self._size += 1
+        return values
+
+    def tail(self, count):
+        """Timestamps y valores de las últimas `count` velas consolidadas"""
+        start = max(0, self._size - count)
+        return self._ts[start:self._size], self._values[start:self._size]
+
+    def peek(self, high, low, close):
+        return (
+            self.ema50.peek(close),
+            self.ema200.peek(close),
+            self.rsi.peek(close),
+            self.atr.peek(high, low, close),
+        )
+
+class IndicatorEngine:
+    """
+    Motor incremental de indicadores por (símbolo, timeframe).
+
+    update() recibe la misma ventana que se pasaba a add_indicators y
+    devuelve las mismas columnas. La última fila se trata como vela en curso:
+    se calcula pero no se consolida hasta que aparece una vela posterior.
+    Los valores coinciden con add_indicators aplicado a todo el histórico
+    que el motor ha visto desde que se creó el estado.
+    """
+    def __init__(self, capacity=2000):
+        self.capacity = capacity
+        self._states = {}
+
+    def reset(self, symbol=None, timeframe=None):
+        if symbol is None:
+            self._states.clear()
+        else:
+            self._states.pop((symbol, timeframe), None)
+
+    def update(self, symbol, timeframe, df):
+        n = len(df)
+        if n == 0:
+            return df.copy()
+
+        ts = df.index.values.astype('datetime64[ms]').astype(np.int64)
+        high = df['high'].to_numpy(dtype=np.float64)
+        low = df['low'].to_numpy(dtype=np.float64)
+        close = df['close'].to_numpy(dtype=np.float64)
+
+        key = (symbol, timeframe)
+        state = self._states.get(key)
+        start = 0
+        if state is not None and state.last_ts is not None:
+            # La ventana debe solaparse con lo ya consolidado; si no, reiniciar
+            start = int(np.searchsorted(ts, state.last_ts, side='right'))
+            if start == 0 or ts[start - 1] != state.last_ts:
+                state = None
+                start = 0
+        if state is None:
+            state = IndicatorState(max(self.capacity, n))
+            self._states[key] = state
+
+        for i in range(start, n - 1):
+            state.push(int(ts[i]), high[i], low[i], close[i])
+
+        committed = n - 1
+        hist_ts, hist_values = state.tail(committed)
+        if len(hist_ts) != committed or (committed and hist_ts[0] != ts[0]):
+            # La ventana empieza antes de lo guardado en memoria: recalcular desde cero
+            self._states.pop(key, None)
+            return self.update(symbol, timeframe, df)
+
+        values = np.empty((n, len(INDICATOR_COLS)), dtype=np.float64)
+        values[:-1] = hist_values
+        values[-1] = state.peek(high[-1], low[-1], close[-1])
+
+        open_ = df['open'].to_numpy(dtype=np.float64)
+        volume = df['volume'].to_numpy(dtype=np.float64)
+        spread = (high - low) / close  # proxy de spread
+        return df.assign(
+            ema50=values[:, 0],
+            ema200=values[:, 1],
+            rsi=values[:, 2],
+            atr=values[:, 3],
+            body=np.abs(close - open_),
+            upper_wick=high - np.maximum(open_, close),
+            lower_wick=np.minimum(open_, close) - low,
+            spread=spread,
+            liquidez=volume / (spread + 1e-8),  # más alto = más líquido
+        )
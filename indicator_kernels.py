@@ -0,0 +1,118 @@
+# indicator_kernels.py
+import numpy as np
+from scipy.signal import lfilter
+
+# Columnas calculadas por compute_indicators (las que consume FEATURE_COLS y más)
+KERNEL_COLS = ['ema50', 'ema200', 'rsi', 'atr', 'body', 'upper_wick', 'lower_wick', 'spread', 'liquidez']
+
+def ewm_mean(x, alpha, min_periods=0, init=None):
+    """
+    Media exponencial y[t] = (1-alpha)*y[t-1] + alpha*x[t] con y[0] = x[0],
+    equivalente a pandas ewm(adjust=False). El filtro recursivo corre en C
+    (scipy.signal.lfilter).
+    Con `init` (valor de la media en la vela anterior) continúa una serie ya
+    calculada: el resultado es idéntico al de calcularla de una sola vez.
+    """
+    x = np.asarray(x, dtype=np.float64)
+    if len(x) == 0:
+        return x.copy()
+    seed = x[0] if init is None else init
+    y, _ = lfilter([alpha], [1.0, -(1.0 - alpha)], x, zi=[(1.0 - alpha) * seed])
+    if min_periods > 1 and init is None:
+        y[:min_periods - 1] = np.nan
+    return y
+
+def ema(close, window, init=None):
+    """EMA como ta.trend.EMAIndicator (span=window, min_periods=window)"""
+    return ewm_mean(close, 1.0 / (1.0 + (window - 1) / 2), window, init)
+
+def price_moves(close, prev_close=None):
+    """Subidas y bajadas (en positivo) respecto a la vela anterior; la primera cuenta 0 sin prev_close"""
+    close = np.asarray(close, dtype=np.float64)
+    diff = np.empty_like(close)
+    if len(close) == 0:
+        return diff, diff.copy()
+    diff[0] = 0.0 if prev_close is None else close[0] - prev_close
+    np.subtract(close[1:], close[:-1], out=diff[1:])
+    up = np.where(diff > 0, diff, 0.0)
+    down = -np.where(diff < 0, diff, 0.0)
+    return up, down
+
+def wilder_mean(x, window=14, init=None):
+    """Suavizado de Wilder (alpha = 1/window) usado por el RSI"""
+    alpha = 1 / window
+    alpha = 1.0 / (1.0 + (1 - alpha) / alpha)
+    return ewm_mean(x, alpha, window, init)
+
+def rsi_from_averages(emaup, emadn):
+    with np.errstate(divide='ignore', invalid='ignore'):
+        return np.where(emadn == 0, 100.0, 100 - (100 / (1 + emaup / emadn)))
+
+def rsi(close, window=14):
+    """RSI con suavizado de Wilder como ta.momentum.RSIIndicator"""
+    up, down = price_moves(close)
+    return rsi_from_averages(wilder_mean(up, window), wilder_mean(down, window))
+
+def true_range(high, low, close, prev_close=None):
+    high = np.asarray(high, dtype=np.float64)
+    low = np.asarray(low, dtype=np.float64)
+    close = np.asarray(close, dtype=np.float64)
+    tr = high - low
+    if prev_close is not None:
+        prev = np.concatenate(([prev_close], close[:-1]))
+        np.maximum(tr, np.abs(high - prev), out=tr)
+        np.maximum(tr, np.abs(low - prev), out=tr)
+    elif len(tr) > 1:
+        prev_close = close[:-1]
+        np.maximum(tr[1:], np.abs(high[1:] - prev_close), out=tr[1:])
+        np.maximum(tr[1:], np.abs(low[1:] - prev_close), out=tr[1:])
+    return tr
+
+def atr(high, low, close, window=14, prev_close=None, init=None):
+    """
+    ATR como ta.volatility.AverageTrueRange (0.0 hasta completar la ventana).
+    Con prev_close/init (cierre y ATR de la vela anterior) continúa la serie.
+    """
+    decay = (window - 1) / window
+    if init is not None:
+        tr = true_range(high, low, close, prev_close)
+        if len(tr) == 0:
+            return tr
+        out, _ = lfilter([1.0 / window], [1.0, -decay], tr, zi=[decay * init])
+        return out
+    tr = true_range(high, low, close)
+    out = np.zeros_like(tr)
+    if len(tr) < window:
+        return out
+    out[window - 1] = tr[:window].sum() / window
+    if len(tr) > window:
+        out[window:], _ = lfilter([1.0 / window], [1.0, -decay], tr[window:], zi=[decay * out[window - 1]])
+    return out
+
+def compute_indicators(open_, high, low, close, volume, dtype=np.float64):
+    """
+    Calcula todas las columnas de add_indicators a partir de arrays
+    contiguos. Devuelve {columna: array}; dtype=np.float32 reduce a la
+    mitad la memoria de salida (el cálculo interno siempre es float64).
+    """
+    open_ = np.ascontiguousarray(open_, dtype=np.float64)
+    high = np.ascontiguousarray(high, dtype=np.float64)
+    low = np.ascontiguousarray(low, dtype=np.float64)
+    close = np.ascontiguousarray(close, dtype=np.float64)
+    volume = np.ascontiguousarray(volume, dtype=np.float64)
+
+    spread = (high - low) / close  # proxy de spread
+    columns = {
+        'ema50': ema(close, 50),
+        'ema200': ema(close, 200),
+        'rsi': rsi(close, 14),
+        'atr': atr(high, low, close, 14),
+        'body': np.abs(close - open_),
+        'upper_wick': high - np.maximum(open_, close),
+        'lower_wick': np.minimum(open_, close) - low,
+        'spread': spread,
+        'liquidez': volume / (spread + 1e-8),  # más alto = más líquido
+    }
+    if np.dtype(dtype) != np.float64:
+        columns = {col: values.astype(dtype) for col, values in columns.items()}
+    return columns
@@ -1,20 +1,22 @@
+import numpy as np
 import pandas as pd
-from ta.trend import EMAIndicator
-from ta.momentum import RSIIndicator
-from ta.volatility import AverageTrueRange
+from indicator_kernels import compute_indicators
 
-def add_indicators(df):
-    df = df.copy()
-    df['ema50'] = EMAIndicator(close=df['close'], window=50).ema_indicator()
-    df['ema200'] = EMAIndicator(close=df['close'], window=200).ema_indicator()
-    df['rsi'] = RSIIndicator(close=df['close'], window=14).rsi()
-    df['atr'] = AverageTrueRange(high=df['high'], low=df['low'], close=df['close']).average_true_range()
-    df['body'] = abs(df['close'] - df['open'])
-    df['upper_wick'] = df['high'] - df[['open', 'close']].max(axis=1)
-    df['lower_wick'] = df[['open', 'close']].min(axis=1) - df['low']
-    df['spread'] = (df['high'] - df['low']) / df['close']  # proxy de spread
-    df['liquidez'] = df['volume'] / (df['spread'] + 1e-8)  # más alto = más líquido
-    return df
+def add_indicators(df, dtype=None):
+    """
+    Añade EMA50/EMA200/RSI/ATR y las columnas de velas (body, mechas,
+    spread, liquidez). Usa los kernels NumPy de indicator_kernels;
+    dtype='float32' devuelve los indicadores en precisión simple.
+    """
+    columns = compute_indicators(
+        df['open'].to_numpy(), df['high'].to_numpy(), df['low'].to_numpy(),
+        df['close'].to_numpy(), df['volume'].to_numpy(),
+        dtype=dtype or 'float64'
+    )
+    # Construir el DataFrame de una vez es bastante más rápido que df.assign / df.copy()
+    data = {col: df[col].to_numpy() for col in df.columns if col not in columns}
+    data.update(columns)
+    return pd.DataFrame(data, index=df.index)
 
 def add_fibonacci_levels(df, window=50):
     """
@@ -44,4 +46,109 @@ def add_fibonacci_levels(df, window=50):
     # ✅ NUEVO: Volatilidad en bajadas
     df['down_volatility'] = df['atr'] * (df['close'] < df['open']).astype(int)
 
-    return df
\ No newline at end of file
+    return df
+
+FIB_RATIOS = {
+    'fib_0': 0.0,
+    'fib_236': 0.236,
+    'fib_382': 0.382,
+    'fib_618': 0.618,
+    'fib_786': 0.786,
+    'fib_100': 1.0,
+}
+
+def _rolling_extreme(values, window, ufunc, fill):
+    """
+    Máximo/mínimo móvil en O(n) (van Herk/Gil-Werman): por bloques de
+    `window` se calculan acumulados hacia delante y hacia atrás, y cada
+    ventana es el extremo de un sufijo y un prefijo. Equivale a la
+    ventana con deque monotónica, pero vectorizado en NumPy.
+    """
+    n = len(values)
+    out = np.full(n, np.nan)
+    if window > n or window < 1:
+        return out
+    padded_len = -(-n // window) * window
+    padded = np.full(padded_len, fill)
+    padded[:n] = values
+    blocks = padded.reshape(-1, window)
+    prefix = ufunc.accumulate(blocks, axis=1).ravel()
+    suffix = ufunc.accumulate(blocks[:, ::-1], axis=1)[:, ::-1].ravel()
+    out[window - 1:] = ufunc(suffix[:n - window + 1], prefix[window - 1:n])
+    return out
+
+def rolling_max(values, window):
+    return _rolling_extreme(np.asarray(values, dtype=np.float64), window, np.maximum, -np.inf)
+
+def rolling_min(values, window):
+    return _rolling_extreme(np.asarray(values, dtype=np.float64), window, np.minimum, np.inf)
+
+class FibonacciBlock:
+    """
+    Niveles de Fibonacci para varias ventanas, guardados en arrays.
+    Solo se almacenan el máximo y el mínimo de cada ventana
+    (ventanas × 2 × velas); los niveles se derivan bajo demanda.
+    """
+    def __init__(self, index, windows, highs, lows, extras):
+        self.index = index
+        self.windows = list(windows)
+        self.highs = highs  # (ventanas, velas)
+        self.lows = lows
+        self.extras = extras  # columnas que no dependen de la ventana
+
+    def _row(self, window):
+        try:
+            return self.windows.index(window)
+        except ValueError:
+            raise KeyError(f"Ventana {window} no calculada. Disponibles: {self.windows}")
+
+    def levels(self, window):
+        """Array (niveles × velas) en el orden de FIB_RATIOS"""
+        return np.vstack([self.level(window, name) for name in FIB_RATIOS])
+
+    def level(self, window, name):
+        row = self._row(window)
+        # fib_0 / fib_100 son el máximo / mínimo tal cual (NaN en el otro extremo no les afecta)
+        if name == 'fib_0':
+            return self.highs[row]
+        if name == 'fib_100':
+            return self.lows[row]
+        return self.highs[row] - FIB_RATIOS[name] * (self.highs[row] - self.lows[row])
+
+    def to_frame(self, window):
+        """Mismas columnas que add_fibonacci_levels(df, window), sin el OHLCV"""
+        row = self._row(window)
+        data = {'fib_range': self.highs[row] - self.lows[row]}
+        for name in FIB_RATIOS:
+            data[name] = self.level(window, name)
+        data.update(self.extras)
+        return pd.DataFrame(data, index=self.index)
+
+def fibonacci_levels_batch(df, windows):
+    """
+    Calcula los niveles de Fibonacci para una lista de ventanas en una sola
+    llamada, sin copiar el DataFrame. Requiere ema50/ema200/atr (add_indicators).
+    """
+    high = df['high'].to_numpy(dtype=np.float64)
+    low = df['low'].to_numpy(dtype=np.float64)
+    close = df['close'].to_numpy(dtype=np.float64)
+    open_ = df['open'].to_numpy(dtype=np.float64)
+    volume = df['volume'].to_numpy(dtype=np.float64)
+
+    windows = list(windows)
+    highs = np.empty((len(windows), len(df)))
+    lows = np.empty((len(windows), len(df)))
+    for row, window in enumerate(windows):
+        highs[row] = rolling_max(high, window)
+        lows[row] = rolling_min(low, window)
+
+    # Indicadores bajistas: no dependen de la ventana, se calculan una sola vez
+    is_down = (close < open_).astype(int)
+    ema50 = df['ema50'].to_numpy(dtype=np.float64)
+    ema200 = df['ema200'].to_numpy(dtype=np.float64)
+    extras = {
+        'down_volume_ratio': (volume * is_down) / df['volume'].rolling(20).mean().to_numpy(),
+        'down_trend_strength': (close < ema50).astype(int) * (ema50 < ema200).astype(int),
+        'down_volatility': df['atr'].to_numpy(dtype=np.float64) * is_down,
+    }
+    return FibonacciBlock(df.index, windows, highs, lows, extras)
@@ -0,0 +1,254 @@
+# inference_server.py
+"""
+Servidor de inferencia compartido: un solo proceso con el modelo en memoria
+(MLAgent: modelo activo + sombras, con recarga en caliente) atiende por un
+socket Unix local a todos los agentes de la máquina.
+
+Las peticiones que llegan dentro de INFERENCE_BATCH_WINDOW_MS se juntan y se
+evalúan en un único recorrido del bosque aplanado: con decenas de agentes el
+coste fijo de cada predicción se reparte entre todo el lote.
+
+Protocolo: una línea JSON por petición y otra por respuesta.
+    {"op": "info"}
+        -> {"ok": true, "ml_ready", "version", "feature_cols", "lookback"}
+    {"op": "predict", "features": {columna: valor}, "time": "<vela>"}
+        -> {"ok": true, "signal", "confidence", "version"}
+    Errores: {"ok": false, "error": "..."}
+
+Los agentes usan InferenceClient (USE_INFERENCE_SERVER = True en config), que
+tiene la misma interfaz que MLAgent y vuelve al modelo local si el servidor
+no responde.
+Ejecuta: python inference_server.py
+"""
+import asyncio
+import json
+import logging
+import os
+import socket
+import sys
+import time
+import numpy as np
+from config import INFERENCE_SOCKET, INFERENCE_BATCH_WINDOW_MS, INFERENCE_MAX_BATCH, INFERENCE_TIMEOUT_SECONDS
+from feature_pipeline import compute_features
+from ml_agent import MLAgent
+
+STATS_INTERVAL_SECONDS = 60
+
+class InferenceServer:
+    def __init__(self, path=INFERENCE_SOCKET, ml_agent=None, window_ms=INFERENCE_BATCH_WINDOW_MS,
+                 max_batch=INFERENCE_MAX_BATCH):
+        self.path = path
+        self.ml_agent = ml_agent
+        self.window = window_ms / 1000
+        self.max_batch = max_batch
+        self.stats = {'requests': 0, 'batches': 0}
+        self._queue = None
+
+    def run(self):
+        try:
+            asyncio.run(self.serve())
+        except KeyboardInterrupt:
+            logging.info("🛑 Servidor de inferencia detenido.")
+
+    async def serve(self):
+        self.ml_agent = self.ml_agent or MLAgent()
+        self._queue = asyncio.Queue()
+        if os.path.exists(self.path):
+            os.unlink(self.path)  # socket huérfano de una ejecución anterior
+        server = await asyncio.start_unix_server(self._handle, path=self.path)
+        batcher = asyncio.create_task(self._batch_loop())
+        logging.info(f"🧠 Servidor de inferencia escuchando en {self.path} "
+                     f"(lotes de hasta {self.max_batch}, ventana {self.window * 1000:.1f} ms)")
+        try:
+            async with server:
+                await server.serve_forever()
+        finally:
+            batcher.cancel()
+            if os.path.exists(self.path):
+                os.unlink(self.path)
+
+    # --- Conexiones -------------------------------------------------------
+
+    async def _handle(self, reader, writer):
+        try:
+            while True:
+                line = await reader.readline()
+                if not line:
+                    break
+                try:
+                    response = await self._dispatch(json.loads(line))
+                except Exception as e:
+                    response = {'ok': False, 'error': str(e)}
+                writer.write((json.dumps(response) + "\n").encode())
+                await writer.drain()
+        except (ConnectionResetError, BrokenPipeError):
+            pass
+        finally:
+            writer.close()
+
+    async def _dispatch(self, request):
+        op = request.get('op')
+        if op == 'predict':
+            future = asyncio.get_running_loop().create_future()
+            self._queue.put_nowait((request, future))
+            return await future
+        if op == 'info':
+            agent = self.ml_agent
+            agent.refresh()
+            return {'ok': True, 'ml_ready': agent.ml_ready, 'version': agent.version,
+                    'feature_cols': agent.group.feature_cols if agent.ml_ready else [],
+                    'lookback': agent.lookback}
+        return {'ok': False, 'error': f"Operación desconocida: {op}"}
+
+    # --- Micro-lotes ------------------------------------------------------
+
+    async def _batch_loop(self):
+        last_report = time.monotonic()
+        while True:
+            batch = [await self._queue.get()]
+            # Ventana corta para que lleguen las peticiones de los demás agentes
+            await asyncio.sleep(self.window)
+            while len(batch) < self.max_batch and not self._queue.empty():
+                batch.append(self._queue.get_nowait())
+            self._predict_batch(batch)
+
+            self.stats['requests'] += len(batch)
+            self.stats['batches'] += 1
+            if time.monotonic() - last_report >= STATS_INTERVAL_SECONDS:
+                last_report = time.monotonic()
+                logging.info(f"📈 Inferencia: {self.stats['requests']} peticiones en {self.stats['batches']} lotes "
+                             f"(media {self.stats['requests'] / self.stats['batches']:.1f} por lote)")
+
+    def _predict_batch(self, batch):
+        agent = self.ml_agent
+        pending = [(request, future) for request, future in batch if not future.done()]  # clientes desconectados
+        try:
+            # Nuevo modelo o sombras: se adoptan entre lotes, nunca a mitad de uno
+            agent.refresh()
+            if not agent.ml_ready:
+                raise RuntimeError("Modelo ML no disponible")
+            cols = agent.group.feature_cols
+            rows, times, futures = [], [], []
+            for request, future in pending:
+                features = request.get('features') or {}
+                missing = [col for col in cols if col not in features]
+                if missing:
+                    future.set_result({'ok': False, 'error': f"Faltan features: {missing}", 'feature_cols': cols})
+                    continue
+                rows.append([np.nan if features[col] is None else features[col] for col in cols])
+                times.append(request.get('time'))
+                futures.append(future)
+            if not futures:
+                return
+            signals = agent.get_signals_from_rows(np.asarray(rows, dtype=np.float64), times)
+            for future, (signal, confidence) in zip(futures, signals):
+                future.set_result({'ok': True, 'signal': signal, 'confidence': confidence, 'version': agent.version})
+        except Exception as e:
+            logging.error(f"❌ Error en lote de inferencia: {e}")
+            for _, future in pending:
+                if not future.done():
+                    future.set_result({'ok': False, 'error': str(e)})
+
+class InferenceClient:
+    """
+    Cliente síncrono con la interfaz de MLAgent que usa CryptoAgent (refresh,
+    lookback, version, get_signal_from_dataframe). Las features se calculan
+    en el agente y solo viaja la última fila. Si el servidor no responde se
+    usa un MLAgent local hasta que vuelva.
+    """
+    def __init__(self, path=INFERENCE_SOCKET, timeout=INFERENCE_TIMEOUT_SECONDS):
+        self.path = path
+        self.timeout = timeout
+        self.feature_cols = []
+        self.lookback = 500
+        self.version = None
+        self.ml_ready = False
+        self._sock = None
+        self._reader = None
+        self._local = None
+        self._use_local = False
+        self.refresh()
+
+    def _close(self):
+        if self._sock is not None:
+            try:
+                self._sock.close()
+            except OSError:
+                pass
+        self._sock = self._reader = None
+
+    def _request(self, payload):
+        if self._sock is None:
+            sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+            sock.settimeout(self.timeout)
+            try:
+                sock.connect(self.path)
+            except OSError:
+                sock.close()
+                raise
+            self._sock, self._reader = sock, sock.makefile('rb')
+        try:
+            self._sock.sendall((json.dumps(payload) + "\n").encode())
+            line = self._reader.readline()
+            if not line:
+                raise ConnectionError("El servidor de inferencia cerró la conexión")
+            return json.loads(line)
+        except (OSError, ValueError):
+            self._close()
+            raise
+
+    def _fallback(self, error):
+        if not self._use_local:
+            logging.warning(f"⚠️ Servidor de inferencia no disponible ({error}). Usando el modelo local.")
+            self._use_local = True
+        if self._local is None:
+            self._local = MLAgent()
+        else:
+            self._local.refresh()
+        self.feature_cols = self._local.feature_cols
+        self.lookback = self._local.lookback
+        self.version = self._local.version
+        self.ml_ready = self._local.ml_ready
+        return self._local
+
+    def refresh(self):
+        """Versión, features y velas necesarias del modelo que sirve el servidor (una vez por ciclo)"""
+        try:
+            info = self._request({'op': 'info'})
+        except (OSError, ValueError) as e:
+            self._fallback(e)
+            return
+        if self._use_local:
+            logging.info("🔌 Servidor de inferencia disponible de nuevo.")
+            self._use_local = False
+        self.feature_cols = info['feature_cols']
+        self.lookback = info['lookback']
+        self.version = info['version']
+        self.ml_ready = info['ml_ready']
+
+    def get_signal_from_dataframe(self, df):
+        if self._use_local:
+            return self._local.get_signal_from_dataframe(df)
+        if not self.ml_ready or df.empty:
+            return 'wait'
+        missing = [col for col in self.feature_cols if col not in df.columns]
+        if missing:
+            df = compute_features(df, missing)
+        last = df[self.feature_cols].iloc[-1]
+        payload = {'op': 'predict', 'time': str(df.index[-1]),
+                   'features': {col: (None if np.isnan(value) else float(value)) for col, value in last.items()}}
+        try:
+            response = self._request(payload)
+        except (OSError, ValueError) as e:
+            return self._fallback(e).get_signal_from_dataframe(df)
+        if not response.get('ok'):
+            # p. ej. el servidor adoptó un modelo con otras features: se recogen en el próximo refresh
+            logging.warning(f"⚠️ Servidor de inferencia: {response.get('error')}")
+            return 'wait'
+        self.version = response['version']
+        return response['signal']
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s',
+                        handlers=[logging.StreamHandler(sys.stdout)])
+    InferenceServer().run()
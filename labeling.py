@@ -0,0 +1,133 @@
+# labeling.py
+"""
+Etiquetas de entrenamiento para varias definiciones a la vez.
+
+create_features_and_labels produce una sola columna de etiquetas (un
+lookahead y un threshold). Aquí se generan todas las combinaciones de una
+rejilla de lookaheads x thresholds en una pasada vectorizada sobre el array
+de cierres, como una matriz int8 (1 long, -1 short, 0 esperar):
+
+- fwd_<lookahead>_<threshold>: retorno a `lookahead` velas frente al umbral
+  (la misma etiqueta que create_features_and_labels).
+- tb_<lookahead>_<threshold> (triple barrera, opcional): qué barrera toca
+  antes el high/low de las velas siguientes, +threshold o -threshold; 0 si
+  ninguna se toca en `lookahead` velas o si ambas caen en la misma vela.
+
+Las filas cuyo horizonte pasa del final de la serie llevan LABEL_NONE.
+Ejecuta: python labeling.py  (reparto de clases de cada definición)
+"""
+import numpy as np
+import pandas as pd
+from numpy.lib.stride_tricks import sliding_window_view
+
+LABEL_NONE = np.int8(-128)  # sin etiqueta: el horizonte pasa del final de la serie
+
+DEFAULT_LOOKAHEADS = [4, 6, 10, 16, 24]
+DEFAULT_THRESHOLDS = [0.005, 0.01, 0.015, 0.02, 0.03]
+
+def future_returns(close, lookaheads):
+    """Retorno a cada horizonte: (n, len(lookaheads)), NaN donde el horizonte pasa del final"""
+    close = np.asarray(close, dtype=np.float64)
+    n = len(close)
+    returns = np.full((n, len(lookaheads)), np.nan)
+    for j, lookahead in enumerate(lookaheads):
+        if lookahead < n:
+            # Misma aritmética que (future_close - close) / close en create_features_and_labels
+            returns[:n - lookahead, j] = (close[lookahead:] - close[:n - lookahead]) / close[:n - lookahead]
+    return returns
+
+def forward_labels(returns, thresholds):
+    """Etiquetas por umbral de retorno: (n, horizontes, umbrales) int8"""
+    thresholds = np.asarray(thresholds, dtype=np.float64)
+    r = returns[:, :, None]
+    labels = (r > thresholds).astype(np.int8) - (r < -thresholds)
+    labels[np.isnan(returns)] = LABEL_NONE
+    return labels
+
+def barrier_labels(close, high, low, lookaheads, thresholds, chunk_size=65536):
+    """
+    Etiquetas de triple barrera: (n, horizontes, umbrales) int8.
+    Para cada vela se calcula una sola vez, sobre el horizonte máximo, el
+    máximo/mínimo acumulado de las velas siguientes; la primera vela que toca
+    cada barrera es el nº de velas cuyo máximo acumulado aún no la supera.
+    Las filas se procesan por bloques para acotar la memoria en series largas.
+    """
+    close = np.asarray(close, dtype=np.float64)
+    n = len(close)
+    max_h = max(lookaheads)
+    thresholds = np.asarray(thresholds, dtype=np.float64)
+    lookaheads = np.asarray(lookaheads)
+    # Velas posteriores a t (t+1 ... t+max_h); tras el final nunca se toca ninguna barrera
+    high_next = np.concatenate([np.asarray(high, dtype=np.float64)[1:], np.full(max_h, -np.inf)])
+    low_next = np.concatenate([np.asarray(low, dtype=np.float64)[1:], np.full(max_h, np.inf)])
+
+    labels = np.empty((n, len(lookaheads), len(thresholds)), dtype=np.int8)
+    for start in range(0, n, chunk_size):
+        stop = min(start + chunk_size, n)
+        run_high = np.maximum.accumulate(sliding_window_view(high_next[start:stop + max_h - 1], max_h), axis=1)
+        run_low = np.minimum.accumulate(sliding_window_view(low_next[start:stop + max_h - 1], max_h), axis=1)
+        upper = close[start:stop, None] * (1 + thresholds)
+        lower = close[start:stop, None] * (1 - thresholds)
+        # Índice (0 = vela t+1) del primer toque de cada barrera; max_h si no la toca
+        first_up = (run_high[:, :, None] <= upper[:, None, :]).sum(axis=1)
+        first_down = (run_low[:, :, None] >= lower[:, None, :]).sum(axis=1)
+        for j, lookahead in enumerate(lookaheads):
+            up = (first_up < lookahead) & (first_up < first_down)
+            down = (first_down < lookahead) & (first_down < first_up)
+            labels[start:stop, j] = up.astype(np.int8) - down
+    for j, lookahead in enumerate(lookaheads):
+        labels[max(n - lookahead, 0):, j] = LABEL_NONE
+    return labels
+
+def label_name(kind, lookahead, threshold):
+    return f"{kind}_{lookahead}_{threshold:g}"
+
+def label_matrix(df, lookaheads=DEFAULT_LOOKAHEADS, thresholds=DEFAULT_THRESHOLDS, triple_barrier=False):
+    """
+    DataFrame int8 con una columna por definición de etiqueta (ver el
+    docstring del módulo), alineado con `df`. Necesita 'close' (y 'high' /
+    'low' para la triple barrera).
+    """
+    close = df['close'].to_numpy(dtype=np.float64)
+    blocks = [('fwd', forward_labels(future_returns(close, lookaheads), thresholds))]
+    if triple_barrier:
+        blocks.append(('tb', barrier_labels(close, df['high'].to_numpy(), df['low'].to_numpy(),
+                                            lookaheads, thresholds)))
+    names = [label_name(kind, lookahead, threshold)
+             for kind, _ in blocks for lookahead in lookaheads for threshold in thresholds]
+    values = np.concatenate([labels.reshape(len(df), -1) for _, labels in blocks], axis=1)
+    return pd.DataFrame(values, index=df.index, columns=names)
+
+def select_target(X, labels, column):
+    """Filas con etiqueta en `column` y sus etiquetas: (X, y) listos para entrenar"""
+    valid = (labels[column] != LABEL_NONE).to_numpy()
+    return X[valid], labels.loc[valid, column].astype(np.int64).rename('label')
+
+def class_balance(labels):
+    """Proporción de long / short / esperar de cada definición (sin contar LABEL_NONE)"""
+    rows = {}
+    for column in labels.columns:
+        values = labels[column].to_numpy()
+        values = values[values != LABEL_NONE]
+        rows[column] = {
+            'long': np.mean(values == 1) if len(values) else np.nan,
+            'short': np.mean(values == -1) if len(values) else np.nan,
+            'esperar': np.mean(values == 0) if len(values) else np.nan,
+            'muestras': len(values),
+        }
+    return pd.DataFrame.from_dict(rows, orient='index')
+
+def main():
+    from config import SYMBOL, TRADING_MODE
+    from backfill import load_history
+    symbol_to_use = "BTC/USDT:USDT" if TRADING_MODE == "futures" else SYMBOL
+    df = load_history(symbol_to_use, "1h", days=1000)
+    if df.empty:
+        print("❌ Error al cargar datos.")
+        return
+    labels = label_matrix(df, triple_barrier=True)
+    with pd.option_context('display.max_rows', None, 'display.float_format', '{:.3f}'.format):
+        print(class_balance(labels).to_string())
+
+if __name__ == "__main__":
+    main()
@@ -1,13 +1,18 @@
 # learner.py
-from skopt import gp_minimize
+from skopt import gp_minimize, Optimizer
 from skopt.space import Real
 import numpy as np
 import pandas as pd
+import os
 import pickle
+from concurrent.futures import ProcessPoolExecutor
 from pathlib import Path
-from data import fetch_ohlcv
-from indicators import add_indicators
-from risk_manager import calculate_position_size
+from backfill import load_history
+from shared_arrays import SharedArrays, attach_shared_arrays
+from config import OPTIMIZER_WORKERS, OPTIMIZER_BATCH_SIZE
+from feature_pipeline import compute_features
+from feature_store import add_features
+from risk_manager import calculate_position_size, calculate_position_sizes
 
 # Parámetros por defecto
 DEFAULT_PARAMS = {
@@ -18,30 +23,106 @@ DEFAULT_PARAMS = {
     'risk_per_trade': 0.01
 }
 
+PARAM_NAMES = ['rsi_upper', 'rsi_lower', 'wick_ratio', 'atr_multiple', 'risk_per_trade']
+
+# Espacio de búsqueda
+SEARCH_SPACE = [
+    Real(50, 70, name='rsi_upper'),
+    Real(30, 50, name='rsi_lower'),
+    Real(1.5, 3.0, name='wick_ratio'),
+    Real(1.0, 2.5, name='atr_multiple'),
+    Real(0.005, 0.02, name='risk_per_trade')
+]
+
+# Columnas que usa la estrategia de velas (se calculan una sola vez por dataset)
+STRATEGY_COLS = ['ema50', 'ema200', 'rsi', 'atr', 'body', 'upper_wick', 'lower_wick']
+
+def should_exit_position(last, entry_price, position_type, atr_multiple=1.5):
+    """Cierre por SL/TP con el HIGH/LOW de la vela (misma regla que CryptoAgent._should_exit_position)"""
+    atr = last['atr']
+    if position_type == 'long':
+        sl = entry_price - atr * atr_multiple
+        tp = entry_price + atr * atr_multiple * 2
+        return last['low'] <= sl, last['high'] >= tp, sl, tp
+    sl = entry_price + atr * atr_multiple
+    tp = entry_price - atr * atr_multiple * 2
+    return last['high'] >= sl, last['low'] <= tp, sl, tp
+
 class BacktestOptimizer:
-    def __init__(self, df, symbol, trading_mode="futures"):
+    """
+    Evalúa parámetros de la estrategia sobre un dataset. Los indicadores se
+    calculan una sola vez en el constructor y cada candidato recorre los
+    mismos arrays (antes se recalculaba add_indicators en cada vela).
+    """
+    def __init__(self, df, symbol, trading_mode="futures", start=200):
         self.df = df
         self.symbol = symbol
         self.trading_mode = trading_mode
+        self.start = start
+        features = compute_features(df, STRATEGY_COLS)
+        self.arrays = {col: features[col].to_numpy(dtype=np.float64)
+                       for col in ['open', 'high', 'low', 'close'] + STRATEGY_COLS}
+        close = self.arrays['close']
+        ema50 = self.arrays['ema50']
+        ema200 = self.arrays['ema200']
+        # Reglas que no dependen de los parámetros
+        self.trend_up = (close > ema50) & (ema50 > ema200)
+        self.trend_down = (close < ema50) & (ema50 < ema200)
+
+    @classmethod
+    def from_arrays(cls, arrays, symbol, trading_mode="futures", start=200):
+        """
+        Reconstruye el evaluador a partir de arrays ya calculados (p. ej. vistas
+        sobre memoria compartida en un worker) sin tocar el DataFrame.
+        """
+        optimizer = cls.__new__(cls)
+        optimizer.df = None
+        optimizer.symbol = symbol
+        optimizer.trading_mode = trading_mode
+        optimizer.start = start
+        optimizer.arrays = {col: arrays[col] for col in ['open', 'high', 'low', 'close'] + STRATEGY_COLS}
+        optimizer.trend_up = arrays['trend_up']
+        optimizer.trend_down = arrays['trend_down']
+        return optimizer
+
+    def shared_arrays(self):
+        """Arrays que necesita un worker para evaluar candidatos"""
+        return dict(self.arrays, trend_up=self.trend_up, trend_down=self.trend_down)
 
     def run_backtest_with_params(self, params):
+        return self._score(*self.backtest_stats(params))
+
+    def backtest_stats(self, params):
+        """Simula un candidato y devuelve (PnL total, nº de trades cerrados)"""
         rsi_upper, rsi_lower, wick_ratio, atr_multiple, risk_per_trade = params
         
+        # Listas de Python: el acceso escalar es más rápido que indexar arrays NumPy
+        close = self.arrays['close'].tolist()
+        high = self.arrays['high'].tolist()
+        low = self.arrays['low'].tolist()
+        atr = self.arrays['atr'].tolist()
+        rsi = self.arrays['rsi'].tolist()
+        body = self.arrays['body'].tolist()
+        upper_wick = self.arrays['upper_wick'].tolist()
+        lower_wick = self.arrays['lower_wick'].tolist()
+        trend_up = self.trend_up.tolist()
+        trend_down = self.trend_down.tolist()
+        allow_short = self.trading_mode == "futures"
+
         # Simular backtest con estos parámetros
         capital = 1000.0
         position = None
         trades = 0
         total_pnl = 0.0
 
-        for i in range(200, len(self.df)):
-            current_df = self.df.iloc[:i+1].copy()
-            current_df = add_indicators(current_df)
-            current_price = current_df['close'].iloc[-1]
+        for i in range(self.start, len(close)):
+            current_price = close[i]
 
             # Cerrar posición
             if position:
                 sl_hit, tp_hit, sl, tp = should_exit_position(
-                    current_df, position['entry'], position['type'], atr_multiple
+                    {'atr': atr[i], 'high': high[i], 'low': low[i]},
+                    position['entry'], position['type'], atr_multiple
                 )
                 if sl_hit or tp_hit:
                     pnl = (current_price - position['entry']) * position['size']
@@ -54,64 +135,183 @@ class BacktestOptimizer:
 
             # Abrir posición
             if position is None:
-                # Temporalmente inyectamos los parámetros en la estrategia
-                # (en producción, pasarías params a las funciones)
-                last = current_df.iloc[-1]
-                if (last['close'] > last['ema50'] > last['ema200'] and
-                    last['rsi'] < rsi_upper and
-                    last['lower_wick'] > wick_ratio * last['body']):
+                if (trend_up[i] and
+                    rsi[i] < rsi_upper and
+                    lower_wick[i] > wick_ratio * body[i]):
                     # LONG
-                    sl = current_price - last['atr'] * atr_multiple
+                    sl = current_price - atr[i] * atr_multiple
                     size = calculate_position_size(capital, current_price, sl, risk_per_trade)
                     if size > 0:
                         position = {'type': 'long', 'size': size, 'entry': current_price}
-                elif (self.trading_mode == "futures" and
-                      last['close'] < last['ema50'] < last['ema200'] and
-                      last['rsi'] > rsi_lower and
-                      last['upper_wick'] > wick_ratio * last['body']):
+                elif (allow_short and
+                      trend_down[i] and
+                      rsi[i] > rsi_lower and
+                      upper_wick[i] > wick_ratio * body[i]):
                     # SHORT
-                    sl = current_price + last['atr'] * atr_multiple
+                    sl = current_price + atr[i] * atr_multiple
                     size = calculate_position_size(capital, current_price, sl, risk_per_trade)
                     if size > 0:
                         position = {'type': 'short', 'size': size, 'entry': current_price}
 
+        return total_pnl, trades
+
+    @staticmethod
+    def _score(total_pnl, trades):
         # Métrica a optimizar: Sharpe ratio aproximado (PnL / sqrt(trades))
         if trades == 0:
             return -1e-6  # penalizar no operar
         sharpe = total_pnl / np.sqrt(trades)
         return -sharpe  # minimizar negativo = maximizar Sharpe
 
-def optimize_parameters(symbol="BTC/USDT:USDT", trading_mode="futures", days=2):
+    def run_backtest_batch(self, params_list):
+        """
+        Evalúa K candidatos en una sola pasada sobre las velas: el estado de
+        cada candidato (posición, capital, PnL) es un vector de longitud K.
+        Devuelve la lista de scores en el mismo orden que params_list.
+        """
+        params = np.asarray(params_list, dtype=np.float64).reshape(-1, len(PARAM_NAMES))
+        rsi_upper, rsi_lower, wick_ratio, atr_multiple, risk_per_trade = params.T
+        k = len(params)
+        a = self.arrays
+        allow_short = self.trading_mode == "futures"
+
+        capital = np.full(k, 1000.0)
+        total_pnl = np.zeros(k)
+        trades = np.zeros(k, dtype=np.int64)
+        side = np.zeros(k, dtype=np.int8)  # 1 long, -1 short, 0 sin posición
+        entry = np.zeros(k)
+        size = np.zeros(k)
+
+        # Velas en las que algún candidato podría entrar (para saltar el resto si no hay posiciones)
+        min_wick = wick_ratio.min()
+        maybe_long = self.trend_up & (a['rsi'] < rsi_upper.max()) & (a['lower_wick'] > min_wick * a['body'])
+        maybe_short = self.trend_down & (a['rsi'] > rsi_lower.min()) & (a['upper_wick'] > min_wick * a['body'])
+        maybe_entry = (maybe_long | (maybe_short & allow_short)).tolist()
+
+        close, high, low, atr = (a[col].tolist() for col in ('close', 'high', 'low', 'atr'))
+        rsi, body, upper_wick, lower_wick = (a[col].tolist() for col in ('rsi', 'body', 'upper_wick', 'lower_wick'))
+        trend_up, trend_down = self.trend_up.tolist(), self.trend_down.tolist()
+
+        for i in range(self.start, len(close)):
+            in_position = side != 0
+            any_position = in_position.any()
+            if not any_position and not maybe_entry[i]:
+                continue
+            price = close[i]
+
+            # Cerrar posiciones
+            if any_position:
+                stop = atr_multiple * atr[i]
+                is_long = side == 1
+                sl_hit = np.where(is_long, low[i] <= entry - stop, high[i] >= entry + stop)
+                tp_hit = np.where(is_long, high[i] >= entry + stop * 2, low[i] <= entry - stop * 2)
+                closing = in_position & (sl_hit | tp_hit)
+                if closing.any():
+                    pnl = (price - entry) * size
+                    pnl = np.where(side == -1, -pnl, pnl)
+                    total_pnl = np.where(closing, total_pnl + pnl, total_pnl)
+                    capital = np.where(closing, capital + pnl, capital)
+                    trades += closing
+                    side[closing] = 0
+
+            # Abrir posiciones
+            if not maybe_entry[i]:
+                continue
+            flat = side == 0
+            if trend_up[i]:
+                go_long = flat & (rsi[i] < rsi_upper) & (lower_wick[i] > wick_ratio * body[i])
+            else:
+                go_long = np.zeros(k, dtype=bool)
+            if allow_short and trend_down[i]:
+                go_short = flat & ~go_long & (rsi[i] > rsi_lower) & (upper_wick[i] > wick_ratio * body[i])
+            else:
+                go_short = np.zeros(k, dtype=bool)
+            opening = go_long | go_short
+            if opening.any():
+                stop = atr[i] * atr_multiple
+                sl = np.where(go_long, price - stop, price + stop)
+                new_size = calculate_position_sizes(capital, price, sl, risk_per_trade)
+                opening &= new_size > 0
+                side[opening & go_long] = 1
+                side[opening & go_short] = -1
+                entry = np.where(opening, price, entry)
+                size = np.where(opening, new_size, size)
+
+        return [self._score(pnl, n) for pnl, n in zip(total_pnl.tolist(), trades.tolist())]
+
+# Estado de cada proceso worker (se rellena en _init_worker)
+_worker_optimizer = None
+
+def _init_worker(spec, symbol, trading_mode, start):
+    global _worker_optimizer
+    arrays = attach_shared_arrays(spec)
+    _worker_optimizer = BacktestOptimizer.from_arrays(arrays, symbol, trading_mode, start)
+
+def _evaluate_candidates(params_list):
+    if len(params_list) == 1:
+        # Un solo candidato: el bucle escalar es más rápido que el vectorizado con K=1
+        return [_worker_optimizer.run_backtest_with_params(params_list[0])]
+    return _worker_optimizer.run_backtest_batch(params_list)
+
+def optimize_parallel(optimizer, space, n_calls=40, n_workers=None, batch_size=None, random_state=42):
+    """
+    Optimización bayesiana por lotes (ask/tell): en cada ronda el GP propone
+    `batch_size` candidatos que se reparten entre `n_workers` procesos. Los
+    arrays de velas e indicadores se comparten vía memoria compartida.
+    Devuelve la mejor combinación de parámetros (lista en el orden de `space`).
+    """
+    n_workers = n_workers or os.cpu_count() or 1
+    batch_size = batch_size or n_workers
+    bayes = Optimizer(space, base_estimator="GP", n_initial_points=min(10, n_calls), random_state=random_state)
+
+    with SharedArrays(optimizer.shared_arrays()) as shared, ProcessPoolExecutor(
+        max_workers=n_workers,
+        initializer=_init_worker,
+        initargs=(shared.spec, optimizer.symbol, optimizer.trading_mode, optimizer.start),
+    ) as pool:
+        evaluated = 0
+        while evaluated < n_calls:
+            candidates = bayes.ask(n_points=min(batch_size, n_calls - evaluated))
+            chunks = [chunk.tolist() for chunk in np.array_split(np.asarray(candidates, dtype=object), n_workers) if len(chunk)]
+            scores = [score for chunk_scores in pool.map(_evaluate_candidates, chunks) for score in chunk_scores]
+            bayes.tell(candidates, scores)
+            evaluated += len(candidates)
+            print(f"   ⚙️ {evaluated}/{n_calls} evaluaciones | mejor score: {min(bayes.yi):.4f}")
+
+    return bayes.get_result().x
+
+def optimize_parameters(symbol="BTC/USDT:USDT", trading_mode="futures", days=2,
+                        n_workers=OPTIMIZER_WORKERS, batch_size=OPTIMIZER_BATCH_SIZE):
     print("🧠 Iniciando optimización con datos reales...")
     
-    # Cargar datos históricos
-    limit = 1440 * days  # minutos en 'days' días
-    df = fetch_ohlcv(symbol, "1m", limit=limit)
+    # Cargar datos históricos (paginados: Binance no devuelve más de ~1500 velas por petición)
+    df = load_history(symbol, "1m", days=days)
     if df.empty or len(df) < 300:
         print("⚠️  Datos insuficientes para optimizar.")
         return DEFAULT_PARAMS
 
+    # Indicadores desde el feature store (BacktestOptimizer no recalcula columnas existentes)
+    df = add_features(symbol, "1m", df, STRATEGY_COLS)
     optimizer = BacktestOptimizer(df, symbol, trading_mode)
     
-    # Espacio de búsqueda
-    space = [
-        Real(50, 70, name='rsi_upper'),
-        Real(30, 50, name='rsi_lower'),
-        Real(1.5, 3.0, name='wick_ratio'),
-        Real(1.0, 2.5, name='atr_multiple'),
-        Real(0.005, 0.02, name='risk_per_trade')
-    ]
-
-    # Optimizar
-    result = gp_minimize(
-        optimizer.run_backtest_with_params,
-        space,
-        n_calls=40,
-        random_state=42,
-        n_jobs=-1
-    )
-
-    best = dict(zip(['rsi_upper', 'rsi_lower', 'wick_ratio', 'atr_multiple', 'risk_per_trade'], result.x))
+    space = SEARCH_SPACE
+
+    # Optimizar: por lotes en varios procesos, o secuencial con gp_minimize si solo hay un núcleo
+    workers = n_workers or os.cpu_count() or 1
+    if workers > 1:
+        best_x = optimize_parallel(optimizer, space, n_calls=40, n_workers=workers,
+                                   batch_size=batch_size, random_state=42)
+    else:
+        result = gp_minimize(
+            optimizer.run_backtest_with_params,
+            space,
+            n_calls=40,
+            random_state=42,
+            n_jobs=-1
+        )
+        best_x = result.x
+
+    best = dict(zip(PARAM_NAMES, best_x))
     
     # Guardar
     with open('best_params.pkl', 'wb') as f:
@@ -2,12 +2,9 @@ import logging
 import schedule
 import time
 from agent import CryptoAgent
-from config import SIGNAL_TIMEFRAME, EXECUTION_TIMEFRAME
+from config import SYMBOL, SIGNAL_TIMEFRAME, EXECUTION_TIMEFRAME, MARKET_DATA_MODE, STREAM_BUFFER_SIZE
 
-def main():
-    agent = CryptoAgent()
-    logging.info(f"🚀 Agente iniciado | Señales: {SIGNAL_TIMEFRAME} | Ejecución: {EXECUTION_TIMEFRAME}")
-    
+def run_polling(agent):
     agent.run_once()
     
     # Programar ejecución en EXECUTION_TIMEFRAME
@@ -25,5 +22,39 @@ def main():
         schedule.run_pending()
         time.sleep(1)
 
+def run_streaming():
+    from data import fetch_ohlcv
+    from market_stream import KlineBuffer, KlineFeed, BinanceKlineSource
+
+    timeframes = [EXECUTION_TIMEFRAME, SIGNAL_TIMEFRAME]
+    buffer = KlineBuffer(capacity=STREAM_BUFFER_SIZE)
+    for timeframe in timeframes:
+        buffer.seed(SYMBOL, timeframe, fetch_ohlcv(SYMBOL, timeframe))
+    
+    feed = KlineFeed(BinanceKlineSource([(SYMBOL, tf) for tf in timeframes]), EXECUTION_TIMEFRAME, buffer)
+    agent = CryptoAgent(market_data=feed)
+    feed.start()
+    logging.info(f"📡 Modo streaming: el agente reacciona a cada cierre de vela de {EXECUTION_TIMEFRAME}")
+    
+    agent.run_once()
+    try:
+        while True:
+            if feed.wait_for_close(timeout=60) is None:
+                continue
+            # Si se acumularon cierres (ciclo lento), procesar solo el más reciente
+            while feed.wait_for_close(timeout=0) is not None:
+                pass
+            agent.run_once()
+    finally:
+        feed.stop()
+
+def main():
+    logging.info(f"🚀 Agente iniciado | Señales: {SIGNAL_TIMEFRAME} | Ejecución: {EXECUTION_TIMEFRAME}")
+    
+    if MARKET_DATA_MODE == "stream":
+        run_streaming()
+    else:
+        run_polling(CryptoAgent())
+
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    main()
@@ -0,0 +1,184 @@
+# market_stream.py
+import asyncio
+import logging
+import queue
+import threading
+import time
+from collections import deque
+from config import TRADING_MODE
+from candle_store import get_candle_store, ohlcv_to_dataframe, timeframe_to_ms
+
+class KlineBuffer:
+    """
+    Buffer en memoria con las últimas velas por (símbolo, timeframe).
+    Recibe velas parciales y cerradas; cuando llega la primera actualización
+    de una vela nueva, la anterior se da por cerrada y se avisa a los oyentes
+    con la vela nueva ya en el buffer (igual que vería un sondeo REST).
+    """
+    def __init__(self, capacity=1000):
+        self.capacity = capacity
+        self._candles = {}
+        self._lock = threading.Lock()
+        self._listeners = []
+
+    def add_listener(self, callback):
+        """callback(symbol, timeframe, closed_timestamp_ms)"""
+        self._listeners.append(callback)
+
+    def seed(self, symbol, timeframe, df):
+        """Carga el histórico inicial (p.ej. desde REST o desde el almacén de velas)"""
+        rows = deque(maxlen=self.capacity)
+        timestamps = df.index.values.astype('datetime64[ms]').astype('int64')
+        for ts, values in zip(timestamps, df[['open', 'high', 'low', 'close', 'volume']].to_numpy()):
+            rows.append([int(ts), *map(float, values)])
+        with self._lock:
+            self._candles[(symbol, timeframe)] = rows
+
+    def update(self, symbol, timeframe, candle):
+        """candle = [timestamp_ms, open, high, low, close, volume]"""
+        closed_ts = None
+        with self._lock:
+            rows = self._candles.setdefault((symbol, timeframe), deque(maxlen=self.capacity))
+            candle = [int(candle[0]), *map(float, candle[1:6])]
+            if rows and candle[0] == rows[-1][0]:
+                rows[-1] = candle
+            elif not rows or candle[0] > rows[-1][0]:
+                if rows:
+                    closed_ts = rows[-1][0]
+                rows.append(candle)
+            else:
+                return  # vela antigua fuera de orden: ignorar
+
+        if closed_ts is not None:
+            for callback in self._listeners:
+                try:
+                    callback(symbol, timeframe, closed_ts)
+                except Exception as e:
+                    logging.error(f"❌ Error en oyente de velas: {e}", exc_info=True)
+
+    def has(self, symbol, timeframe):
+        with self._lock:
+            return bool(self._candles.get((symbol, timeframe)))
+
+    def get_dataframe(self, symbol, timeframe, limit=None):
+        """Devuelve las velas en el mismo formato que data.fetch_ohlcv"""
+        with self._lock:
+            rows = list(self._candles.get((symbol, timeframe), ()))
+        if limit:
+            rows = rows[-limit:]
+        return ohlcv_to_dataframe(rows)
+
+class BinanceKlineSource:
+    """Fuente en vivo vía websocket (ccxt.pro watch_ohlcv), reconecta sola"""
+    def __init__(self, subscriptions, trading_mode=TRADING_MODE):
+        self.subscriptions = subscriptions  # [(symbol, timeframe), ...]
+        self.trading_mode = trading_mode
+
+    def run(self, buffer, stop_event):
+        asyncio.run(self._run(buffer, stop_event))
+
+    async def _run(self, buffer, stop_event):
+        import ccxt.pro as ccxtpro
+        exchange_class = ccxtpro.binanceusdm if self.trading_mode == "futures" else ccxtpro.binance
+        exchange = exchange_class({'enableRateLimit': True})
+        try:
+            await asyncio.gather(*[
+                self._watch(exchange, symbol, timeframe, buffer, stop_event)
+                for symbol, timeframe in self.subscriptions
+            ])
+        finally:
+            await exchange.close()
+
+    async def _watch(self, exchange, symbol, timeframe, buffer, stop_event):
+        backoff = 1
+        while not stop_event.is_set():
+            try:
+                candles = await exchange.watch_ohlcv(symbol, timeframe)
+                for candle in candles:
+                    buffer.update(symbol, timeframe, candle)
+                backoff = 1
+            except Exception as e:
+                logging.warning(f"🌐 Websocket {symbol} {timeframe} caído: {str(e)[:100]}. Reintentando en {backoff}s")
+                await asyncio.sleep(backoff)
+                backoff = min(backoff * 2, 60)
+
+class ReplayKlineSource:
+    """
+    Reproduce velas grabadas como si llegaran por websocket, para probar el
+    flujo sin conexión. Cada vela se emite primero como parcial al abrir
+    (o=h=l=c=open, volumen 0) y después completa al cerrar, intercalando
+    todos los timeframes por tiempo para no filtrar información futura.
+    """
+    def __init__(self, frames, delay=0.0):
+        self.frames = frames  # {(symbol, timeframe): DataFrame}
+        self.delay = delay
+
+    @classmethod
+    def from_store(cls, symbol, timeframes, start=None, end=None, delay=0.0):
+        store = get_candle_store()
+        return cls({(symbol, tf): store.load(symbol, tf, start, end) for tf in timeframes}, delay=delay)
+
+    def _events(self):
+        events = []
+        for (symbol, timeframe), df in self.frames.items():
+            tf_ms = timeframe_to_ms(timeframe)
+            timestamps = df.index.values.astype('datetime64[ms]').astype('int64')
+            for ts, (o, h, l, c, v) in zip(timestamps, df[['open', 'high', 'low', 'close', 'volume']].to_numpy()):
+                ts = int(ts)
+                # Orden: cierres antes que aperturas; en aperturas, timeframes mayores primero
+                events.append((ts, 1, -tf_ms, symbol, timeframe, [ts, o, o, o, o, 0.0]))
+                events.append((ts + tf_ms, 0, -tf_ms, symbol, timeframe, [ts, o, h, l, c, v]))
+        events.sort(key=lambda e: e[:3])
+        return events
+
+    def run(self, buffer, stop_event=None):
+        for _, _, _, symbol, timeframe, candle in self._events():
+            if stop_event is not None and stop_event.is_set():
+                break
+            buffer.update(symbol, timeframe, candle)
+            if self.delay:
+                time.sleep(self.delay)
+
+class KlineFeed:
+    """
+    Une una fuente de velas con el buffer y expone los cierres de vela del
+    timeframe de ejecución como una cola que consume el bucle principal.
+    """
+    def __init__(self, source, trigger_timeframe, buffer=None):
+        self.source = source
+        self.trigger_timeframe = trigger_timeframe
+        self.buffer = buffer or KlineBuffer()
+        self.closed_candles = queue.Queue()
+        self._stop_event = threading.Event()
+        self._thread = None
+        self.buffer.add_listener(self._on_close)
+
+    def _on_close(self, symbol, timeframe, closed_ts):
+        if timeframe == self.trigger_timeframe:
+            self.closed_candles.put((symbol, timeframe, closed_ts))
+
+    def start(self):
+        self._thread = threading.Thread(target=self._run, name="kline-feed", daemon=True)
+        self._thread.start()
+
+    def _run(self):
+        try:
+            self.source.run(self.buffer, self._stop_event)
+        except Exception as e:
+            logging.error(f"💥 Fuente de velas detenida: {e}", exc_info=True)
+
+    def stop(self):
+        self._stop_event.set()
+
+    def wait_for_close(self, timeout=None):
+        """Bloquea hasta el próximo cierre de vela; None si vence el timeout"""
+        try:
+            return self.closed_candles.get(timeout=timeout)
+        except queue.Empty:
+            return None
+
+    def get_dataframe(self, symbol, timeframe, limit=None):
+        return self.buffer.get_dataframe(symbol, timeframe, limit)
+
+    def has(self, symbol, timeframe):
+        return self.buffer.has(symbol, timeframe)
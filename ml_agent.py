@@ -1,51 +1,170 @@
+import json
 import logging
 import pandas as pd
-try:
-    import joblib
-    MODEL = joblib.load('ml_model.pkl')
-    FEATURE_COLS = joblib.load('feature_cols.pkl')
-    ML_READY = True
-except FileNotFoundError:
-    logging.warning("❌ Modelo ML no encontrado. Ejecuta 'ml_trainer.py' primero.")
-    MODEL = None
-    FEATURE_COLS = []
-    ML_READY = False
+from config import SHADOW_LOG_FILE, ML_CONFIDENCE_THRESHOLD
+from feature_pipeline import compute_features, feature_lookback, plan_features
+from forest_inference import ForestGroup
+from model_loader import get_model_loader
+from model_registry import get_model_registry
 
 class MLAgent:
-    def __init__(self):
-        self.model = MODEL
-        self.feature_cols = FEATURE_COLS
-        self.ml_ready = ML_READY
+    def __init__(self, loader=None, registry=None):
+        # El modelo se carga en el primer uso y se recarga en caliente (ver model_loader.py)
+        self.loader = loader or get_model_loader()
+        self.registry = registry or get_model_registry()
+        self.bundle = None
+        self.forest = None
+        self.feature_cols = []
+        self.version = None
+        self.confidence_threshold = ML_CONFIDENCE_THRESHOLD
+        self._thresholds = {}
+        self.ml_ready = False
+        self.lookback = 500
+        # Modelos sombra: se evalúan junto al activo en el mismo recorrido y solo se registran
+        self.shadow_versions = []
+        self.shadows = []
+        self.group = None
+        self.refresh()
         if self.ml_ready:
             logging.info("🤖 Modelo ML cargado exitosamente.")
         else:
             logging.warning("⚠️  Modelo ML no disponible.")
 
+    def refresh(self):
+        """
+        Adopta la última versión publicada del modelo y la lista de modelos
+        sombra del registro. Se llama al inicio de cada ciclo: durante el
+        ciclo los modelos y sus features no cambian.
+        """
+        try:
+            bundle = self.loader.get()
+        except FileNotFoundError:
+            if self.bundle is None:
+                logging.warning("❌ Modelo ML no encontrado. Ejecuta 'ml_trainer.py' primero.")
+            return
+        except Exception as e:
+            logging.error(f"❌ Error cargando el modelo ML: {e}")
+            return
+        changed = bundle is not self.bundle
+        if changed:
+            if self.bundle is not None:
+                logging.info(f"🔄 Usando la nueva versión del modelo ML ({bundle.version or 'sin versión'})")
+            self.bundle = bundle
+            # Bosque aplanado: predicción y probabilidades de la última vela en un solo recorrido
+            self.forest = bundle.forest
+            self.feature_cols = bundle.feature_cols
+            self.version = bundle.version
+            self.confidence_threshold = self._confidence_threshold(bundle.version)
+            self.ml_ready = True
+            # Velas mínimas para calcular las features del modelo en la última vela
+            try:
+                self.lookback = feature_lookback(self.feature_cols)
+            except KeyError as e:
+                logging.warning(f"⚠️ Feature sin registrar en feature_pipeline ({e}). Usando 500 velas.")
+                self.lookback = 500
+
+        try:
+            shadow_versions = self.registry.shadow_versions()
+        except Exception as e:
+            logging.warning(f"⚠️ No se pudo leer el registro de modelos: {e}")
+            shadow_versions = self.shadow_versions
+        if changed or shadow_versions != self.shadow_versions:
+            self._build_group(shadow_versions)
+
+    def _build_group(self, shadow_versions):
+        shadows = []
+        for version in shadow_versions:
+            if version == self.version:
+                continue
+            try:
+                bundle = self.registry.loader(version).get()
+                plan_features(bundle.feature_cols)  # KeyError si no se puede calcular en vivo
+                shadows.append((version, bundle))
+            except Exception as e:
+                logging.warning(f"⚠️ Modelo sombra {version} descartado: {e}")
+        self.shadow_versions = shadow_versions
+        self.shadows = shadows
+        self.group = ForestGroup([self.forest] + [bundle.forest for _, bundle in shadows],
+                                 [self.feature_cols] + [bundle.feature_cols for _, bundle in shadows])
+        if shadows:
+            logging.info(f"👥 Modelos sombra activos: {[version for version, _ in shadows]}")
+
     def get_signal(self, symbol, timeframe="1h"):
         """Obsoleto: usa get_signal_from_dataframe en su lugar"""
         if not self.ml_ready:
             return "wait"
         # ... código antiguo (puedes eliminarlo si usas solo get_signal_from_dataframe)
 
+    def _confidence_threshold(self, version):
+        """Confianza mínima elegida para esa versión (meta.json del registro; las versiones no cambian)"""
+        if version is None:
+            return ML_CONFIDENCE_THRESHOLD
+        if version not in self._thresholds:
+            try:
+                meta = self.registry.metadata(version)
+                self._thresholds[version] = float(meta.get('confidence_threshold', ML_CONFIDENCE_THRESHOLD))
+            except (OSError, ValueError) as e:
+                logging.warning(f"⚠️ Sin metadatos para {version} ({e}). Confianza mínima {ML_CONFIDENCE_THRESHOLD}")
+                return ML_CONFIDENCE_THRESHOLD
+        return self._thresholds[version]
+
+    @staticmethod
+    def _decide(preds, probas, min_confidence=ML_CONFIDENCE_THRESHOLD):
+        pred = preds[0]
+        confidence = probas[0].max()
+        if confidence < min_confidence:
+            return 'wait', confidence
+        return ('long' if pred == 1 else 'short' if pred == -1 else 'wait'), confidence
+
+    def _log_shadows(self, candle_time, signal, confidence, shadow_results):
+        """Una línea JSON por señal: activo y sombras, para compararlos después"""
+        record = {
+            'time': str(candle_time),
+            'active': {'version': self.version, 'signal': signal, 'confidence': round(float(confidence), 4)},
+            'shadows': [],
+        }
+        for (version, _), result in zip(self.shadows, shadow_results):
+            shadow_signal, shadow_confidence = self._decide(*result, self._confidence_threshold(version))
+            record['shadows'].append({'version': version, 'signal': shadow_signal,
+                                      'confidence': round(float(shadow_confidence), 4)})
+        try:
+            with open(SHADOW_LOG_FILE, "a", encoding="utf-8") as f:
+                f.write(json.dumps(record) + "\n")
+        except OSError as e:
+            logging.warning(f"⚠️ No se pudo registrar la señal de los modelos sombra: {e}")
+
+    def get_signals_from_rows(self, X, candle_times):
+        """
+        [(señal, confianza)] del modelo activo para varias filas (columnas en el
+        orden de group.feature_cols) en un solo recorrido de los árboles. Los
+        modelos sombra se registran fila a fila.
+        """
+        results = self.group.predict_with_proba(X)
+        preds, probas = results[0]
+        signals = []
+        for i, candle_time in enumerate(candle_times):
+            signal, confidence = self._decide(preds[i:i + 1], probas[i:i + 1], self.confidence_threshold)
+            if self.shadows:
+                self._log_shadows(candle_time, signal, confidence,
+                                  [(shadow_preds[i:i + 1], shadow_probas[i:i + 1]) for shadow_preds, shadow_probas in results[1:]])
+            signals.append((signal, float(confidence)))
+        return signals
+
     def get_signal_from_dataframe(self, df):
         """Genera señal a partir de un DataFrame preprocesado"""
         if not self.ml_ready or df.empty:
             return 'wait'
         
         try:
-            # Asegurar que todas las features existan
-            if 'liquidez' not in df.columns:
-                df['spread'] = (df['high'] - df['low']) / df['close']
-                df['liquidez'] = df['volume'] / (df['spread'] + 1e-8)
-            
-            last_row = df[self.feature_cols].iloc[-1:].copy()
-            pred = self.model.predict(last_row)[0]
-            proba = self.model.predict_proba(last_row)[0]
-            confidence = max(proba)
+            # Asegurar que todas las features existan (solo se calculan las que faltan)
+            missing = [col for col in self.group.feature_cols if col not in df.columns]
+            if missing:
+                df = compute_features(df, missing)
             
-            if confidence < 0.4:
-                return 'wait'
-            return 'long' if pred == 1 else 'short' if pred == -1 else 'wait'
+            # Activo + sombras sobre la misma fila en un solo recorrido de los árboles
+            last_row = df[self.group.feature_cols].iloc[-1:].to_numpy()
+            signal, _ = self.get_signals_from_rows(last_row, [df.index[-1]])[0]
+            return signal
         except Exception as e:
             logging.error(f"Error en ML: {e}")
             return 'wait'
@@ -5,26 +5,57 @@ import logging
 import joblib
 import time
 import json
+import pickle
+import sys
 from datetime import datetime
 from pathlib import Path
-from config import SYMBOL, TRADING_MODE
-from data import fetch_ohlcv
-from indicators import add_indicators
+from config import (SYMBOL, TRADING_MODE, INCREMENTAL_WINDOW_DAYS, INCREMENTAL_NEW_TREES,
+                    INCREMENTAL_MAX_TREES, INCREMENTAL_MAX_AGE_DAYS, ML_CONFIDENCE_THRESHOLD, ML_PARAMS_FILE)
+from backfill import load_history
+from feature_pipeline import compute_features
+from feature_store import add_features
+from labeling import label_matrix, DEFAULT_LOOKAHEADS, DEFAULT_THRESHOLDS
 from utils_ml import load_real_trades_as_labels
+from model_registry import get_model_registry
 from risk_manager import calculate_position_size
 from sklearn.model_selection import train_test_split
 from sklearn.ensemble import RandomForestClassifier
 from sklearn.metrics import classification_report
 from sklearn.utils.class_weight import compute_class_weight
 
+FEATURE_COLUMNS = [
+    'open', 'high', 'low', 'close', 'volume',
+    'ema50', 'ema200', 'rsi', 'atr',
+    'upper_wick', 'lower_wick', 'body',
+    'liquidez'
+]
+
+# Hiperparámetros del modelo y de sus etiquetas (model_search.py guarda los mejores en ML_PARAMS_FILE)
+DEFAULT_MODEL_PARAMS = {
+    'n_estimators': 100,
+    'max_depth': 10,
+    'min_samples_leaf': 1,
+    'lookahead': 10,
+    'threshold': 0.015,
+    'confidence': ML_CONFIDENCE_THRESHOLD,
+}
+
+FOREST_PARAMS = ['n_estimators', 'max_depth', 'min_samples_leaf']
+
+def load_best_model_params():
+    try:
+        with open(ML_PARAMS_FILE, 'rb') as f:
+            return dict(DEFAULT_MODEL_PARAMS, **pickle.load(f))
+    except FileNotFoundError:
+        return dict(DEFAULT_MODEL_PARAMS)
+
 def create_features_and_labels(df, lookahead=10, threshold=0.015):
     """
     Crea features (X) y etiquetas (y) para entrenamiento.
+    Las features que ya estén en `df` no se recalculan.
     """
-    df = df.copy()
-    
-    # ✅ AÑADIR INDICADORES PRIMERO
-    df = add_indicators(df)
+    # ✅ AÑADIR SOLO LAS FEATURES QUE FALTAN
+    df = compute_features(df, FEATURE_COLUMNS).copy()
     
     # Calcular retorno futuro
     df['future_close'] = df['close'].shift(-lookahead)
@@ -39,12 +70,7 @@ def create_features_and_labels(df, lookahead=10, threshold=0.015):
     df = df.dropna()
     
     # Features
-    feature_cols = [
-        'open', 'high', 'low', 'close', 'volume',
-        'ema50', 'ema200', 'rsi', 'atr',
-        'upper_wick', 'lower_wick', 'body',
-        'liquidez'
-    ]
+    feature_cols = list(FEATURE_COLUMNS)
     
     # ✅ VERIFICAR QUE TODAS LAS COLUMNAS EXISTAN
     missing_cols = [col for col in feature_cols if col not in df.columns]
@@ -58,9 +84,157 @@ def create_features_and_labels(df, lookahead=10, threshold=0.015):
     
     return X, y, feature_cols
 
-def train_ml_model(symbol="BTC/USDT:USDT", days=30):
+def create_features_and_label_matrix(df, lookaheads=DEFAULT_LOOKAHEADS, thresholds=DEFAULT_THRESHOLDS,
+                                     triple_barrier=False):
+    """
+    Features (X) y todas las definiciones de etiqueta de la rejilla
+    lookaheads x thresholds (matriz int8, ver labeling.py) con una sola carga
+    de datos. Elige el objetivo con labeling.select_target(X, labels, columna);
+    'fwd_10_0.015' equivale a create_features_and_labels(df, 10, 0.015).
+    """
+    df = compute_features(df, FEATURE_COLUMNS)
+    labels = label_matrix(df, lookaheads, thresholds, triple_barrier=triple_barrier)
+    feature_cols = list(FEATURE_COLUMNS)
+    valid = df.notna().all(axis=1).to_numpy()
+    return df.loc[valid, feature_cols], labels[valid], feature_cols
+
+def join_real_trades(df, df_real, feature_cols, tolerance=pd.Timedelta("1h")):
+    """
+    Asigna cada trade real a la vela más cercana con un merge_asof ordenado
+    (sin bucles por trade). Los trades a más de `tolerance` de cualquier vela
+    se descartan. Devuelve X_real, y_real y el PnL de cada trade, alineados.
+    """
+    candles = pd.DataFrame({
+        'timestamp': df.index.values.astype('datetime64[ns]'),
+        'row': np.arange(len(df)),
+    })
+    trades = pd.DataFrame({
+        'timestamp': df_real['timestamp'].values.astype('datetime64[ns]'),
+        'label': df_real['label'].to_numpy(),
+        'pnl': df_real['pnl'].to_numpy(dtype=np.float64) if 'pnl' in df_real.columns else np.nan,
+    }).sort_values('timestamp', kind='stable')
+    matched = pd.merge_asof(trades, candles, on='timestamp', direction='nearest', tolerance=tolerance)
+    found = matched['row'].notna().to_numpy()
+    if not found.all():
+        logging.warning(f"⚠️ {int((~found).sum())} trades reales fuera del rango de velas. Se ignoran.")
+    matched = matched[found]
+    rows = matched['row'].to_numpy(dtype=np.intp)
+    X_real = pd.DataFrame(df[feature_cols].to_numpy()[rows], columns=feature_cols)
+    return X_real, matched['label'].to_numpy(), matched['pnl'].to_numpy()
+
+def impact_weights(n_hist, pnl):
+    """
+    Peso 1 para las muestras históricas y max(0.1, |PnL|) para los trades
+    reales (1.0 si no tienen PnL); después todo se reescala a 0.10 - 1.00.
+    """
+    weights = np.ones(n_hist + len(pnl))
+    weights[n_hist:] = np.maximum(0.1, np.abs(np.nan_to_num(pnl, nan=1.0)))
+    min_weight, max_weight = weights.min(), weights.max()
+    if max_weight > min_weight:
+        weights = 0.1 + 0.9 * (weights - min_weight) / (max_weight - min_weight)
+    return weights
+
+def build_training_set(df, df_real, lookahead=10, threshold=0.015):
+    """
+    Features, etiquetas y pesos de entrenamiento en una pasada columnar:
+    muestras históricas etiquetadas por retorno futuro + trades reales
+    etiquetados por su resultado. Devuelve (X, y, pesos, feature_cols, nº de reales).
+    """
+    X, y, feature_cols = create_features_and_labels(df, lookahead=lookahead, threshold=threshold)
+    X = X.reset_index(drop=True)
+    y = y.reset_index(drop=True)
+    if df_real is None or df_real.empty:
+        return X, y, np.ones(len(X)), feature_cols, 0
+
+    print(f"➕ Añadiendo {len(df_real)} trades reales al entrenamiento...")
+    features = compute_features(df, feature_cols)
+    X_real, y_real, pnl = join_real_trades(features, df_real, feature_cols)
+    X = pd.concat([X, X_real], ignore_index=True)
+    y = pd.concat([y, pd.Series(y_real, dtype=y.dtype)], ignore_index=True)
+    return X, y, impact_weights(len(X) - len(X_real), pnl), feature_cols, len(X_real)
+
+def balanced_class_weights(y_train):
+    classes = np.array(sorted(set(y_train)))  # ✅ CONVERTIR A NUMPY ARRAY
+    class_weights = compute_class_weight('balanced', classes=classes, y=y_train)
+    return dict(zip(classes.tolist(), class_weights.tolist()))  # ✅ Convertir de vuelta a lista para el dict
+
+def build_model(class_weight_dict, n_jobs=-1, n_estimators=100, max_depth=10, min_samples_leaf=1):
+    """Random Forest con la configuración de producción"""
+    return RandomForestClassifier(
+        n_estimators=n_estimators,
+        max_depth=max_depth,
+        min_samples_leaf=min_samples_leaf,
+        random_state=42,
+        class_weight=class_weight_dict,
+        n_jobs=n_jobs
+    )
+
+def grow_forest(model, X, y, sample_weight=None, n_new=INCREMENTAL_NEW_TREES, data_end=None):
+    """
+    Añade `n_new` árboles entrenados con (X, y) a un bosque ya entrenado
+    (warm_start): los árboles existentes no se tocan. Cada árbol recuerda la
+    última vela que vio (tree_data_end_) para poder retirarlo por antigüedad.
+
+    Con warm_start, sklearn avanza el generador len(estimators_) posiciones
+    antes de sembrar los árboles nuevos: tras retire_trees se repetirían las
+    semillas de árboles ya añadidos. Cada llamada usa otra random_state,
+    derivada de la semilla original y de un contador guardado en el modelo.
+    """
+    classes = np.asarray(model.classes_)
+    if not np.array_equal(np.unique(y), classes):
+        raise ValueError(f"Los datos nuevos no contienen todas las clases del modelo {classes.tolist()}")
+    n_old = len(model.estimators_)
+    data_ends = list(getattr(model, 'tree_data_end_', [None] * n_old))
+    base_seed = getattr(model, 'base_random_state_', model.random_state)
+    growth_round = getattr(model, 'growth_round_', 0) + 1
+    random_state = None if base_seed is None else int(
+        np.random.SeedSequence([base_seed, growth_round]).generate_state(1)[0])
+    model.set_params(warm_start=True, n_estimators=n_old + n_new, random_state=random_state,
+                     class_weight=balanced_class_weights(y), n_jobs=-1)
+    model.fit(X, y, sample_weight=sample_weight)
+    model.set_params(warm_start=False)
+    model.tree_data_end_ = data_ends + [data_end] * n_new
+    model.base_random_state_ = base_seed
+    model.growth_round_ = growth_round
+    return model
+
+def retire_trees(model, max_trees=INCREMENTAL_MAX_TREES, max_age=None):
+    """
+    Política de retirada: fuera los árboles cuyos datos terminan más de
+    `max_age` antes que los del árbol más reciente (y los de antigüedad
+    desconocida, si hay `max_age`); después, los más antiguos hasta quedar
+    `max_trees`. Los árboles se añaden en orden, así que estimators_ ya está
+    ordenado del más antiguo al más nuevo. Devuelve el nº de árboles retirados.
+    """
+    data_ends = list(getattr(model, 'tree_data_end_', [None] * len(model.estimators_)))
+    keep = np.ones(len(data_ends), dtype=bool)
+    known = [end for end in data_ends if end is not None]
+    if max_age is not None and known:
+        newest = max(known)
+        keep = np.array([end is not None and end >= newest - max_age for end in data_ends])
+    kept = np.flatnonzero(keep)[-max_trees:]
+    model.estimators_ = [model.estimators_[i] for i in kept]
+    model.tree_data_end_ = [data_ends[i] for i in kept]
+    model.set_params(n_estimators=len(kept))
+    return len(data_ends) - len(kept)
+
+def evaluate_model(model, X_test, y_test):
+    """Imprime el classification_report y devuelve las métricas que se guardan en el registro"""
+    y_pred = model.predict(X_test)
+    print(classification_report(y_test, y_pred, target_names=['Short', 'Esperar', 'Long']))
+    report = classification_report(y_test, y_pred, target_names=['Short', 'Esperar', 'Long'], output_dict=True)
+    return {
+        'accuracy': report['accuracy'],
+        'f1_macro': report['macro avg']['f1-score'],
+        'precision_long': report['Long']['precision'],
+        'precision_short': report['Short']['precision'],
+    }
+
+def train_ml_model(symbol="BTC/USDT:USDT", days=30, params=None):
+    params = params or load_best_model_params()
+    print(f"🔧 Hiperparámetros: {params}")
     print("📥 Descargando datos históricos...")
-    df = fetch_ohlcv(symbol, "1h", limit=24*days)
+    df = load_history(symbol, "1h", days=days)
     
     if df.empty:
         print("❌ Error al cargar datos.")
@@ -71,56 +245,21 @@ def train_ml_model(symbol="BTC/USDT:USDT", days=30):
     print(f"  - Columnas disponibles: {list(df.columns)}")
     print(f"  - Tamaño: {df.shape}")
     
-    # ✅ FORZAR AÑADIR INDICADORES DESDE EL PRINCIPIO
-    df = add_indicators(df)
+    # ✅ CALCULAR FEATURES UNA SOLA VEZ (create_features_and_labels las reutiliza)
+    # El feature store solo calcula las velas nuevas desde el último entrenamiento
+    df = add_features(symbol, "1h", df, FEATURE_COLUMNS)
     print(f"📊 Columnas después de añadir indicadores: {list(df.columns)}")
     
-    print("⚙️  Creando features y etiquetas...")
-    X, y, feature_cols = create_features_and_labels(df, lookahead=10, threshold=0.015)
-    
-    # ✅ PASO CLAVE: Cargar trades reales como datos adicionales
+    print("⚙️  Creando features, etiquetas y pesos...")
+    # ✅ PASO CLAVE: trades reales como datos adicionales, ponderados por su PnL
     df_real = load_real_trades_as_labels(symbol=symbol, min_pnl_abs=1.0)
+    X, y, sample_weights, feature_cols, n_real = build_training_set(
+        df, df_real, lookahead=params['lookahead'], threshold=params['threshold']
+    )
     
-    X_real = pd.DataFrame()
-    y_real = pd.Series(dtype='int')
-    
-    if not df_real.empty:
-        print(f"➕ Añadiendo {len(df_real)} trades reales al entrenamiento...")
-        
-        # ✅ CREAR MAPPING PARA BÚSQUEDAS RÁPIDAS
-        timestamp_to_index = {ts: idx for idx, ts in enumerate(df.index)}
-        
-        X_real_list = []
-        y_real_list = []
-        
-        for _, trade in df_real.iterrows():
-            try:
-                trade_ts = trade['timestamp']
-                if trade_ts in timestamp_to_index:
-                    idx = timestamp_to_index[trade_ts]
-                else:
-                    # Buscar índice más cercano
-                    closest_idx = df.index.get_indexer([trade_ts], method='nearest')
-                    idx = closest_idx[0]
-                
-                if 0 <= idx < len(df):
-                    features = df.iloc[idx][feature_cols]
-                    X_real_list.append(features)
-                    y_real_list.append(trade['label'])
-                else:
-                    logging.warning(f"⚠️ Índice inválido {idx} para timestamp {trade_ts}")
-            except Exception as e:
-                logging.warning(f"⚠️ Error procesando trade {trade.get('timestamp', 'N/A')}: {str(e)}")
-        
-        if X_real_list:
-            X_real = pd.DataFrame(X_real_list, columns=feature_cols)
-            y_real = pd.Series(y_real_list)
-    
-    # Combinar datos históricos + reales
-    if not X_real.empty:
-        X = pd.concat([X, X_real], ignore_index=True)
-        y = pd.concat([y, y_real], ignore_index=True)
-        print(f"📊 Datos combinados: {len(X)} muestras ({len(X)-len(X_real)} históricas + {len(X_real)} reales)")
+    if n_real:
+        print(f"📊 Datos combinados: {len(X)} muestras ({len(X) - n_real} históricas + {n_real} reales)")
+        print(f"  📊 Rango final de pesos: {sample_weights.min():.2f} - {sample_weights.max():.2f}")
     else:
         print(f"📊 Solo datos históricos: {len(X)} muestras")
     
@@ -128,99 +267,129 @@ def train_ml_model(symbol="BTC/USDT:USDT", days=30):
         print("❌ Pocos datos para entrenar.")
         return
     
-    # Dividir en train/test
-    X_train, X_test, y_train, y_test = train_test_split(
-        X, y, test_size=0.2, random_state=42, stratify=y
+    # Dividir en train/test (los pesos viajan con sus filas)
+    X_train, X_test, y_train, y_test, w_train, w_test = train_test_split(
+        X, y, sample_weights, test_size=0.2, random_state=42, stratify=y
     )
     
     # 💡 ✅ BALANCEO DE CLASES
-    classes = np.array(sorted(set(y_train)))  # ✅ CONVERTIR A NUMPY ARRAY
-    class_weights = compute_class_weight('balanced', classes=classes, y=y_train)
-    class_weight_dict = dict(zip(classes.tolist(), class_weights.tolist()))  # ✅ Convertir de vuelta a lista para el dict
+    class_weight_dict = balanced_class_weights(y_train)
     print(f"⚖️ Pesos de clases calculados: {class_weight_dict}")
     
-    # 💡 ✅ PONDERACIÓN POR IMPACTO (ROBUSTA)
-    sample_weights = np.ones(len(X_train))
-
-    if not X_real.empty:
-        print("📊 Preparando ponderación por impacto de trades...")
-        
-        # Identificar índices de trades reales en entrenamiento
-        real_count = min(len(X_real), len(X_train))
-        real_indices = np.arange(len(X_train) - real_count, len(X_train))
-        
-        if len(real_indices) > 0:
-            print(f"  🔍 Procesando {len(real_indices)} trades reales para ponderación...")
-            
-            for i, idx in enumerate(real_indices):
-                if idx >= len(sample_weights) or i >= len(df_real):
-                    continue
-                
-                try:
-                    # ✅ EXTRAER PnL CON MANEJO DE ERRORES
-                    trade = df_real.iloc[i]
-                    pnl_value = None
-                    
-                    # Intentar diferentes nombres para el PnL
-                    for pnl_key in ['pnl', 'PnL', 'profit', 'gain']:
-                        if pnl_key in trade and pd.notna(trade[pnl_key]):
-                            pnl_value = trade[pnl_key]
-                            break
-                    
-                    # Valor por defecto si no se encuentra
-                    if pnl_value is None:
-                        logging.debug(f"ℹ️ Trade {i} sin PnL. Usando valor por defecto.")
-                        pnl_value = 1.0  # Valor por defecto razonable
-                    
-                    # Asegurar que es numérico
-                    if not isinstance(pnl_value, (int, float)):
-                        pnl_value = float(str(pnl_value).replace(',', '.'))
-                    
-                    # Calcular peso
-                    weight = max(0.1, abs(pnl_value))
-                    sample_weights[idx] = weight
-                    
-                    # Logging para diagnóstico
-                    if i < 5:  # Solo los primeros 5 para no saturar logs
-                        logging.debug(f"  📈 Trade {i} | PnL: {pnl_value:.2f} | Peso: {weight:.2f}")
-                        
-                except Exception as e:
-                    logging.warning(f"⚠️ Error en trade {i}: {str(e)}. Usando peso 0.5")
-                    sample_weights[idx] = 0.5
-            
-            # Normalizar pesos
-            min_weight = sample_weights.min()
-            max_weight = sample_weights.max()
-            if max_weight > min_weight:
-                original_range = max_weight - min_weight
-                sample_weights = 0.1 + 0.9 * (sample_weights - min_weight) / original_range
-                print(f"  ✅ Pesos normalizados: {min_weight:.2f} - {max_weight:.2f} → 0.10 - 1.00")
-            else:
-                print(f"  ℹ️ Todos los pesos son iguales ({min_weight:.2f}). Sin normalización necesaria.")
-            
-            print(f"  📊 Rango final de pesos: {sample_weights.min():.2f} - {sample_weights.max():.2f}")
-    
     # Entrenar modelo
     print("🧠 Entrenando Random Forest con clases balanceadas y ponderación de impacto...")
-    model = RandomForestClassifier(
-        n_estimators=100,
-        max_depth=10,
-        random_state=42,
-        class_weight=class_weight_dict,
-        n_jobs=-1
-    )
-    model.fit(X_train, y_train, sample_weight=sample_weights)
+    model = build_model(class_weight_dict, **{name: params[name] for name in FOREST_PARAMS})
+    model.fit(X_train, y_train, sample_weight=w_train)
+    
+    model.tree_data_end_ = [df.index[-1]] * len(model.estimators_)
     
     # Evaluar
-    y_pred = model.predict(X_test)
     print("\n✅ Resultados del modelo (CON BALANCEO Y PONDERACIÓN):")
-    print(classification_report(y_test, y_pred, target_names=['Short', 'Esperar', 'Long']))
+    metrics = evaluate_model(model, X_test, y_test)
     
-    # Guardar modelo
-    joblib.dump(model, 'ml_model.pkl')
-    joblib.dump(feature_cols, 'feature_cols.pkl')
+    # Guardar modelo: nueva versión en el registro y publicada como activa
+    # (copia atómica a ml_model.pkl: un agente en marcha la recarga en caliente)
+    get_model_registry().register(
+        model, feature_cols,
+        metadata={
+            'symbol': symbol,
+            'timeframe': "1h",
+            'train_start': df.index[0],
+            'train_end': df.index[-1],
+            'n_samples': len(X),
+            'n_real_trades': n_real,
+            'lookahead': params['lookahead'],
+            'threshold': params['threshold'],
+            'confidence_threshold': params['confidence'],
+        },
+        metrics=metrics,
+        activate=True,
+    )
     print("\n💾 Modelo guardado como 'ml_model.pkl'")
 
+def update_ml_model(symbol="BTC/USDT:USDT", days=INCREMENTAL_WINDOW_DAYS, n_new=INCREMENTAL_NEW_TREES,
+                    max_trees=INCREMENTAL_MAX_TREES, max_age_days=INCREMENTAL_MAX_AGE_DAYS):
+    """
+    Actualización incremental del modelo activo: en lugar de reentrenar 100
+    árboles sobre todo el histórico, añade `n_new` árboles entrenados con los
+    últimos `days` días y retira los más antiguos (retire_trees). El resultado
+    se registra como una versión nueva hija de la activa.
+    """
+    registry = get_model_registry()
+    parent = registry.active_version()
+    if parent is None:
+        print("❌ No hay modelo activo en el registro. Ejecuta primero un entrenamiento completo.")
+        return
+    parent_meta = registry.metadata(parent)
+    lookahead = parent_meta.get('lookahead', 10)
+    threshold = parent_meta.get('threshold', 0.015)
+    model_path, _ = registry.paths(parent)
+    model = joblib.load(model_path)
+    if parent_meta['feature_cols'] != list(FEATURE_COLUMNS):
+        print("❌ Las features del modelo activo no coinciden con FEATURE_COLUMNS. Reentrena completo.")
+        return
+    if not hasattr(model, 'tree_data_end_'):
+        # Modelos anteriores a la actualización incremental: todos sus árboles vieron hasta train_end
+        model.tree_data_end_ = [pd.Timestamp(parent_meta.get('train_end'))] * len(model.estimators_)
+
+    cpu_start = time.process_time()
+    print(f"📥 Cargando los últimos {days} días...")
+    df = load_history(symbol, "1h", days=days)
+    if df.empty:
+        print("❌ Error al cargar datos.")
+        return
+    # Las medias llegan calentadas con todo el histórico del feature store
+    df = add_features(symbol, "1h", df, FEATURE_COLUMNS)
+    df_real = load_real_trades_as_labels(symbol=symbol, min_pnl_abs=1.0)
+    if not df_real.empty:
+        df_real = df_real[df_real['timestamp'] >= df.index[0]]
+    X, y, sample_weights, feature_cols, n_real = build_training_set(df, df_real, lookahead=lookahead, threshold=threshold)
+    if len(X) < 100:
+        print("❌ Pocos datos para actualizar el modelo.")
+        return
+
+    X_train, X_test, y_train, y_test, w_train, w_test = train_test_split(
+        X, y, sample_weights, test_size=0.2, random_state=42, stratify=y
+    )
+    print(f"🌱 Añadiendo {n_new} árboles entrenados con {len(X_train)} muestras recientes...")
+    try:
+        grow_forest(model, X_train, y_train, sample_weight=w_train, n_new=n_new, data_end=df.index[-1])
+    except ValueError as e:
+        print(f"❌ {e}. Reentrena completo.")
+        return
+    max_age = pd.Timedelta(days=max_age_days) if max_age_days is not None else None
+    retired = retire_trees(model, max_trees=max_trees, max_age=max_age)
+    cpu_seconds = time.process_time() - cpu_start
+    print(f"🍂 {retired} árboles retirados | bosque: {len(model.estimators_)} árboles | CPU: {cpu_seconds:.1f} s")
+
+    print("\n✅ Resultados del modelo actualizado:")
+    metrics = evaluate_model(model, X_test, y_test)
+    registry.register(
+        model, feature_cols,
+        metadata={
+            'symbol': symbol,
+            'timeframe': "1h",
+            'mode': 'incremental',
+            'parent': parent,
+            'train_start': df.index[0],
+            'train_end': df.index[-1],
+            'n_samples': len(X),
+            'n_real_trades': n_real,
+            'lookahead': lookahead,
+            'threshold': threshold,
+            'confidence_threshold': parent_meta.get('confidence_threshold', ML_CONFIDENCE_THRESHOLD),
+            'n_trees': len(model.estimators_),
+            'retired_trees': retired,
+            'oldest_tree_data_end': min((end for end in model.tree_data_end_ if end is not None), default=None),
+            'cpu_seconds': cpu_seconds,
+        },
+        metrics=metrics,
+        activate=True,
+    )
+
 if __name__ == "__main__":
     symbol_to_use = "BTC/USDT" if TRADING_MODE == "spot" else "BTC/USDT:USDT"
-    train_ml_model(symbol=symbol_to_use, days=1000)
\ No newline at end of file
+    if "--incremental" in sys.argv[1:]:
+        update_ml_model(symbol=symbol_to_use)
+    else:
+        train_ml_model(symbol=symbol_to_use, days=1000)
\ No newline at end of file
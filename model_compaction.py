@@ -0,0 +1,258 @@
+# model_compaction.py
+"""
+Compactación del modelo ML: un RandomForest más pequeño que sigue siendo un
+RandomForestClassifier normal (se registra, activa, evalúa como sombra y
+aplana igual que cualquier otro).
+
+- Árboles: selección voraz de los `n_trees` árboles cuyo promedio da menor
+  log-loss en validación (conserva la calibración que usa la confianza
+  mínima de MLAgent).
+- Features: las de importancia < `min_importance` salen de feature_cols; los
+  nodos que las usaban pasan a ser hojas con la distribución de ese nodo.
+- Nodos: también pasan a hoja los nodos con menos de `min_node_fraction` del
+  peso de muestras del árbol y los que superan `max_depth`.
+- Umbrales: el bosque aplanado los guarda en float32 (sin pérdida, ver
+  forest_inference.float32_thresholds).
+
+El informe compara cada punto de operación con el original: latencia de una
+fila (FlatForest), memoria (pickle y arrays aplanados) y métricas en
+validación (accuracy, F1 macro, % de predicciones iguales al original).
+
+Ejecuta: python model_compaction.py [versión] [--write]
+  --write registra el punto de operación de config (COMPACT_*) como una
+  versión nueva sin activarla (actívala o pruébala como sombra con model_registry.py)
+"""
+import copy
+import pickle
+import sys
+import time
+import joblib
+import numpy as np
+import pandas as pd
+from sklearn.metrics import accuracy_score, f1_score
+from sklearn.tree._tree import Tree
+from config import (SYMBOL, TRADING_MODE, COMPACT_VALIDATION_DAYS, COMPACT_TREES,
+                    COMPACT_MIN_NODE_FRACTION, COMPACT_MIN_IMPORTANCE, COMPACT_MAX_DEPTH)
+from backfill import load_history
+from feature_store import add_features
+from forest_inference import FlatForest
+from model_registry import get_model_registry
+from ml_trainer import FEATURE_COLUMNS, create_features_and_labels
+
+TREE_LEAF = -1
+TREE_UNDEFINED = -2
+
+# Puntos de operación del informe: (árboles, fracción mínima de nodo, importancia mínima)
+COMPACT_GRID = [(n_trees, fraction, importance)
+                for n_trees in (None, 60, 40, 20)
+                for fraction in (0.0, 0.002, 0.01)
+                for importance in (0.0, 0.04)
+                if (n_trees, fraction, importance) != (None, 0.0, 0.0)]
+
+# --- Poda de un árbol -----------------------------------------------------
+
+def rebuild_tree(estimator, collapse, feature_map=None, n_features=None):
+    """
+    Copia del DecisionTreeClassifier donde los nodos de `collapse` pasan a ser
+    hojas (con la distribución de clases del nodo, que sklearn ya guarda en
+    tree_.value) y sus descendientes desaparecen. `feature_map` renumera las
+    features si se quitan columnas. Los nodos se reescriben en preorden, como
+    los construye sklearn.
+    """
+    tree = estimator.tree_
+    state = tree.__getstate__()
+    nodes, values = state['nodes'], state['values']
+    n_features = n_features if n_features is not None else tree.n_features
+
+    order, depth = [], []
+    stack = [(0, 0)]
+    while stack:
+        node, d = stack.pop()
+        order.append(node)
+        depth.append(d)
+        if nodes['left_child'][node] != TREE_LEAF and not collapse[node]:
+            stack.append((nodes['right_child'][node], d + 1))
+            stack.append((nodes['left_child'][node], d + 1))
+    order = np.asarray(order, dtype=np.intp)
+    new_id = np.full(len(nodes), TREE_LEAF, dtype=np.intp)
+    new_id[order] = np.arange(len(order))
+
+    new_nodes = nodes[order].copy()
+    leaf = (nodes['left_child'][order] == TREE_LEAF) | collapse[order]
+    new_nodes['left_child'] = np.where(leaf, TREE_LEAF, new_id[nodes['left_child'][order]])
+    new_nodes['right_child'] = np.where(leaf, TREE_LEAF, new_id[nodes['right_child'][order]])
+    features = new_nodes['feature'] if feature_map is None else feature_map[np.maximum(new_nodes['feature'], 0)]
+    new_nodes['feature'] = np.where(leaf, TREE_UNDEFINED, features)
+    new_nodes['threshold'] = np.where(leaf, float(TREE_UNDEFINED), new_nodes['threshold'])
+    new_nodes['missing_go_to_left'] = np.where(leaf, 0, new_nodes['missing_go_to_left'])
+
+    new_tree = Tree(n_features, np.asarray(tree.n_classes, dtype=np.intp), tree.n_outputs)
+    new_tree.__setstate__({
+        'max_depth': int(max(depth)),
+        'node_count': len(order),
+        'nodes': new_nodes,
+        'values': np.ascontiguousarray(values[order]),
+    })
+    new_estimator = copy.copy(estimator)
+    new_estimator.tree_ = new_tree
+    new_estimator.n_features_in_ = n_features
+    return new_estimator
+
+def _node_depths(tree):
+    depth = np.zeros(tree.node_count, dtype=np.intp)
+    for node in range(tree.node_count):  # preorden: los padres van antes que los hijos
+        if tree.children_left[node] != TREE_LEAF:
+            depth[tree.children_left[node]] = depth[node] + 1
+            depth[tree.children_right[node]] = depth[node] + 1
+    return depth
+
+# --- Compactación del bosque ----------------------------------------------
+
+def tree_order(model, X_val, y_val):
+    """
+    Orden voraz de los árboles: en cada paso, el que más baja la log-loss del
+    promedio en validación. Compactar a K árboles = quedarse con los K primeros.
+    """
+    X_val = np.asarray(X_val, dtype=np.float32)
+    probas = np.stack([tree.predict_proba(X_val) for tree in model.estimators_])  # (árboles, filas, clases)
+    target = np.searchsorted(model.classes_, np.asarray(y_val))
+    rows = np.arange(len(target))
+    chosen, total = [], np.zeros_like(probas[0])
+    remaining = list(range(len(probas)))
+    while remaining:
+        candidates = (total + probas[remaining]) / (len(chosen) + 1)
+        loss = -np.log(np.clip(candidates[:, rows, target], 1e-15, None)).mean(axis=1)
+        best = remaining.pop(int(np.argmin(loss)))
+        chosen.append(best)
+        total += probas[best]
+    return chosen
+
+def compact_model(model, feature_cols, order=None, n_trees=None, min_node_fraction=0.0,
+                  min_importance=0.0, max_depth=None):
+    """
+    Devuelve (modelo compacto, feature_cols compactas). `order` es el orden de
+    los árboles (tree_order); sin él se conservan los primeros `n_trees`.
+    """
+    order = list(range(len(model.estimators_))) if order is None else order
+    keep_trees = order[:n_trees] if n_trees else order
+    importances = model.feature_importances_
+    kept_features = [i for i, importance in enumerate(importances) if importance >= min_importance]
+    feature_map = np.full(len(feature_cols), TREE_UNDEFINED, dtype=np.intp)
+    feature_map[kept_features] = np.arange(len(kept_features))
+    dropped = np.ones(len(feature_cols), dtype=bool)
+    dropped[kept_features] = False
+
+    estimators = []
+    for index in sorted(keep_trees):
+        tree = model.estimators_[index].tree_
+        internal = tree.children_left != TREE_LEAF
+        collapse = internal & dropped[np.maximum(tree.feature, 0)]
+        collapse |= internal & (tree.weighted_n_node_samples < min_node_fraction * tree.weighted_n_node_samples[0])
+        if max_depth is not None:
+            collapse |= internal & (_node_depths(tree) >= max_depth)
+        estimators.append(rebuild_tree(model.estimators_[index], collapse, feature_map, len(kept_features)))
+
+    compact = copy.copy(model)
+    compact.estimators_ = estimators
+    compact.n_estimators = len(estimators)
+    compact.n_features_in_ = len(kept_features)
+    compact_cols = [feature_cols[i] for i in kept_features]
+    if hasattr(model, 'feature_names_in_'):
+        compact.feature_names_in_ = np.asarray(compact_cols, dtype=object)
+    if hasattr(model, 'tree_data_end_'):
+        compact.tree_data_end_ = [model.tree_data_end_[i] for i in sorted(keep_trees)]
+    return compact, compact_cols
+
+# --- Informe ---------------------------------------------------------------
+
+def _latency_us(forest, row, repeat=300):
+    samples = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        forest.predict_with_proba(row)
+        samples.append(time.perf_counter() - start)
+    return np.median(samples) * 1e6
+
+def footprint(model, forest):
+    """Bytes del pickle y de los arrays del bosque aplanado (lo que MLAgent tiene en memoria)"""
+    return len(pickle.dumps(model)), sum(np.asarray(values).nbytes for values in forest.to_arrays().values())
+
+def evaluate_point(model, feature_cols, X_val, y_val, reference_pred):
+    forest = FlatForest.from_model(model)
+    X = X_val[feature_cols].to_numpy()
+    pred, _ = forest.predict_with_proba(X)
+    pickle_bytes, flat_bytes = footprint(model, forest)
+    return {
+        'trees': len(model.estimators_),
+        'nodes': len(forest.feature),
+        'features': len(feature_cols),
+        'pickle_kb': pickle_bytes / 1024,
+        'flat_kb': flat_bytes / 1024,
+        'latency_us': _latency_us(forest, X[-1:]),
+        'accuracy': accuracy_score(y_val, pred),
+        'f1_macro': f1_score(y_val, pred, labels=[-1, 0, 1], average='macro', zero_division=0),
+        'same_as_original': np.mean(pred == reference_pred),
+    }
+
+def compaction_report(model, feature_cols, X_val, y_val, grid=COMPACT_GRID):
+    """Una fila por punto de operación; la primera es el modelo original"""
+    order = tree_order(model, X_val[feature_cols], y_val)
+    reference_pred = FlatForest.from_model(model).predict(X_val[feature_cols].to_numpy())
+    rows = [dict(n_trees=len(model.estimators_), min_node_fraction=0.0, min_importance=0.0,
+                 **evaluate_point(model, feature_cols, X_val, y_val, reference_pred))]
+    for n_trees, fraction, importance in grid:
+        compact, cols = compact_model(model, feature_cols, order, n_trees, fraction, importance)
+        rows.append(dict(n_trees=n_trees or len(model.estimators_), min_node_fraction=fraction, min_importance=importance,
+                         **evaluate_point(compact, cols, X_val, y_val, reference_pred)))
+    return pd.DataFrame(rows), order
+
+def _validation_set(symbol, meta):
+    """Velas posteriores al entrenamiento si las hay; si no, los últimos días (vistas al entrenar)"""
+    df = load_history(symbol, meta.get('timeframe', "1h"), days=COMPACT_VALIDATION_DAYS)
+    if df.empty:
+        return None, None
+    df = add_features(symbol, meta.get('timeframe', "1h"), df, FEATURE_COLUMNS)
+    X, y, _ = create_features_and_labels(df, lookahead=meta.get('lookahead', 10), threshold=meta.get('threshold', 0.015))
+    unseen = X.index > pd.Timestamp(meta['train_end']) if meta.get('train_end') else np.zeros(len(X), dtype=bool)
+    if unseen.sum() >= 200:
+        return X[unseen], y[unseen]
+    print("⚠️  Pocas velas posteriores al entrenamiento: la validación incluye velas que el modelo vio.")
+    return X, y
+
+def main(args):
+    registry = get_model_registry()
+    versions = [arg for arg in args if not arg.startswith("--")]
+    version = versions[0] if versions else registry.active_version()
+    if version is None:
+        print("❌ No hay modelo activo en el registro.")
+        return
+    meta = registry.metadata(version)
+    model_path, cols_path = registry.paths(version)
+    model, feature_cols = joblib.load(model_path), list(joblib.load(cols_path))
+    symbol_to_use = meta.get('symbol') or ("BTC/USDT:USDT" if TRADING_MODE == "futures" else SYMBOL)
+
+    X_val, y_val = _validation_set(symbol_to_use, meta)
+    if X_val is None:
+        print("❌ Error al cargar datos.")
+        return
+    print(f"🗜️  Compactando {version} | validación: {len(X_val)} velas ({X_val.index[0]} → {X_val.index[-1]})")
+    report, order = compaction_report(model, feature_cols, X_val, y_val)
+    with pd.option_context('display.width', 200, 'display.max_columns', None, 'display.float_format', '{:.3f}'.format):
+        print(report.to_string(index=False))
+
+    if "--write" in args:
+        compact, compact_cols = compact_model(model, feature_cols, order, COMPACT_TREES, COMPACT_MIN_NODE_FRACTION,
+                                              COMPACT_MIN_IMPORTANCE, COMPACT_MAX_DEPTH)
+        reference_pred = FlatForest.from_model(model).predict(X_val[feature_cols].to_numpy())
+        metrics = evaluate_point(compact, compact_cols, X_val, y_val, reference_pred)
+        registry.register(compact, compact_cols, metadata=dict(
+            {key: value for key, value in meta.items() if key not in ('version', 'created_at', 'feature_cols', 'params', 'metrics')},
+            mode='compact', parent=version,
+            compaction={'n_trees': COMPACT_TREES, 'min_node_fraction': COMPACT_MIN_NODE_FRACTION,
+                        'min_importance': COMPACT_MIN_IMPORTANCE, 'max_depth': COMPACT_MAX_DEPTH},
+        ), metrics=metrics)
+        print(f"   Features eliminadas: {sorted(set(feature_cols) - set(compact_cols)) or 'ninguna'}")
+        print("   Pruébala como sombra: python model_registry.py shadow <versión>")
+
+if __name__ == "__main__":
+    main(sys.argv[1:])
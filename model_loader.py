@@ -0,0 +1,184 @@
+# model_loader.py
+"""
+Carga perezosa del modelo ML con recarga en caliente.
+
+- Nada se carga al importar: el primer get() lee feature_cols.pkl y el
+  bosque aplanado (FlatForest). El bosque se exporta una vez por versión del
+  modelo a MODEL_CACHE_DIR como ficheros .npy que se abren memory-mapped:
+  arrancar el agente no deserializa ml_model.pkl salvo la primera vez.
+- El modelo sklearn completo solo se carga si alguien lo pide (bundle.model,
+  p. ej. el backtester), también con mmap_mode.
+- Si ml_model.pkl o feature_cols.pkl cambian, la nueva versión se carga en un
+  hilo aparte mientras la anterior sigue sirviendo señales, y se publica de
+  una sola vez cuando está validada. Un modelo cuya lista de features no
+  coincide con feature_cols.pkl nunca se publica.
+"""
+import json
+import logging
+import os
+import shutil
+import threading
+import time
+import joblib
+import numpy as np
+from pathlib import Path
+from config import MODEL_PATH, FEATURE_COLS_PATH, MODEL_CACHE_DIR, MODEL_RELOAD_CHECK_SECONDS
+from forest_inference import FlatForest
+
+def file_signature(*paths):
+    """(tamaño, mtime_ns) de cada fichero: cambia en cuanto se reescribe alguno"""
+    return tuple((os.stat(path).st_size, os.stat(path).st_mtime_ns) for path in paths)
+
+def model_files_exist(model_path=MODEL_PATH, cols_path=FEATURE_COLS_PATH):
+    return Path(model_path).exists() and Path(cols_path).exists()
+
+def save_model(model, feature_cols, model_path=MODEL_PATH, cols_path=FEATURE_COLS_PATH):
+    """
+    Guarda modelo y features de forma atómica (tmp + os.replace) para que un
+    agente en marcha nunca lea un fichero a medio escribir.
+    """
+    for obj, path in ((feature_cols, cols_path), (model, model_path)):
+        tmp = f"{path}.tmp"
+        joblib.dump(obj, tmp)
+        os.replace(tmp, path)
+
+def _model_feature_names(model):
+    names = getattr(model, 'feature_names_in_', None)
+    return [str(name) for name in names] if names is not None else None
+
+class ModelBundle:
+    """Una versión del modelo: bosque aplanado y lista de features, siempre consistentes"""
+    def __init__(self, forest, feature_cols, signature, model_path, model=None, version=None):
+        self.forest = forest
+        self.feature_cols = feature_cols
+        self.version = version  # versión del registro (model_registry.py) o None
+        self.signature = signature
+        self.model_path = model_path
+        self._model = model
+        self._lock = threading.Lock()
+
+    @property
+    def model(self):
+        """RandomForestClassifier de sklearn (se carga al primer acceso)"""
+        with self._lock:
+            if self._model is None:
+                model = joblib.load(self.model_path, mmap_mode='r')
+                if file_signature(self.model_path) != self.signature[:1]:
+                    raise RuntimeError("ml_model.pkl cambió desde que se cargó esta versión; espera a la recarga")
+                self._model = model
+            return self._model
+
+class ModelLoader:
+    def __init__(self, model_path=MODEL_PATH, cols_path=FEATURE_COLS_PATH, cache_dir=MODEL_CACHE_DIR,
+                 check_interval=MODEL_RELOAD_CHECK_SECONDS):
+        self.model_path = model_path
+        self.cols_path = cols_path
+        self.cache_dir = Path(cache_dir)
+        self.check_interval = check_interval
+        self._bundle = None
+        self._lock = threading.Lock()
+        self._reloading = False
+        self._failed_signature = None
+        self._last_check = 0.0
+
+    def get(self):
+        """
+        Versión vigente del modelo. La primera llamada carga de forma síncrona
+        (FileNotFoundError si no hay modelo); las siguientes nunca bloquean:
+        como mucho lanzan la recarga en segundo plano.
+        """
+        bundle = self._bundle
+        if bundle is None:
+            with self._lock:
+                if self._bundle is None:
+                    self._bundle = self._load()
+                    self._last_check = time.monotonic()
+            return self._bundle
+        self._check_for_update()
+        return self._bundle
+
+    def _check_for_update(self):
+        now = time.monotonic()
+        if self._reloading or now - self._last_check < self.check_interval:
+            return
+        self._last_check = now
+        try:
+            signature = file_signature(self.model_path, self.cols_path)
+        except FileNotFoundError:
+            return  # Reentrenando: se sigue con la versión cargada
+        if signature == self._bundle.signature or signature == self._failed_signature:
+            return
+        self._reloading = True
+        threading.Thread(target=self._reload, name="model-reload", daemon=True).start()
+
+    def _reload(self):
+        try:
+            bundle = self._load()
+            self._bundle = bundle  # asignación atómica: los lectores ven la versión vieja o la nueva
+            self._failed_signature = None
+            logging.info(f"🔄 Nuevo modelo ML cargado ({len(bundle.feature_cols)} features)")
+        except Exception as e:
+            try:
+                self._failed_signature = file_signature(self.model_path, self.cols_path)
+            except FileNotFoundError:
+                self._failed_signature = None
+            logging.warning(f"⚠️ No se pudo recargar el modelo ML, se mantiene el anterior: {e}")
+        finally:
+            self._reloading = False
+
+    def _load(self):
+        signature = file_signature(self.model_path, self.cols_path)
+        feature_cols = list(joblib.load(self.cols_path))
+        forest, meta, model = self._load_forest(signature[0])
+
+        # ✅ Nunca publicar un modelo con una lista de features que no le corresponde
+        if meta['n_features'] != len(feature_cols):
+            raise ValueError(f"El modelo espera {meta['n_features']} features y feature_cols.pkl tiene {len(feature_cols)}")
+        if meta['feature_names'] is not None and meta['feature_names'] != feature_cols:
+            raise ValueError("El orden/nombres de feature_cols.pkl no coincide con el del modelo")
+        if file_signature(self.model_path, self.cols_path) != signature:
+            raise RuntimeError("Los ficheros del modelo cambiaron durante la carga")
+        return ModelBundle(forest, feature_cols, signature, self.model_path, model, meta.get('version'))
+
+    def _load_forest(self, model_signature):
+        """Bosque aplanado desde la caché .npy (memory-mapped) o exportándolo del pickle"""
+        size, mtime_ns = model_signature
+        cache = self.cache_dir / f"{Path(self.model_path).stem}_{size}_{mtime_ns}"
+        meta_path = cache / "meta.json"
+        if meta_path.exists():
+            meta = json.loads(meta_path.read_text())
+            arrays = {name: np.load(cache / f"{name}.npy", mmap_mode='r') for name in meta['arrays']}
+            return FlatForest.from_arrays(arrays), meta, None
+
+        model = joblib.load(self.model_path, mmap_mode='r')
+        forest = FlatForest.from_model(model)
+        meta = {'n_features': int(model.n_features_in_), 'feature_names': _model_feature_names(model),
+                'version': getattr(model, 'model_version_', None)}
+        self._write_cache(cache, forest, meta)
+        return forest, meta, model
+
+    def _write_cache(self, cache, forest, meta):
+        try:
+            tmp = cache.with_name(cache.name + ".tmp")
+            shutil.rmtree(tmp, ignore_errors=True)
+            tmp.mkdir(parents=True)
+            arrays = forest.to_arrays()
+            for name, values in arrays.items():
+                np.save(tmp / f"{name}.npy", values)
+            (tmp / "meta.json").write_text(json.dumps(dict(meta, arrays=list(arrays))))
+            shutil.rmtree(cache, ignore_errors=True)
+            os.replace(tmp, cache)
+            # Versiones anteriores del mismo modelo ya no se usan
+            for old in self.cache_dir.glob(f"{Path(self.model_path).stem}_*"):
+                if old != cache:
+                    shutil.rmtree(old, ignore_errors=True)
+        except OSError as e:
+            logging.warning(f"⚠️ No se pudo guardar la caché del modelo: {e}")
+
+_loader = None
+
+def get_model_loader():
+    global _loader
+    if _loader is None:
+        _loader = ModelLoader()
+    return _loader
@@ -0,0 +1,167 @@
+# model_registry.py
+"""
+Registro local de modelos versionados.
+
+model_registry/
+    index.json                 -> versión activa y modelos sombra
+    v0001_20250101T120000/
+        model.pkl              -> RandomForest (lleva su versión en model_version_)
+        feature_cols.pkl
+        meta.json              -> ventana de entrenamiento, features, métricas...
+
+Activar una versión la copia (de forma atómica) a ml_model.pkl /
+feature_cols.pkl: el agente en marcha la adopta con la recarga en caliente
+de model_loader.py. Los modelos sombra se evalúan en vivo junto al activo
+(ver MLAgent) y sus señales se registran para compararlas.
+
+Ejecuta: python model_registry.py [list | activate <versión> | shadow <versión>...]
+"""
+import json
+import os
+import shutil
+import sys
+import pandas as pd
+from pathlib import Path
+from config import MODEL_REGISTRY_DIR, MODEL_PATH, FEATURE_COLS_PATH
+from model_loader import ModelLoader, save_model, file_signature
+
+def _write_json(path, data):
+    tmp = Path(f"{path}.tmp")
+    tmp.write_text(json.dumps(data, indent=2, default=str), encoding="utf-8")
+    os.replace(tmp, path)
+
+def _copy_atomic(src, dst):
+    tmp = f"{dst}.tmp"
+    shutil.copyfile(src, tmp)
+    os.replace(tmp, dst)
+
+class ModelRegistry:
+    def __init__(self, root=MODEL_REGISTRY_DIR):
+        self.root = Path(root)
+        self._index = None
+        self._index_signature = None
+        self._loaders = {}
+
+    # --- Índice -----------------------------------------------------------
+
+    def _read_index(self):
+        path = self.root / "index.json"
+        try:
+            signature = file_signature(path)
+        except FileNotFoundError:
+            return {'active': None, 'shadows': []}
+        if signature != self._index_signature:
+            self._index = json.loads(path.read_text(encoding="utf-8"))
+            self._index_signature = signature
+        return self._index
+
+    def _update_index(self, **changes):
+        index = dict(self._read_index(), **changes)
+        self.root.mkdir(parents=True, exist_ok=True)
+        _write_json(self.root / "index.json", index)
+        return index
+
+    def active_version(self):
+        return self._read_index()['active']
+
+    def shadow_versions(self):
+        """Versiones sombra (el índice solo se relee si cambió en disco)"""
+        return list(self._read_index()['shadows'])
+
+    # --- Versiones --------------------------------------------------------
+
+    def versions(self):
+        return sorted(path.name for path in self.root.glob("v*") if (path / "meta.json").exists())
+
+    def metadata(self, version):
+        return json.loads((self.root / version / "meta.json").read_text(encoding="utf-8"))
+
+    def paths(self, version):
+        folder = self.root / version
+        return folder / "model.pkl", folder / "feature_cols.pkl"
+
+    def register(self, model, feature_cols, metadata=None, metrics=None, activate=False):
+        """
+        Guarda una nueva versión con sus metadatos y métricas. La versión se
+        anota también en el propio modelo (model_version_) para que cada señal
+        y cada trade sepan qué modelo los produjo.
+        """
+        self.root.mkdir(parents=True, exist_ok=True)
+        number = len(self.versions()) + 1
+        version = f"v{number:04d}_{pd.Timestamp.now(tz='UTC'):%Y%m%dT%H%M%S}"
+        model.model_version_ = version
+
+        tmp = self.root / f"{version}.tmp"
+        shutil.rmtree(tmp, ignore_errors=True)
+        tmp.mkdir()
+        save_model(model, list(feature_cols), tmp / "model.pkl", tmp / "feature_cols.pkl")
+        _write_json(tmp / "meta.json", {
+            'version': version,
+            'created_at': pd.Timestamp.now(tz='UTC'),
+            'feature_cols': list(feature_cols),
+            'params': {key: value for key, value in model.get_params().items() if key != 'class_weight'},
+            'metrics': metrics or {},
+            **(metadata or {}),
+        })
+        os.replace(tmp, self.root / version)
+        print(f"🗂️  Modelo registrado como {version}")
+
+        if activate:
+            self.activate(version)
+        return version
+
+    def activate(self, version):
+        """Publica la versión como modelo activo (el agente la recarga en caliente)"""
+        model_path, cols_path = self.paths(version)
+        if not model_path.exists():
+            raise FileNotFoundError(f"Versión desconocida: {version}")
+        # feature_cols primero: el loader valida la pareja y nunca publica una mezcla
+        _copy_atomic(cols_path, FEATURE_COLS_PATH)
+        _copy_atomic(model_path, MODEL_PATH)
+        shadows = [v for v in self.shadow_versions() if v != version]
+        self._update_index(active=version, shadows=shadows)
+        print(f"✅ Versión activa: {version}")
+
+    def set_shadows(self, versions):
+        for version in versions:
+            if not self.paths(version)[0].exists():
+                raise FileNotFoundError(f"Versión desconocida: {version}")
+        self._update_index(shadows=[v for v in versions if v != self.active_version()])
+
+    def loader(self, version):
+        """ModelLoader de una versión registrada (las versiones no cambian: sin recarga)"""
+        if version not in self._loaders:
+            model_path, cols_path = self.paths(version)
+            self._loaders[version] = ModelLoader(model_path, cols_path, self.root / version / "flat",
+                                                 check_interval=float('inf'))
+        return self._loaders[version]
+
+_registry = None
+
+def get_model_registry():
+    global _registry
+    if _registry is None:
+        _registry = ModelRegistry()
+    return _registry
+
+def main(args):
+    registry = get_model_registry()
+    if not args or args[0] == "list":
+        active = registry.active_version()
+        shadows = registry.shadow_versions()
+        for version in registry.versions():
+            meta = registry.metadata(version)
+            role = "ACTIVO" if version == active else "sombra" if version in shadows else ""
+            metrics = meta.get('metrics', {})
+            print(f"{version} {role:>6} | {meta.get('train_start', '?')} → {meta.get('train_end', '?')} "
+                  f"| muestras: {meta.get('n_samples', '?')} | accuracy: {metrics.get('accuracy', float('nan')):.3f}")
+    elif args[0] == "activate" and len(args) == 2:
+        registry.activate(args[1])
+    elif args[0] == "shadow":
+        registry.set_shadows(args[1:])
+        print(f"👥 Modelos sombra: {registry.shadow_versions() or 'ninguno'}")
+    else:
+        print(__doc__)
+
+if __name__ == "__main__":
+    main(sys.argv[1:])
@@ -0,0 +1,255 @@
+# model_search.py
+"""
+Búsqueda de hiperparámetros del modelo ML con validación temporal.
+
+Se buscan a la vez los parámetros del bosque (n_estimators, max_depth,
+min_samples_leaf), la definición de las etiquetas (lookahead, threshold) y
+la confianza mínima con la que MLAgent actúa. Cada candidato se entrena en
+MODEL_SEARCH_FOLDS folds temporales (train acumulado, test a continuación)
+con una purga entre ambos del mayor lookahead posible: ninguna etiqueta de
+train mira velas del test.
+
+- Las features se calculan UNA vez y se comparten con los workers por
+  memoria compartida; cada candidato solo recalcula sus etiquetas (baratas).
+- Los candidatos se puntúan por el resultado de sus señales en test, no por
+  el acierto sobre sus propias etiquetas (que cambian con lookahead/threshold):
+  PnL relativo de cada señal a su horizonte / sqrt(nº de señales), como la
+  estrategia en learner.py.
+- Cada evaluación se añade a MODEL_SEARCH_FILE según termina. Si la búsqueda
+  se interrumpe, al relanzarla se reutiliza el mismo tramo de velas y el
+  optimizador recibe los resultados ya guardados antes de pedir más.
+
+Los mejores parámetros se guardan en ML_PARAMS_FILE; ml_trainer.py los usa
+en el siguiente entrenamiento.
+Ejecuta: python model_search.py [n_evaluaciones] [--new]
+"""
+import json
+import os
+import pickle
+import sys
+import numpy as np
+import pandas as pd
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+from skopt import Optimizer
+from skopt.space import Integer, Real
+from sklearn.metrics import f1_score
+from config import (SYMBOL, TRADING_MODE, ML_PARAMS_FILE, MODEL_SEARCH_FILE, MODEL_SEARCH_DAYS,
+                    MODEL_SEARCH_FOLDS, MODEL_SEARCH_TEST_DAYS, MODEL_SEARCH_CALLS, MODEL_SEARCH_WORKERS)
+from backfill import load_history
+from feature_store import add_features, feature_set_hash
+from labeling import future_returns, forward_labels
+from ml_trainer import FEATURE_COLUMNS, FOREST_PARAMS, DEFAULT_MODEL_PARAMS, balanced_class_weights, build_model
+from shared_arrays import SharedArrays, attach_shared_arrays
+from walk_forward import walk_forward_windows, days_to_bars
+
+MODEL_SEARCH_SPACE = [
+    Integer(50, 300, name='n_estimators'),
+    Integer(4, 16, name='max_depth'),
+    Integer(1, 50, name='min_samples_leaf'),
+    Integer(4, 24, name='lookahead'),
+    Real(0.005, 0.03, name='threshold'),
+    Real(0.34, 0.7, name='confidence'),
+]
+
+MODEL_PARAM_NAMES = [dim.name for dim in MODEL_SEARCH_SPACE]
+MAX_LOOKAHEAD = MODEL_SEARCH_SPACE[MODEL_PARAM_NAMES.index('lookahead')].high
+
+def search_folds(n, n_folds=MODEL_SEARCH_FOLDS, test_size=None, gap=MAX_LOOKAHEAD):
+    """
+    Folds anclados (el train crece desde la primera vela, como el entrenamiento
+    de producción) con `n_folds` tests contiguos al final de la serie. Las
+    últimas `gap` velas no tienen etiqueta para todos los lookahead y se excluyen.
+    """
+    usable = n - gap
+    train_size = usable - gap - n_folds * test_size
+    if train_size <= 0:
+        return []
+    return walk_forward_windows(usable, train_size, test_size, gap=gap, anchored=True)
+
+# --- Evaluación en workers ------------------------------------------------
+
+_worker_arrays = None
+
+def _init_worker(spec, arrays=None):
+    global _worker_arrays
+    _worker_arrays = attach_shared_arrays(spec) if spec is not None else arrays
+
+def _evaluate_fold(task):
+    """Entrena un candidato en un fold y devuelve el resultado de sus señales en el test"""
+    params, (train_lo, train_hi), (test_lo, test_hi) = task
+    X, close = _worker_arrays['X'], _worker_arrays['close']
+    returns = future_returns(close, [params['lookahead']])
+    y = forward_labels(returns, [params['threshold']])[:, 0, 0]
+    returns = returns[:, 0]
+    y_train = y[train_lo:train_hi]
+    if len(np.unique(y_train)) < 2:
+        return {'pnl': 0.0, 'signals': 0, 'f1': 0.0}
+    model = build_model(balanced_class_weights(y_train), n_jobs=1, **{name: params[name] for name in FOREST_PARAMS})
+    model.fit(X[train_lo:train_hi], y_train)
+
+    # Misma regla que MLAgent._decide: por debajo de la confianza mínima no se opera
+    proba = model.predict_proba(X[test_lo:test_hi])
+    pred = model.classes_.take(np.argmax(proba, axis=1))
+    signal = np.where(proba.max(axis=1) >= params['confidence'], pred, 0)
+    y_test = y[test_lo:test_hi]
+    return {
+        'pnl': float(np.sum(signal * returns[test_lo:test_hi])),
+        'signals': int(np.count_nonzero(signal)),
+        'f1': float(f1_score(y_test, signal, labels=[-1, 1], average='macro', zero_division=0)),
+    }
+
+def _score(folds):
+    """Métrica a minimizar: -(PnL total / sqrt(señales)), como BacktestOptimizer._score"""
+    signals = sum(fold['signals'] for fold in folds)
+    if signals == 0:
+        return -1e-6  # penalizar no operar
+    return -sum(fold['pnl'] for fold in folds) / np.sqrt(signals)
+
+# --- Resultados persistentes ----------------------------------------------
+
+def _read_results(path):
+    """(cabecera, evaluaciones) de una búsqueda guardada o (None, [])"""
+    try:
+        lines = Path(path).read_text(encoding="utf-8").splitlines()
+    except FileNotFoundError:
+        return None, []
+    records = []
+    for line in lines:
+        try:
+            records.append(json.loads(line))
+        except ValueError:
+            break  # Última línea a medio escribir (búsqueda interrumpida)
+    if not records or 'dataset' not in records[0]:
+        return None, []
+    return records[0]['dataset'], records[1:]
+
+def _append(path, records):
+    with open(path, "a", encoding="utf-8") as f:
+        for record in records:
+            f.write(json.dumps(record, default=str) + "\n")
+
+def _dataset_key(symbol, timeframe, df, folds):
+    return {
+        'symbol': symbol,
+        'timeframe': timeframe,
+        'start': str(df.index[0]),
+        'end': str(df.index[-1]),
+        'rows': len(df),
+        'feature_hash': feature_set_hash(FEATURE_COLUMNS),
+        'folds': [list(map(list, fold)) for fold in folds],
+        'space': [[dim.name, type(dim).__name__, dim.low, dim.high] for dim in MODEL_SEARCH_SPACE],
+    }
+
+# --- Búsqueda --------------------------------------------------------------
+
+def search_model_params(df, folds, n_calls=MODEL_SEARCH_CALLS, n_workers=MODEL_SEARCH_WORKERS, dataset=None,
+                        results_path=MODEL_SEARCH_FILE, previous=(), random_state=42):
+    """
+    Optimización bayesiana por lotes (ask/tell) sobre MODEL_SEARCH_SPACE.
+    `previous` son evaluaciones ya guardadas: se le pasan al optimizador y
+    solo se piden las que faltan hasta `n_calls`. Devuelve todas las
+    evaluaciones (dicts con params, score y resultado por fold).
+    """
+    n_workers = n_workers or os.cpu_count() or 1
+    arrays = {
+        'X': np.ascontiguousarray(df[FEATURE_COLUMNS].to_numpy(dtype=np.float64)),
+        'close': df['close'].to_numpy(dtype=np.float64),
+    }
+    results = list(previous)
+    # Otra semilla al reanudar: los puntos iniciales aleatorios no repiten los ya evaluados
+    bayes = Optimizer(MODEL_SEARCH_SPACE, base_estimator="GP", n_initial_points=min(10, n_calls),
+                      random_state=random_state + len(results))
+    if results:
+        bayes.tell([[r['params'][name] for name in MODEL_PARAM_NAMES] for r in results],
+                   [r['score'] for r in results])
+        print(f"↩️  Reanudando: {len(results)}/{n_calls} evaluaciones ya guardadas")
+    if dataset is not None:
+        # Se reescribe con lo válido (descarta una última línea a medio escribir) y se sigue añadiendo
+        tmp = Path(f"{results_path}.tmp")
+        tmp.unlink(missing_ok=True)
+        _append(tmp, [{'dataset': dataset}] + results)
+        os.replace(tmp, results_path)
+
+    def run(pool_map):
+        while len(results) < n_calls:
+            candidates = bayes.ask(n_points=min(n_workers, n_calls - len(results)))
+            params_list = [dict(zip(MODEL_PARAM_NAMES, (x.item() if hasattr(x, 'item') else x for x in candidate)))
+                           for candidate in candidates]
+            # Una tarea por (candidato, fold): reparte mejor la carga entre procesos
+            tasks = [(params, train, test) for params in params_list for train, test in folds]
+            fold_results = list(pool_map(_evaluate_fold, tasks))
+            batch = []
+            for i, params in enumerate(params_list):
+                per_fold = fold_results[i * len(folds):(i + 1) * len(folds)]
+                batch.append({'params': params, 'score': _score(per_fold), 'folds': per_fold})
+            bayes.tell(candidates, [record['score'] for record in batch])
+            _append(results_path, batch)
+            results.extend(batch)
+            print(f"   ⚙️ {len(results)}/{n_calls} evaluaciones | mejor score: {-min(r['score'] for r in results):.4f}")
+
+    if n_workers <= 1:
+        _init_worker(None, arrays)
+        run(map)
+    else:
+        with SharedArrays(arrays) as shared, ProcessPoolExecutor(
+            max_workers=n_workers, initializer=_init_worker, initargs=(shared.spec,)
+        ) as pool:
+            run(pool.map)
+    return results
+
+def results_table(results):
+    rows = []
+    for record in results:
+        row = dict(record['params'])
+        row['score'] = -record['score']
+        row['pnl'] = sum(fold['pnl'] for fold in record['folds'])
+        row['signals'] = sum(fold['signals'] for fold in record['folds'])
+        row['f1_signals'] = np.mean([fold['f1'] for fold in record['folds']])
+        rows.append(row)
+    return pd.DataFrame(rows).sort_values('score', ascending=False)
+
+def main(args):
+    n_calls = int(args[0]) if args and args[0].isdigit() else MODEL_SEARCH_CALLS
+    symbol_to_use = "BTC/USDT:USDT" if TRADING_MODE == "futures" else SYMBOL
+    timeframe = "1h"
+    dataset, previous = (None, []) if "--new" in args else _read_results(MODEL_SEARCH_FILE)
+
+    df = load_history(symbol_to_use, timeframe, days=MODEL_SEARCH_DAYS)
+    if df.empty:
+        print("❌ Error al cargar datos.")
+        return
+    df = add_features(symbol_to_use, timeframe, df, FEATURE_COLUMNS).dropna(subset=FEATURE_COLUMNS)
+    if dataset is not None and dataset['symbol'] == symbol_to_use:
+        # Reanudar sobre exactamente las mismas velas que la búsqueda interrumpida
+        df = df.loc[pd.Timestamp(dataset['start']):pd.Timestamp(dataset['end'])]
+    folds = search_folds(len(df), test_size=days_to_bars(MODEL_SEARCH_TEST_DAYS, timeframe))
+    if not folds:
+        print("⚠️  Histórico insuficiente para los folds de la búsqueda.")
+        return
+    key = _dataset_key(symbol_to_use, timeframe, df, folds)
+    if dataset != key:
+        if previous:
+            print("ℹ️  La búsqueda guardada es de otro dataset o espacio. Empezando de cero.")
+        previous = []
+    print(f"🔎 Búsqueda de hiperparámetros | {symbol_to_use} {timeframe} | {len(df)} velas | {len(folds)} folds "
+          f"| {n_calls} evaluaciones")
+
+    results = search_model_params(df, folds, n_calls=n_calls, dataset=key, previous=previous[:n_calls])
+    table = results_table(results)
+    with pd.option_context('display.width', 200, 'display.max_columns', None, 'display.float_format', '{:.4f}'.format):
+        print("\n🏆 Mejores candidatos:")
+        print(table.head(5).to_string(index=False))
+
+    if table.iloc[0]['signals'] == 0 or table.iloc[0]['pnl'] <= 0:
+        print("⚠️  Ningún candidato da señales rentables fuera de muestra. Se mantienen los hiperparámetros actuales.")
+        return
+    best = dict(DEFAULT_MODEL_PARAMS, **table.iloc[0][MODEL_PARAM_NAMES].to_dict())
+    best = {name: int(value) if name in FOREST_PARAMS + ['lookahead'] else float(value) for name, value in best.items()}
+    with open(ML_PARAMS_FILE, 'wb') as f:
+        pickle.dump(best, f)
+    print(f"✅ Mejores hiperparámetros guardados en {ML_PARAMS_FILE}: {best}")
+    print("   Se usarán en el próximo entrenamiento completo (python ml_trainer.py)")
+
+if __name__ == "__main__":
+    main(sys.argv[1:])
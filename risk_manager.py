@@ -1,4 +1,5 @@
 import logging
+import numpy as np
 
 def calculate_position_size(capital, entry_price, stop_loss, risk_fraction=0.01, leverage=1):
     """
@@ -34,4 +35,17 @@ def calculate_position_size(capital, entry_price, stop_loss, risk_fraction=0.01,
             f"Final: {final_size:.6f}"
         )
     
-    return final_size
\ No newline at end of file
+    return final_size
+
+def calculate_position_sizes(capital, entry_price, stop_loss, risk_fraction=0.01, leverage=1):
+    """
+    Versión vectorizada (NumPy, sin logging) de calculate_position_size para
+    evaluar muchos escenarios a la vez. Devuelve el mismo tamaño elemento a elemento.
+    """
+    capital = np.asarray(capital, dtype=np.float64)
+    entry_price = np.asarray(entry_price, dtype=np.float64)
+    risk_per_unit = np.abs(entry_price - np.asarray(stop_loss, dtype=np.float64))
+    with np.errstate(divide='ignore', invalid='ignore'):
+        risk_based_size = (capital * risk_fraction) / risk_per_unit
+    margin_based_size = (capital * leverage * 0.9) / entry_price
+    return np.where(risk_per_unit == 0, 0.0, np.minimum(risk_based_size, margin_based_size))
@@ -0,0 +1,54 @@
+# shared_arrays.py
+import numpy as np
+from multiprocessing import shared_memory
+
+class SharedArrays:
+    """
+    Copia un dict de arrays NumPy a bloques de memoria compartida. Los
+    workers se adjuntan por nombre (spec) y leen los datos sin que viajen
+    serializados en cada tarea. Usar como context manager:
+    al salir se liberan los bloques.
+    """
+    def __init__(self, arrays):
+        self.blocks = []
+        self.spec = {}
+        try:
+            for name, values in arrays.items():
+                values = np.ascontiguousarray(values)
+                shm = shared_memory.SharedMemory(create=True, size=max(values.nbytes, 1))
+                self.blocks.append(shm)
+                np.ndarray(values.shape, dtype=values.dtype, buffer=shm.buf)[...] = values
+                self.spec[name] = (shm.name, values.shape, values.dtype.str)
+        except Exception:
+            self.close()
+            raise
+
+    def close(self):
+        for shm in self.blocks:
+            shm.close()
+            shm.unlink()
+        self.blocks = []
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+# Bloques adjuntados en este proceso: deben seguir vivos mientras se usen las vistas
+_attached_blocks = []
+
+def attach_shared_arrays(spec):
+    """
+    Adjunta (desde un worker) los bloques descritos en `spec` y devuelve
+    {nombre: array} como vistas de solo lectura, sin copiar los datos.
+    """
+    arrays = {}
+    for name, (shm_name, shape, dtype) in spec.items():
+        # track=False: el proceso que crea el bloque es su dueño y quien lo libera
+        shm = shared_memory.SharedMemory(name=shm_name, track=False)
+        _attached_blocks.append(shm)
+        values = np.ndarray(shape, dtype=dtype, buffer=shm.buf)
+        values.flags.writeable = False
+        arrays[name] = values
+    return arrays
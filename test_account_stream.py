@@ -0,0 +1,139 @@
+# test_account_stream.py
+import time
+from collections import Counter
+import pytest
+import executor
+from account_stream import AccountBook, StubUserDataSource
+from executor import TradeExecutor
+
+SYMBOL = 'BTC/USDT'
+
+class FakeExchange:
+    """Cliente ccxt falso: estado REST fijo y contador de llamadas"""
+    def __init__(self, open_orders=(), positions=()):
+        self.calls = Counter()
+        self.open_orders = list(open_orders)
+        self.positions = list(positions)
+
+    def fetch_calls(self):
+        return sum(n for name, n in self.calls.items() if name.startswith('fetch_'))
+
+    def market(self, symbol):
+        return {'id': symbol}
+
+    def set_leverage(self, leverage, symbol):
+        self.calls['set_leverage'] += 1
+
+    def fetch_open_orders(self, symbol):
+        self.calls['fetch_open_orders'] += 1
+        return list(self.open_orders)
+
+    def fetch_positions(self, symbols=None):
+        self.calls['fetch_positions'] += 1
+        return list(self.positions)
+
+    def fetch_order(self, order_id, symbol):
+        self.calls['fetch_order'] += 1
+        return {'id': order_id, 'status': 'open'}
+
+    def cancel_order(self, order_id, symbol):
+        self.calls['cancel_order'] += 1
+
+def _wait(condition, timeout=5.0):
+    deadline = time.monotonic() + timeout
+    while not condition():
+        assert time.monotonic() < deadline, "timeout esperando al stream"
+        time.sleep(0.01)
+
+@pytest.fixture
+def live(monkeypatch):
+    """Ejecutor live futures con cliente falso y libro alimentado por el stub, ya reconciliado"""
+    monkeypatch.setattr(executor, 'MODE', 'live')
+    monkeypatch.setattr(executor, 'TRADING_MODE', 'futures')
+    monkeypatch.setattr(executor, 'USE_USER_DATA_STREAM', False)
+    monkeypatch.setattr(executor, 'load_markets', lambda *args, **kwargs: {})
+    exchange = FakeExchange()
+    trade_executor = TradeExecutor(SYMBOL, exchange=exchange)
+    stub = StubUserDataSource()
+    trade_executor.start_account_stream(stub)
+    _wait(lambda: all(trade_executor.book.connected.values()))
+    trade_executor.reconcile_book()  # la reconciliación del arranque fue anterior a la conexión
+    assert trade_executor._book_ready()
+    exchange.calls.clear()
+    yield trade_executor, exchange, stub
+    trade_executor.account_feed.stop()
+
+def test_fill_and_cancel_are_final():
+    book = AccountBook()
+    book.apply_order({'id': 'a', 'status': 'open'})
+    book.apply_order({'id': 'b', 'status': 'open'})
+    book.apply_order({'id': 'a', 'status': 'closed'})
+    book.apply_order({'id': 'b', 'status': 'canceled'})
+    # Eventos tardíos y una foto REST anterior al fill no reabren las órdenes
+    book.apply_order({'id': 'a', 'status': 'open'})
+    book.reconcile([{'id': 'b', 'status': 'open'}, {'id': 'c', 'status': 'open'}], [])
+    assert book.order_status('a') == 'closed'
+    assert book.order_status('b') == 'canceled'
+    assert book.order_status('c') == 'open'
+    assert book.order_status('d') is None
+    assert [o['id'] for o in book.open_orders()] == ['c']
+
+def test_stub_fill_and_cancel_reach_the_book(live):
+    trade_executor, _, stub = live
+    stub.order('sl', 'STOP_MARKET', 'sell', 0.01, 90.0)
+    stub.order('tp', 'TAKE_PROFIT_MARKET', 'sell', 0.01, 110.0)
+    stub.fill('tp')
+    stub.cancel('sl')
+    stub.order('sl', 'STOP_MARKET', 'sell', 0.01, 90.0)  # repetición tardía
+    stub.wait_idle()
+    assert trade_executor.book.order_status('tp') == 'closed'
+    assert trade_executor.book.order_status('sl') == 'canceled'
+    assert trade_executor.book.open_orders() == []
+
+def test_book_is_live_only_after_every_stream_and_a_later_reconcile():
+    book = AccountBook()
+    book.reconcile([], [])
+    assert not book.is_live()  # ningún stream conectado
+    book.set_connected('positions', True)
+    book.reconcile([], [])
+    assert not book.is_live()  # falta el stream de órdenes
+    epoch = book.epoch
+    book.set_connected('orders', True)  # conecta mientras se descargaba el estado REST
+    book.reconcile([], [], epoch)
+    assert not book.is_live() and book.needs_reconcile(300)
+    book.reconcile([], [])
+    assert book.is_live() and not book.needs_reconcile(300)
+
+def test_disconnect_uses_rest_until_reconcile(live):
+    trade_executor, exchange, stub = live
+    stub.disconnect('orders')
+    stub.wait_idle()
+    assert not trade_executor._book_ready()
+    trade_executor.cancel_all_associated_orders(SYMBOL)
+    assert exchange.calls['fetch_open_orders'] == 1 and exchange.calls['fetch_positions'] == 1
+
+    stub.connect('orders')
+    stub.wait_idle()
+    assert not trade_executor._book_ready()  # eventos perdidos mientras estuvo caído
+    trade_executor.reconcile_book()
+    assert trade_executor._book_ready()
+
+def test_cleanup_and_cancel_use_the_book_without_rest(live):
+    trade_executor, exchange, stub = live
+    stub.position('long', 0.01, 100.0)
+    stub.order('sl', 'STOP_MARKET', 'sell', 0.01, 90.0)
+    stub.order('tp', 'TAKE_PROFIT_MARKET', 'sell', 0.01, 110.0)
+    stub.order('orphan', 'LIMIT', 'buy', 0.01)
+    stub.wait_idle()
+
+    # SL/TP de la posición abierta se preservan; la orden huérfana se cancela
+    assert trade_executor.cancel_all_associated_orders(SYMBOL) == 1
+    assert sorted(o['id'] for o in trade_executor.book.open_orders()) == ['sl', 'tp']
+
+    stub.fill('tp')
+    stub.wait_idle()
+    assert trade_executor.cancel_order_if_exists('sl', SYMBOL) is True
+    assert trade_executor.cancel_order_if_exists('tp', SYMBOL) is False
+    assert trade_executor.cancel_order_if_exists('orphan', SYMBOL) is False
+    assert exchange.fetch_calls() == 0
+    assert exchange.calls['cancel_order'] == 2
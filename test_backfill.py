@@ -0,0 +1,54 @@
+# test_backfill.py
+import numpy as np
+import pandas as pd
+import pytest
+import backfill
+from backfill import backfill_ohlcv, find_missing_ranges
+from candle_store import CandleStore, ohlcv_to_dataframe
+
+SYMBOL = 'BTC/USDT'
+MINUTE = 60_000
+START = 1_704_067_200_000
+LISTING = START + 250 * MINUTE          # antes del listado el exchange no tiene velas
+GAP = (START + 400 * MINUTE, START + 430 * MINUTE)  # mantenimiento
+END = START + 1000 * MINUTE
+
+class FakeExchange:
+    """Devuelve, como Binance, hasta `cap` velas existentes desde `since`"""
+    def __init__(self, cap=None):
+        timestamps = np.arange(LISTING, END, MINUTE)
+        self.timestamps = timestamps[(timestamps < GAP[0]) | (timestamps >= GAP[1])]
+        self.cap = cap
+        self.requests = []
+
+    def download(self, symbol, timeframe, limit, since=None, allow_empty=False):
+        self.requests.append(since)
+        limit = min(limit, self.cap or limit)
+        chunk = self.timestamps[self.timestamps >= since][:limit]
+        return ohlcv_to_dataframe([[int(ts), 1.0, 2.0, 0.5, 1.5, 10.0] for ts in chunk])
+
+@pytest.fixture
+def store(monkeypatch, tmp_path):
+    store = CandleStore(tmp_path)
+    monkeypatch.setattr(backfill, 'get_candle_store', lambda: store)
+    return store
+
+def test_empty_ranges_are_recorded_and_skipped(monkeypatch, store):
+    exchange = FakeExchange()
+    monkeypatch.setattr(backfill, '_download_ohlcv', exchange.download)
+    df = backfill_ohlcv(SYMBOL, '1m', START, END, page_limit=100, max_workers=2, requests_per_second=0)
+    assert len(df) == len(exchange.timestamps)
+    assert store.empty_ranges(SYMBOL, '1m') == [(START, LISTING), GAP]
+
+    # Segunda llamada: solo se vuelve a pedir la última vela guardada
+    exchange.requests.clear()
+    backfill_ohlcv(SYMBOL, '1m', START, END, page_limit=100, requests_per_second=0)
+    assert exchange.requests == [END - MINUTE]
+    assert find_missing_ranges(df.index, START, END, '1m', store.empty_ranges(SYMBOL, '1m')) == [(END - MINUTE, END)]
+
+def test_truncated_page_is_not_recorded_as_empty(monkeypatch, store):
+    exchange = FakeExchange(cap=40)  # el exchange corta antes del límite de página
+    monkeypatch.setattr(backfill, '_download_ohlcv', exchange.download)
+    backfill_ohlcv(SYMBOL, '1m', LISTING, GAP[0], page_limit=100, requests_per_second=0)
+    assert store.empty_ranges(SYMBOL, '1m') == []
+    assert len(find_missing_ranges(store.load(SYMBOL, '1m').index, LISTING, GAP[0], '1m')) > 1
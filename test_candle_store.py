@@ -0,0 +1,49 @@
+# test_candle_store.py
+import os
+import numpy as np
+import pandas as pd
+from candle_store import CandleStore, OHLCV_COLUMNS
+
+def _candles(n=300, seed=1):
+    rng = np.random.default_rng(seed)
+    close = 30000 + np.cumsum(rng.normal(0, 40, n))
+    # Mismo índice que produce ohlcv_to_dataframe a partir de la respuesta de ccxt
+    index = pd.to_datetime(1_704_067_200_000 + 60_000 * np.arange(n), unit='ms').rename('timestamp')
+    return pd.DataFrame({'open': close, 'high': close + 5, 'low': close - 5, 'close': close,
+                         'volume': rng.gamma(3.0, 50.0, n)}, index=index)
+
+def test_polling_merges_only_the_tail(tmp_path):
+    df = _candles()
+    store = CandleStore(tmp_path)
+    store.merge('BTC/USDT', '1m', df.iloc[:200])
+    expected = df.iloc[:200].copy()
+    for end in range(201, 260):
+        new = df.iloc[end - 2:end].copy()
+        new.iloc[-1, 3] += 1.0  # vela en curso: se corrige en la siguiente descarga
+        store.merge('BTC/USDT', '1m', new)
+        expected = pd.concat([expected, new])
+        expected = expected[~expected.index.duplicated(keep='last')]
+    # Relleno de un tramo antiguo
+    store.merge('BTC/USDT', '1m', df.iloc[10:20])
+    expected.update(df.iloc[10:20])
+    pd.testing.assert_frame_equal(store.load('BTC/USDT', '1m'), expected)
+    pd.testing.assert_frame_equal(CandleStore(tmp_path).load('BTC/USDT', '1m'), expected)
+
+def test_unchanged_candles_are_not_rewritten(tmp_path):
+    df = _candles()
+    store = CandleStore(tmp_path)
+    store.merge('BTC/USDT', '1m', df)
+    path = store._path('BTC/USDT', '1m')
+    before = path.stat().st_mtime_ns
+    os.utime(path, ns=(before - 10**9, before - 10**9))
+    store.merge('BTC/USDT', '1m', df.iloc[-3:])
+    assert path.stat().st_mtime_ns == before - 10**9
+
+def test_legacy_npz_is_migrated(tmp_path):
+    df = _candles()
+    legacy = tmp_path / 'BTCUSDT_1m.npz'
+    np.savez(legacy, timestamp=df.index.values.astype('datetime64[ms]').astype(np.int64),
+             **{col: df[col].to_numpy() for col in OHLCV_COLUMNS})
+    loaded = CandleStore(tmp_path).load('BTC/USDT', '1m')
+    pd.testing.assert_frame_equal(loaded, df)
+    assert not legacy.exists() and (tmp_path / 'BTCUSDT_1m.bin').exists()
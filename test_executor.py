@@ -0,0 +1,77 @@
+# test_executor.py
+import threading
+from collections import Counter
+import pytest
+import executor
+from executor import TradeExecutor
+
+SYMBOL = 'BTC/USDT'
+
+class FakeExchange:
+    """Cliente ccxt falso para place_order: registra las órdenes y puede hacer fallar un tipo"""
+    def __init__(self, positions=(), fail_type=None):
+        self.calls = Counter()
+        self.orders = []
+        self.positions = list(positions)
+        self.fail_type = fail_type
+        self.threads = set()
+        self._lock = threading.Lock()
+
+    def market(self, symbol):
+        return {'id': symbol}
+
+    def set_leverage(self, leverage, symbol):
+        self.calls['set_leverage'] += 1
+
+    def fetch_positions(self, symbols=None):
+        self.calls['fetch_positions'] += 1
+        return list(self.positions)
+
+    def create_order(self, symbol, type, side, amount, params=None):
+        with self._lock:
+            self.orders.append((type, side, amount, params))
+            self.threads.add(threading.current_thread().name)
+        if type == self.fail_type:
+            raise Exception("rechazada")
+        return {'id': f"{type.lower()}-1", 'status': 'open' if type != 'MARKET' else 'closed'}
+
+@pytest.fixture
+def live(monkeypatch):
+    monkeypatch.setattr(executor, 'MODE', 'live')
+    monkeypatch.setattr(executor, 'TRADING_MODE', 'futures')
+    monkeypatch.setattr(executor, 'USE_USER_DATA_STREAM', False)
+    monkeypatch.setattr(executor, 'load_markets', lambda *args, **kwargs: {})
+
+def test_both_legs_are_submitted_after_the_fill(live):
+    exchange = FakeExchange()
+    trade_executor = TradeExecutor(SYMBOL, exchange=exchange)
+    assert exchange.calls['set_leverage'] == 1  # al arrancar, no al abrir
+
+    result = trade_executor.place_order('buy', 0.01, sl_price=90.0, tp_price=110.0)
+    types = [order[0] for order in exchange.orders]
+    assert types[0] == 'MARKET' and sorted(types[1:]) == ['STOP_MARKET', 'TAKE_PROFIT_MARKET']
+    assert all(order[1] == 'SELL' and order[3]['closePosition'] for order in exchange.orders[1:])
+    assert result['sl_order_id'] == 'stop_market-1'
+    assert result['tp_order_id'] == 'take_profit_market-1'
+    assert {'position_check', 'market', 'sl', 'tp', 'unprotected'} <= set(result['timings'])
+    assert 'leverage' not in result['timings']
+    assert exchange.calls['set_leverage'] == 1
+    assert any(name.startswith('proteccion') for name in exchange.threads)
+
+def test_failing_leg_returns_none(live):
+    exchange = FakeExchange(fail_type='TAKE_PROFIT_MARKET')
+    result = TradeExecutor(SYMBOL, exchange=exchange).place_order('sell', 0.01, sl_price=110.0, tp_price=90.0)
+    assert result['sl_order_id'] == 'stop_market-1'
+    assert result['tp_order_id'] is None
+    assert 'unprotected' in result['timings']
+    assert all(order[1] == 'BUY' for order in exchange.orders[1:])
+
+def test_position_check_is_a_fresh_read(live):
+    exchange = FakeExchange()
+    trade_executor = TradeExecutor(SYMBOL, exchange=exchange)
+    assert trade_executor.account_snapshot().positions == []  # foto del ciclo sin posición
+    exchange.positions = [{'side': 'long', 'contracts': '0.01'}]  # abierta después de la foto
+
+    assert trade_executor.place_order('buy', 0.01, sl_price=90.0, tp_price=110.0) is None
+    assert exchange.orders == []
+    assert exchange.calls['fetch_positions'] == 2
@@ -0,0 +1,65 @@
+# test_indicator_engine.py
+import numpy as np
+import pandas as pd
+from indicators import add_indicators
+from indicator_engine import IndicatorEngine
+
+CHECK_COLS = ['ema50', 'ema200', 'rsi', 'atr', 'body', 'upper_wick', 'lower_wick', 'spread', 'liquidez']
+
+def _random_candles(n=1200, seed=7, freq='5min'):
+    rng = np.random.default_rng(seed)
+    close = 30000 + np.cumsum(rng.normal(0, 40, n))
+    open_ = np.r_[close[0], close[:-1]] + rng.normal(0, 5, n)
+    high = np.maximum(open_, close) + rng.gamma(2.0, 10.0, n)
+    low = np.minimum(open_, close) - rng.gamma(2.0, 10.0, n)
+    volume = rng.gamma(3.0, 50.0, n)
+    # Velas planas para cubrir RSI con pérdidas medias nulas
+    close[300:330] = close[299]
+    open_[300:330] = close[299]
+    index = pd.date_range('2024-01-01', periods=n, freq=freq, name='timestamp')
+    return pd.DataFrame({'open': open_, 'high': high, 'low': low, 'close': close, 'volume': volume}, index=index)
+
+def _assert_same(batch, incremental):
+    for col in CHECK_COLS:
+        np.testing.assert_allclose(incremental[col].to_numpy(), batch[col].to_numpy(), rtol=1e-12, atol=1e-9, err_msg=col)
+
+def test_full_window_matches_batch():
+    df = _random_candles()
+    _assert_same(add_indicators(df), IndicatorEngine().update('BTC/USDT', '5m', df))
+
+def test_one_candle_at_a_time_matches_batch():
+    df = _random_candles()
+    engine = IndicatorEngine()
+    batch = add_indicators(df)
+    for end in range(1, len(df) + 1):
+        out = engine.update('BTC/USDT', '5m', df.iloc[max(0, end - 500):end])
+        last = out.iloc[-1]
+        expected = batch.iloc[end - 1]
+        for col in CHECK_COLS:
+            np.testing.assert_allclose(last[col], expected[col], rtol=1e-12, atol=1e-9, err_msg=f"{col} @ {end}")
+    # La ventana deslizante completa también coincide con el cálculo sobre todo el histórico
+    _assert_same(batch.iloc[-500:], out)
+
+def test_partial_candle_is_not_committed():
+    df = _random_candles(600)
+    engine = IndicatorEngine()
+    engine.update('BTC/USDT', '5m', df.iloc[:-1])
+    # La vela en curso cambia varias veces antes de cerrar
+    partial = df.iloc[:-1].copy()
+    for bump in (50.0, -80.0, 0.0):
+        partial.iloc[-1, partial.columns.get_loc('close')] = df['close'].iloc[-2] + bump
+        engine.update('BTC/USDT', '5m', partial)
+    _assert_same(add_indicators(df), engine.update('BTC/USDT', '5m', df))
+
+def test_gap_in_window_resets_state():
+    df = _random_candles(900)
+    engine = IndicatorEngine()
+    engine.update('BTC/USDT', '5m', df.iloc[:400])
+    window = df.iloc[600:]
+    _assert_same(add_indicators(window), engine.update('BTC/USDT', '5m', window))
+
+if __name__ == "__main__":
+    for test in (test_full_window_matches_batch, test_one_candle_at_a_time_matches_batch,
+                 test_partial_candle_is_not_committed, test_gap_in_window_resets_state):
+        test()
+        print(f"✅ {test.__name__}")
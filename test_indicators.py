@@ -0,0 +1,51 @@
+# test_indicators.py
+import numpy as np
+import pandas as pd
+from indicators import add_indicators, add_fibonacci_levels, fibonacci_levels_batch, rolling_max, rolling_min
+from bench_indicators import add_indicators_ta, make_candles, max_rel_error
+
+WINDOWS = [1, 5, 20, 50, 144]
+
+def _candles_with_gaps(n=600, seed=3):
+    rng = np.random.default_rng(seed)
+    close = 30000 + np.cumsum(rng.normal(0, 40, n))
+    open_ = np.r_[close[0], close[:-1]] + rng.normal(0, 5, n)
+    high = np.maximum(open_, close) + rng.gamma(2.0, 10.0, n)
+    low = np.minimum(open_, close) - rng.gamma(2.0, 10.0, n)
+    volume = rng.gamma(3.0, 50.0, n)
+    index = pd.date_range('2024-01-01', periods=n, freq='1h', name='timestamp')
+    df = add_indicators(pd.DataFrame({'open': open_, 'high': high, 'low': low, 'close': close, 'volume': volume}, index=index))
+    # Huecos: velas sueltas, un tramo largo y el principio/final de la serie
+    for col, rows in (('high', [0, 77, 300, 599]), ('low', [5, 49, 50, 451])):
+        df.iloc[rows, df.columns.get_loc(col)] = np.nan
+    df.iloc[200:260, df.columns.get_loc('high')] = np.nan
+    return df
+
+def test_rolling_extremes_match_pandas_with_nan_gaps():
+    df = _candles_with_gaps()
+    for window in WINDOWS + [len(df), len(df) + 1]:
+        np.testing.assert_array_equal(rolling_max(df['high'], window), df['high'].rolling(window).max().to_numpy())
+        np.testing.assert_array_equal(rolling_min(df['low'], window), df['low'].rolling(window).min().to_numpy())
+
+def test_fibonacci_batch_matches_add_fibonacci_levels():
+    df = _candles_with_gaps()
+    block = fibonacci_levels_batch(df, WINDOWS)
+    for window in WINDOWS:
+        expected = add_fibonacci_levels(df, window)
+        frame = block.to_frame(window)
+        for col in frame.columns:
+            np.testing.assert_allclose(frame[col].to_numpy(), expected[col].to_numpy(dtype=np.float64),
+                                       rtol=1e-12, atol=1e-9, equal_nan=True, err_msg=f"{col} @ {window}")
+        levels = block.levels(window)
+        np.testing.assert_allclose(levels[0], expected['fib_0'].to_numpy(), equal_nan=True)
+        np.testing.assert_allclose(levels[-1], expected['fib_100'].to_numpy(), equal_nan=True)
+
+def test_add_indicators_matches_ta_reference():
+    # 600 velas: cubre el arranque de EMA200 y la zona ya estable
+    df = make_candles(600, seed=7)
+    reference = add_indicators_ta(df)
+    for dtype, tolerance in (('float64', 1e-9), ('float32', 1e-5)):
+        result = add_indicators(df, dtype=dtype)
+        assert list(result.columns) == list(reference.columns)
+        pd.testing.assert_frame_equal(result[df.columns], df)
+        assert max_rel_error(reference, result) < tolerance, dtype
@@ -0,0 +1,88 @@
+# test_market_stream.py
+import numpy as np
+import pandas as pd
+import pytest
+import market_stream
+from candle_store import CandleStore
+from market_stream import KlineBuffer, KlineFeed, ReplayKlineSource
+
+SYMBOL = 'BTC/USDT'
+
+def _candles(n=30, seed=3):
+    rng = np.random.default_rng(seed)
+    close = 30000 + np.cumsum(rng.normal(0, 40, n))
+    index = pd.to_datetime(1_704_067_200_000 + 60_000 * np.arange(n), unit='ms').rename('timestamp')
+    return pd.DataFrame({'open': close - 3, 'high': close + 5, 'low': close - 5, 'close': close,
+                         'volume': rng.gamma(3.0, 50.0, n)}, index=index)
+
+@pytest.fixture
+def store(monkeypatch, tmp_path):
+    """Almacén de velas temporal con 30 velas de 1m y su agregado a 5m"""
+    store = CandleStore(tmp_path)
+    df_1m = _candles()
+    df_5m = df_1m.resample('5min').agg({'open': 'first', 'high': 'max', 'low': 'min',
+                                        'close': 'last', 'volume': 'sum'})
+    store.merge(SYMBOL, '1m', df_1m)
+    store.merge(SYMBOL, '5m', df_5m)
+    monkeypatch.setattr(market_stream, 'get_candle_store', lambda: store)
+    return store
+
+def _row(df, ts):
+    return df.loc[pd.Timestamp(ts, unit='ms')].tolist()
+
+def test_forming_candle_is_updated_in_place():
+    buffer = KlineBuffer()
+    closes = []
+    buffer.add_listener(lambda *args: closes.append(args))
+    buffer.update(SYMBOL, '1m', [60_000, 10.0, 10.0, 10.0, 10.0, 0.0])
+    buffer.update(SYMBOL, '1m', [60_000, 10.0, 12.0, 9.0, 11.0, 5.0])
+    buffer.update(SYMBOL, '1m', [0, 1.0, 1.0, 1.0, 1.0, 1.0])  # fuera de orden: se ignora
+    df = buffer.get_dataframe(SYMBOL, '1m')
+    assert len(df) == 1 and df.iloc[-1].tolist() == [10.0, 12.0, 9.0, 11.0, 5.0]
+    assert closes == []
+
+    buffer.update(SYMBOL, '1m', [120_000, 11.0, 11.0, 11.0, 11.0, 0.0])
+    assert closes == [(SYMBOL, '1m', 60_000)]
+    assert len(buffer.get_dataframe(SYMBOL, '1m')) == 2
+
+def test_replay_closes_each_trigger_candle_once(store):
+    buffer = KlineBuffer()
+    df_5m = store.load(SYMBOL, '5m')
+    closes = []
+
+    def on_close(symbol, timeframe, closed_ts):
+        if timeframe == '5m':
+            # Al avisar, la vela cerrada ya está completa en el buffer
+            closes.append((closed_ts, _row(buffer.get_dataframe(SYMBOL, '5m'), closed_ts)))
+
+    buffer.add_listener(on_close)
+    ReplayKlineSource.from_store(SYMBOL, ['1m', '5m']).run(buffer)
+
+    # La última vela de 5m nunca se cierra: no llega otra detrás
+    expected = df_5m.index[:-1].values.astype('datetime64[ms]').astype('int64').tolist()
+    assert [ts for ts, _ in closes] == expected
+    for ts, row in closes:
+        assert row == _row(df_5m, ts)
+    pd.testing.assert_frame_equal(buffer.get_dataframe(SYMBOL, '1m'), store.load(SYMBOL, '1m'))
+
+def test_buffer_keeps_only_the_last_candles(store):
+    df_1m = store.load(SYMBOL, '1m')
+    buffer = KlineBuffer(capacity=5)
+    buffer.seed(SYMBOL, '1m', df_1m.iloc[:20])
+    pd.testing.assert_frame_equal(buffer.get_dataframe(SYMBOL, '1m'), df_1m.iloc[15:20])
+
+    ReplayKlineSource({(SYMBOL, '1m'): df_1m.iloc[20:]}).run(buffer)
+    pd.testing.assert_frame_equal(buffer.get_dataframe(SYMBOL, '1m'), df_1m.iloc[-5:])
+    pd.testing.assert_frame_equal(buffer.get_dataframe(SYMBOL, '1m', limit=2), df_1m.iloc[-2:])
+
+def test_wait_for_close_unblocks_on_trigger_close(store):
+    feed = KlineFeed(ReplayKlineSource.from_store(SYMBOL, ['1m', '5m'], delay=0.001), '5m')
+    assert feed.wait_for_close(timeout=0.05) is None  # sin fuente en marcha: vence el timeout
+    feed.start()
+    try:
+        first_5m = int(store.load(SYMBOL, '5m').index[0].value // 10**6)
+        assert feed.wait_for_close(timeout=5) == (SYMBOL, '5m', first_5m)
+        assert feed.has(SYMBOL, '1m') and feed.has(SYMBOL, '5m')
+    finally:
+        feed.stop()
+        feed._thread.join(timeout=5)
@@ -0,0 +1,36 @@
+# test_ml_trainer.py
+import numpy as np
+from ml_trainer import build_model, grow_forest, retire_trees
+
+def _data(n=300, seed=0):
+    rng = np.random.default_rng(seed)
+    X = rng.normal(size=(n, 5))
+    y = np.digitize(X[:, 0] + rng.normal(0, 0.5, n), [-0.5, 0.5]) - 1  # -1, 0, 1
+    return X, y
+
+def _seeds(trees):
+    return [tree.random_state for tree in trees]
+
+def test_new_trees_get_fresh_seeds_after_retirement():
+    X, y = _data()
+    model = build_model({-1: 1.0, 0: 1.0, 1: 1.0}, n_jobs=1, n_estimators=10, max_depth=3)
+    model.fit(X, y)
+
+    grow_forest(model, X, y, n_new=5)
+    retire_trees(model, max_trees=10)
+    retained = _seeds(model.estimators_)
+    grow_forest(model, X, y, n_new=5)
+    new = _seeds(model.estimators_[-5:])
+
+    assert len(model.estimators_) == 15
+    assert _seeds(model.estimators_[:10]) == retained  # los árboles conservados no cambian
+    assert not set(new) & set(retained)
+
+def test_grow_forest_is_reproducible():
+    X, y = _data()
+    seeds = []
+    for _ in range(2):
+        model = build_model({-1: 1.0, 0: 1.0, 1: 1.0}, n_jobs=1, n_estimators=10, max_depth=3).fit(X, y)
+        grow_forest(model, X, y, n_new=5)
+        seeds.append(_seeds(model.estimators_))
+    assert seeds[0] == seeds[1]
@@ -1,11 +1,17 @@
 # utils_ml.py
+import numpy as np
 import pandas as pd
 import json
 from pathlib import Path
 
+PNL_KEYS = ['pnl', 'PnL', 'profit', 'gain']  # nombres de PnL usados en distintas versiones del diario
+
 def load_real_trades_as_labels(symbol="BTC/USDT:USDT", min_pnl_abs=0):
     """
     Usa real_trades.json (filtrado) en vez de trades.json.
+    Devuelve timestamp (UTC sin zona, como el índice de velas), label y pnl,
+    ordenado por timestamp. Todo el filtrado es columnar: escala a cientos de
+    miles de entradas.
     """
     trades_file = Path("real_trades.json")  # ← ¡cambio clave!
     if not trades_file.exists():
@@ -14,19 +20,25 @@ def load_real_trades_as_labels(symbol="BTC/USDT:USDT", min_pnl_abs=0):
     with open(trades_file, "r") as f:
         trades = json.load(f)
     
-    filtered = []
-    for t in trades:
-        if 'pnl' not in t or t.get('symbol', symbol) != symbol:
-            continue
-        if abs(t['pnl']) < min_pnl_abs:
-            continue
-        filtered.append(t)
-    
-    if not filtered:
+    df_trades = pd.DataFrame(trades)
+    if df_trades.empty or 'timestamp' not in df_trades.columns:
         return pd.DataFrame()
-    
-    df_trades = pd.DataFrame(filtered)
-    df_trades['label'] = df_trades['pnl'].apply(lambda x: 1 if x > 0 else -1)
-    df_trades['timestamp'] = pd.to_datetime(df_trades['timestamp'])
-    
-    return df_trades[['timestamp', 'label']]
\ No newline at end of file
+
+    # Primer campo de PnL disponible en cada entrada, admitiendo coma decimal
+    pnl = pd.Series(np.nan, index=df_trades.index)
+    for key in reversed([key for key in PNL_KEYS if key in df_trades.columns]):
+        values = pd.to_numeric(df_trades[key].astype(str).str.replace(',', '.', regex=False), errors='coerce')
+        pnl = values.where(values.notna(), pnl)
+
+    symbols = df_trades['symbol'].fillna(symbol) if 'symbol' in df_trades.columns else symbol
+    timestamps = pd.to_datetime(df_trades['timestamp'], utc=True, errors='coerce', format='mixed').dt.tz_localize(None)
+    keep = pnl.notna() & (symbols == symbol) & (pnl.abs() >= min_pnl_abs) & timestamps.notna()
+    if not keep.any():
+        return pd.DataFrame()
+
+    df_trades = pd.DataFrame({
+        'timestamp': timestamps[keep],
+        'label': np.where(pnl[keep] > 0, 1, -1),
+        'pnl': pnl[keep],
+    })
+    return df_trades.sort_values('timestamp', kind='stable').reset_index(drop=True)
@@ -0,0 +1,192 @@
+# walk_forward.py
+"""
+Validación walk-forward: ventanas train/test que avanzan en el tiempo sobre
+el histórico cacheado. En cada fold se optimiza la estrategia (o se entrena
+el modelo ML) solo con el tramo de train y se mide en el tramo de test
+siguiente, que el fold nunca vio.
+
+Los indicadores, features y etiquetas se calculan UNA vez sobre todo el
+histórico y se comparten con los workers por memoria compartida: los folds
+solapados no recalculan las velas comunes. Los folds corren en paralelo.
+
+Ejecuta: python walk_forward.py [estrategia|modelo]
+"""
+import os
+import sys
+import numpy as np
+import pandas as pd
+from concurrent.futures import ProcessPoolExecutor
+from skopt import gp_minimize
+from sklearn.metrics import accuracy_score, f1_score, precision_score
+from config import (SYMBOL, TRADING_MODE, SIGNAL_TIMEFRAME, WALK_FORWARD_TRAIN_DAYS,
+                    WALK_FORWARD_TEST_DAYS, WALK_FORWARD_WORKERS)
+from backfill import load_history
+from candle_store import timeframe_to_ms
+from feature_store import add_features
+from learner import BacktestOptimizer, PARAM_NAMES, SEARCH_SPACE, STRATEGY_COLS
+from ml_trainer import FEATURE_COLUMNS, create_features_and_labels, balanced_class_weights, build_model
+from shared_arrays import SharedArrays, attach_shared_arrays
+
+DAY_MS = 24 * 60 * 60 * 1000
+
+def walk_forward_windows(n, train_size, test_size, step=None, start=0, gap=0, anchored=False):
+    """
+    Índices [inicio, fin) de cada fold sobre una serie de `n` velas.
+    - step: cuánto avanza cada fold (por defecto test_size: tests contiguos sin solape)
+    - gap: velas descartadas entre train y test (purga de etiquetas que miran al futuro)
+    - anchored: el train empieza siempre en `start` y crece en cada fold
+    Devuelve [((train_lo, train_hi), (test_lo, test_hi)), ...]
+    """
+    step = step or test_size
+    folds = []
+    train_hi = start + train_size
+    while train_hi + gap + test_size <= n:
+        train_lo = start if anchored else train_hi - train_size
+        test_lo = train_hi + gap
+        folds.append(((train_lo, train_hi), (test_lo, test_lo + test_size)))
+        train_hi += step
+    return folds
+
+def days_to_bars(days, timeframe):
+    return int(days * DAY_MS // timeframe_to_ms(timeframe))
+
+# --- Ejecución de folds en paralelo ---------------------------------------
+
+# Estado de cada proceso worker (se rellena en _init_worker)
+_worker_arrays = None
+_worker_context = None
+
+def _init_worker(spec, context):
+    global _worker_arrays, _worker_context
+    _worker_arrays = attach_shared_arrays(spec) if spec is not None else context.pop('arrays')
+    _worker_context = context
+
+def _run_folds(fold_fn, arrays, context, tasks, n_workers):
+    """Ejecuta fold_fn(task) para cada task; los arrays viajan por memoria compartida"""
+    n_workers = min(n_workers or os.cpu_count() or 1, len(tasks))
+    if n_workers <= 1:
+        _init_worker(None, dict(context, arrays=arrays))
+        return [fold_fn(task) for task in tasks]
+    with SharedArrays(arrays) as shared, ProcessPoolExecutor(
+        max_workers=n_workers, initializer=_init_worker, initargs=(shared.spec, context)
+    ) as pool:
+        return list(pool.map(fold_fn, tasks))
+
+# --- Estrategia de velas (BacktestOptimizer) ------------------------------
+
+def _fold_optimizer(lo, hi):
+    arrays = {col: values[lo:hi] for col, values in _worker_arrays.items()}
+    # Los indicadores ya vienen calentados del histórico completo: se opera desde la primera vela
+    return BacktestOptimizer.from_arrays(arrays, _worker_context['symbol'], _worker_context['trading_mode'], start=0)
+
+def _strategy_fold(task):
+    fold, (train_lo, train_hi), (test_lo, test_hi) = task
+    train = _fold_optimizer(train_lo, train_hi)
+    result = gp_minimize(train.run_backtest_with_params, SEARCH_SPACE,
+                         n_calls=_worker_context['n_calls'], random_state=42)
+    test_pnl, test_trades = _fold_optimizer(test_lo, test_hi).backtest_stats(result.x)
+    row = {'fold': fold, 'train_score': -result.fun,
+           'test_score': -BacktestOptimizer._score(test_pnl, test_trades),
+           'test_pnl': test_pnl, 'test_trades': test_trades}
+    row.update(zip(PARAM_NAMES, result.x))
+    return row
+
+def walk_forward_strategy(df, symbol=SYMBOL, trading_mode=TRADING_MODE, train_size=None, test_size=None,
+                          step=None, n_calls=40, n_workers=WALK_FORWARD_WORKERS, warmup=200):
+    """
+    Optimiza los parámetros de la estrategia en cada ventana de train y los
+    evalúa en la ventana de test siguiente. Devuelve un DataFrame por fold.
+    """
+    optimizer = BacktestOptimizer(df, symbol, trading_mode)
+    folds = walk_forward_windows(len(df), train_size, test_size, step=step, start=warmup)
+    if not folds:
+        print("⚠️  Histórico insuficiente para un solo fold.")
+        return pd.DataFrame()
+    tasks = [(i + 1, train, test) for i, (train, test) in enumerate(folds)]
+    context = {'symbol': symbol, 'trading_mode': trading_mode, 'n_calls': n_calls}
+    rows = _run_folds(_strategy_fold, optimizer.shared_arrays(), context, tasks, n_workers)
+    return _with_dates(pd.DataFrame(rows), df.index, folds)
+
+# --- Modelo ML ------------------------------------------------------------
+
+def _model_fold(task):
+    fold, (train_lo, train_hi), (test_lo, test_hi) = task
+    X, y = _worker_arrays['X'], _worker_arrays['y']
+    y_train = y[train_lo:train_hi]
+    model = build_model(balanced_class_weights(y_train), n_jobs=1)
+    model.fit(pd.DataFrame(X[train_lo:train_hi], columns=_worker_context['feature_cols']), y_train)
+    y_test = y[test_lo:test_hi]
+    y_pred = model.predict(pd.DataFrame(X[test_lo:test_hi], columns=_worker_context['feature_cols']))
+    return {
+        'fold': fold,
+        'accuracy': accuracy_score(y_test, y_pred),
+        'f1_macro': f1_score(y_test, y_pred, labels=[-1, 0, 1], average='macro', zero_division=0),
+        'precision_long': precision_score(y_test, y_pred, labels=[1], average='macro', zero_division=0),
+        'precision_short': precision_score(y_test, y_pred, labels=[-1], average='macro', zero_division=0),
+        'test_long': int((y_test == 1).sum()),
+        'test_short': int((y_test == -1).sum()),
+    }
+
+def walk_forward_model(df, train_size=None, test_size=None, step=None, lookahead=10, threshold=0.015,
+                       n_workers=WALK_FORWARD_WORKERS):
+    """
+    Entrena el modelo en cada ventana de train y lo evalúa en la de test.
+    Entre ambas se purgan `lookahead` velas: sus etiquetas miran velas del test.
+    """
+    X, y, feature_cols = create_features_and_labels(df, lookahead=lookahead, threshold=threshold)
+    folds = walk_forward_windows(len(X), train_size, test_size, step=step, gap=lookahead)
+    if not folds:
+        print("⚠️  Histórico insuficiente para un solo fold.")
+        return pd.DataFrame()
+    tasks = [(i + 1, train, test) for i, (train, test) in enumerate(folds)]
+    arrays = {'X': X.to_numpy(dtype=np.float64), 'y': y.to_numpy(dtype=np.int8)}
+    rows = _run_folds(_model_fold, arrays, {'feature_cols': feature_cols}, tasks, n_workers)
+    return _with_dates(pd.DataFrame(rows), X.index, folds)
+
+# --- Informe --------------------------------------------------------------
+
+def _with_dates(report, index, folds):
+    report.insert(1, 'train_start', [index[lo] for (lo, _), _ in folds])
+    report.insert(2, 'test_start', [index[lo] for _, (lo, _) in folds])
+    report.insert(3, 'test_end', [index[hi - 1] for _, (_, hi) in folds])
+    return report
+
+def summarize(report, metrics):
+    """Media, desviación y peor fold de cada métrica"""
+    return report[metrics].agg(['mean', 'std', 'min']).T
+
+def print_report(report, metrics):
+    if report.empty:
+        return
+    with pd.option_context('display.width', 200, 'display.max_columns', None, 'display.float_format', '{:.4f}'.format):
+        print(report.to_string(index=False))
+        print("\n📊 Agregado:")
+        print(summarize(report, metrics).to_string())
+
+def main(mode="estrategia"):
+    symbol_to_use = "BTC/USDT:USDT" if TRADING_MODE == "futures" else SYMBOL
+    timeframe = "1m" if mode == "estrategia" else SIGNAL_TIMEFRAME
+    train_size = days_to_bars(WALK_FORWARD_TRAIN_DAYS, timeframe)
+    test_size = days_to_bars(WALK_FORWARD_TEST_DAYS, timeframe)
+    days = WALK_FORWARD_TRAIN_DAYS + 4 * WALK_FORWARD_TEST_DAYS + 1
+    print(f"🔁 Walk-forward ({mode}) | {symbol_to_use} {timeframe} | train {WALK_FORWARD_TRAIN_DAYS}d / test {WALK_FORWARD_TEST_DAYS}d")
+
+    df = load_history(symbol_to_use, timeframe, days=days)
+    if df.empty:
+        print("❌ Error al cargar datos.")
+        return
+
+    if mode == "estrategia":
+        df = add_features(symbol_to_use, timeframe, df, STRATEGY_COLS)
+        report = walk_forward_strategy(df, symbol_to_use, TRADING_MODE, train_size, test_size)
+        print_report(report, ['train_score', 'test_score', 'test_pnl', 'test_trades'] + PARAM_NAMES)
+        if not report.empty:
+            print(f"\n✅ Folds rentables en test: {(report['test_pnl'] > 0).sum()}/{len(report)} "
+                  f"| PnL total fuera de muestra: {report['test_pnl'].sum():.2f}")
+    else:
+        df = add_features(symbol_to_use, timeframe, df, FEATURE_COLUMNS)
+        report = walk_forward_model(df, train_size, test_size)
+        print_report(report, ['accuracy', 'f1_macro', 'precision_long', 'precision_short'])
+
+if __name__ == "__main__":
+    main(sys.argv[1] if len(sys.argv) > 1 else "estrategia")